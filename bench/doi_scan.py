@@ -0,0 +1,103 @@
+# bench/doi_scan.py
+"""
+میکروبنچمارک اسکن DOI روی بدنه‌های پاسخ (مسیر داغ تشخیص).
+مسیر قدیم: base64 → bytes → decode به str → regex
+مسیر جدید: base64 → bytes → scan_dois روی bytes
+
+اجرا:
+    python bench/doi_scan.py [فایل/پوشهٔ بدنه‌های ضبط‌شده ...] [-n 200]
+فایل‌های .jsonl.gz به‌عنوان ضبط CDP (CDP_RECORD) خوانده می‌شوند و بدنه‌هایشان بنچ می‌شود.
+اگر ورودی داده نشود، بدنه‌های مصنوعی (/requests، JSON بی‌ربط، JS) ساخته می‌شوند.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.detect.doi import DOI_RE, scan_dois
+from src.detect.recorder import load_recording
+
+
+def _synthetic_bodies() -> dict[str, bytes]:
+    rnd = random.Random(7)
+    docs = [{
+        "_id": f"{i:024x}",
+        "doi": f"10.{rnd.randint(1000, 99999)}/j.test.{i}",
+        "title": "A fairly long article title about something measurable " * 2,
+        "request": {"from": f"user{i}", "reward": rnd.randint(1, 50)},
+        "createdAt": "2025-01-01T00:00:00.000Z",
+    } for i in range(200)]
+    return {
+        "requests_200": json.dumps({"docs": docs}).encode(),
+        "json_no_doi": json.dumps({"items": [{"k": "v" * 40, "n": i} for i in range(500)]}).encode(),
+        "script_64k": (b"function f(a,b){return a+b}\n" * 2400),
+    }
+
+
+def _load_bodies(paths: list[str]) -> dict[str, bytes]:
+    out: dict[str, bytes] = {}
+    for p in map(Path, paths):
+        files = sorted(x for x in p.rglob("*") if x.is_file()) if p.is_dir() else [p]
+        for f in files:
+            if f.name.endswith(".jsonl.gz"):
+                for rec in load_recording(f):
+                    if rec.get("m") == "body":
+                        raw = rec.get("body") or ""
+                        out[f"{f.name}:{rec.get('rid')}"] = base64.b64decode(raw) if rec.get("b64") else raw.encode()
+                continue
+            out[str(f)] = f.read_bytes()
+    return out
+
+
+def _old_path(b64: str) -> list[str]:
+    text = base64.b64decode(b64).decode("utf-8", "ignore")
+    return DOI_RE.findall(text)
+
+
+def _new_path(b64: str) -> list[str]:
+    return scan_dois(base64.b64decode(b64))
+
+
+def _measure(fn, arg, n: int) -> list[float]:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter_ns()
+        fn(arg)
+        samples.append((time.perf_counter_ns() - t0) / 1000)
+    return samples
+
+
+def _fmt(samples: list[float]) -> str:
+    s = sorted(samples)
+    p95 = s[min(len(s) - 1, int(len(s) * 0.95))]
+    return f"p50={statistics.median(s):8.1f}µs p95={p95:8.1f}µs mean={statistics.fmean(s):8.1f}µs"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("paths", nargs="*", help="فایل یا پوشهٔ بدنه‌های ضبط‌شده")
+    ap.add_argument("-n", "--iterations", type=int, default=200)
+    args = ap.parse_args()
+
+    bodies = _load_bodies(args.paths) if args.paths else _synthetic_bodies()
+    for name, raw in bodies.items():
+        b64 = base64.b64encode(raw).decode("ascii")
+        assert sorted(_old_path(b64)) == sorted(_new_path(b64)), name
+        old = _measure(_old_path, b64, args.iterations)
+        new = _measure(_new_path, b64, args.iterations)
+        print(f"{name} ({len(raw)} B)")
+        print(f"  old  {_fmt(old)}")
+        print(f"  new  {_fmt(new)}  speedup×{statistics.median(old) / max(statistics.median(new), 1e-9):.2f}")
+
+
+if __name__ == "__main__":
+    main()
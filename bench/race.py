@@ -0,0 +1,112 @@
+# bench/race.py
+"""
+بنچمارک انتها-به-انتهای مسابقهٔ take روی سرور جایگزین محلی (bench/scinet_standin.py).
+SciNetClient واقعی (Playwright + CDP + observer) به سرور محلی وصل می‌شود، درخواست‌ها با نرخ
+مشخص تزریق و یک رقیب مجازی پس از تأخیر ثابت take می‌زند. در پایان:
+  - نرخ برد، صدک‌های ایجاد→take از دید سرور
+  - صدک‌های مرحله‌ای LatencyTracker از دید کلاینت
+  - زمان CPU پایتون به ازای هر درخواست تزریق‌شده
+چاپ می‌شود. __notify_py با stub جایگزین می‌شود (بدون دانلود/تلگرام) و پس از --hold-ms
+اسلات take آزاد می‌شود (--slots ظرفیت همزمان را تعیین می‌کند).
+
+اجرا (نیازمند Chromium نصب‌شده برای Playwright):
+    python bench/race.py --duration 60 --rate 1 --competitor-ms 800
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.scinet_standin import start_standin
+
+
+async def race(args):
+    srv, runner = await start_standin(
+        args.port, rate=args.rate, competitor_ms=args.competitor_ms,
+        list_size=args.list_size, pad_bytes=args.pad_bytes, poll_ms=args.poll_ms,
+    )
+    base = f"http://127.0.0.1:{args.port}/"
+
+    import scinet_bot_fast as bot
+    logging.getLogger("scinet_fast").setLevel(logging.WARNING)
+    tmp = Path(tempfile.mkdtemp(prefix="scinet_race_"))
+    bot.SCINET_URL = base
+    bot.STATE_FILE = tmp / "state.json"
+    bot.SKIP_FILE = tmp / "skip.journal"
+    bot.SEEN_FILE = tmp / "seen.json"
+    bot.SESSION_FILE = tmp / "session.json"  # وجود ندارد → لاگین تازه روی سرور محلی
+    bot.DRY_RUN = False
+    bot.DIRECT_POLL_URL = base + "requests"
+    bot.state = bot.BotState()
+    # بدون پیش‌واکشی متادیتا: کش متادیتا فقط در main() باز می‌شود و بنچ به APIهای زنده نمی‌زند
+    bot.META_PREFETCH_ENABLED = False
+
+    client = bot.SciNetClient()
+    client._detect_log_enabled = False
+    notified: list[dict] = []
+
+    async def fake_notify(payload: dict):
+        notified.append(payload)
+        doi = payload.get("doi", "")
+        reason = payload.get("reason")
+        if doi:
+            if reason in (None, "competitor_won"):
+                client._latency.mark(doi, "take_done")
+            client._latency.finish(doi, {None: "won", "competitor_won": "lost"}.get(reason, "rejected_pre"))
+        if args.hold_ms > 0:
+            await asyncio.sleep(args.hold_ms / 1000.0)
+        if doi:
+            await client.release_slot(doi)
+
+    client._notify_py = fake_notify
+
+    await client.start()
+    client.set_take_capacity(args.slots)
+    # warm-up: درخواست‌هایی که پیش از آماده‌شدن کلاینت تزریق شده‌اند در آمار حساب نمی‌شوند
+    srv.stats.update(injected=0, won=0, lost=0, competitor=0, take_ms=[])
+    cpu0 = time.process_time()
+    await asyncio.sleep(args.duration)
+    cpu = time.process_time() - cpu0
+    summary = srv.summary()
+
+    await client.shutdown()
+    try:
+        if client._browser:
+            await client._browser.close()
+        if client._pw:
+            await client._pw.stop()
+    finally:
+        await runner.cleanup()
+
+    print("server:", json.dumps(summary, ensure_ascii=False))
+    print("bus:", json.dumps(client._bus.stats(), ensure_ascii=False))
+    print(f"notifies={len(notified)} cpu={cpu * 1000:.0f}ms "
+          f"cpu/request={cpu * 1000 / max(summary['injected'], 1):.2f}ms")
+    print(client._latency.format_text())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8790)
+    ap.add_argument("--duration", type=float, default=60.0, help="ثانیه")
+    ap.add_argument("--rate", type=float, default=1.0, help="درخواست جدید در ثانیه")
+    ap.add_argument("--competitor-ms", type=float, default=800.0, help="تأخیر take رقیب (منفی = بدون رقیب)")
+    ap.add_argument("--list-size", type=int, default=50)
+    ap.add_argument("--pad-bytes", type=int, default=0)
+    ap.add_argument("--poll-ms", type=int, default=1000, help="دورهٔ poll صفحه روی /requests")
+    ap.add_argument("--hold-ms", type=float, default=0.0, help="مدت اشغال‌بودن پس از برد (شبیه‌سازی آپلود)")
+    ap.add_argument("--slots", type=int, default=1, help="تعداد اسلات‌های همزمان take")
+    asyncio.run(race(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# bench/replay_cdp.py
+"""
+بازپخش یک ضبط CDP (CDP_RECORD=...) روی همان هندلرهای SciNetClient، بدون مرورگر.
+/take و __notify_py با stub جایگزین می‌شوند؛ stub اعلان پس از --hold-ms اسلات را آزاد می‌کند
+(شبیه پایان دانلود/آپلود) تا TakeSlots واقعاً چرخش داشته باشد. در پایان throughput، برنده‌های گذرگاه
+تشخیص و صدک‌های latency چاپ می‌شود.
+
+اجرا:
+    python bench/replay_cdp.py cdp_record.jsonl.gz              # با زمان‌بندی اصلی
+    python bench/replay_cdp.py cdp_record.jsonl.gz --speed 0    # با حداکثر سرعت
+    python bench/replay_cdp.py --synthesize synth.jsonl.gz      # ساخت یک ضبط مصنوعی
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.detect.recorder import ReplayCDP, load_recording
+
+
+def synthesize(path: str, polls: int = 60, per_poll: int = 2, list_size: int = 100, period_ms: float = 1000.0):
+    """یک ضبط مصنوعی از pollهای /requests با داک‌های تازه در هر poll می‌سازد."""
+    rnd = random.Random(1)
+    docs = []
+    n = 0
+    with gzip.open(path, "wb") as fh:
+        def w(rec):
+            fh.write(json.dumps(rec).encode() + b"\n")
+        for i in range(polls):
+            for _ in range(per_poll):
+                n += 1
+                docs.insert(0, {
+                    "_id": f"{n:024x}",
+                    "doi": f"10.{rnd.randint(1000, 9999)}/synthetic.{n}",
+                    "title": "Synthetic request title with enough words in it",
+                    "request": {"from": f"user{n}", "reward": rnd.randint(1, 20)},
+                    "createdAt": "2025-01-01T00:00:00.000Z",
+                })
+            del docs[list_size:]
+            t = i * period_ms
+            rid = f"req.{i}"
+            url = "https://sci-net.xyz/requests?page=1"
+            body = base64.b64encode(json.dumps({"docs": docs}).encode()).decode()
+            w({"t": t, "m": "Network.requestWillBeSent", "p": {"requestId": rid, "request": {"url": url, "method": "GET"}}})
+            w({"t": t + 40, "m": "Network.responseReceived",
+               "p": {"requestId": rid, "type": "XHR", "response": {"url": url, "mimeType": "application/json"}}})
+            w({"t": t + 45, "m": "Network.loadingFinished", "p": {"requestId": rid}})
+            w({"t": t + 45, "m": "body", "rid": rid, "body": body, "b64": True})
+
+
+async def replay(path: str, speed: float, take_ms: float, hold_ms: float, dry: bool):
+    import scinet_bot_fast as bot
+    logging.getLogger("scinet_fast").setLevel(logging.WARNING)
+    # state/skip/seen در پوشهٔ موقت: بازپخش نه فایل‌های ربات را می‌خواند و نه آن‌ها را عوض می‌کند
+    tmp = Path(tempfile.mkdtemp(prefix="scinet_replay_"))
+    bot.STATE_FILE = tmp / "state.json"
+    bot.SKIP_FILE = tmp / "skip.journal"
+    bot.SEEN_FILE = tmp / "seen.json"
+    bot.state = bot.BotState()
+    bot.DRY_RUN = dry
+    # بدون پیش‌واکشی متادیتا: بنچ آفلاین است و به Crossref/OpenAlex زنده نمی‌زند
+    bot.META_PREFETCH_ENABLED = False
+
+    client = bot.SciNetClient()
+    client._detect_log_enabled = False
+    takes: list[str] = []
+    notified: list[dict] = []
+
+    async def fake_take(doi: str) -> bool:
+        if take_ms > 0:
+            await asyncio.sleep(take_ms / 1000.0)
+        takes.append(doi)
+        return True
+
+    async def fake_notify(payload: dict):
+        notified.append(payload)
+        # مثل start_download_process: پس از «دانلود» اسلات آزاد می‌شود
+        if hold_ms > 0:
+            await asyncio.sleep(hold_ms / 1000.0)
+        await client.release_slot(payload["doi"])
+
+    client._take = fake_take
+    client._notify_py = fake_notify
+
+    cdp = ReplayCDP(load_recording(path))
+    client._cdp = cdp
+    client._attach_cdp_handlers()
+
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    await cdp.play(speed=speed)
+    # صبر تا همهٔ تسک‌های هندلر تمام شوند
+    while True:
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        if not others:
+            break
+        await asyncio.gather(*others, return_exceptions=True)
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    await bot.META_PREFETCH.stop()
+
+    print(f"events={cdp.emitted} bodies={len(cdp.bodies)} wall={wall:.3f}s cpu={cpu:.3f}s "
+          f"events/s={cdp.emitted / max(wall, 1e-9):.0f}")
+    print(f"takes={len(takes)} notifies={len(notified)}")
+    print("bus:", json.dumps(client._bus.stats(), ensure_ascii=False))
+    print("snapshots:", json.dumps(client._snapshots.stats(), ensure_ascii=False))
+    print("pending:", json.dumps(client._pending.stats(), ensure_ascii=False))
+    print(client._latency.format_text())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", nargs="?", help="فایل ضبط .jsonl.gz")
+    ap.add_argument("--speed", type=float, default=1.0, help="1=زمان اصلی، 0=حداکثر سرعت")
+    ap.add_argument("--take-ms", type=float, default=0.0, help="تأخیر شبیه‌سازی‌شدهٔ /take")
+    ap.add_argument("--hold-ms", type=float, default=0.0, help="مدت نگه‌داشتن اسلات پس از اعلان")
+    ap.add_argument("--dry", action="store_true", help="بدون take (مثل SCINET_DRYRUN)")
+    ap.add_argument("--synthesize", metavar="OUT", help="ساخت یک ضبط مصنوعی و خروج")
+    args = ap.parse_args()
+
+    if args.synthesize:
+        synthesize(args.synthesize)
+        print(f"synthetic recording written: {args.synthesize}")
+        return
+    if not args.path:
+        ap.error("path لازم است")
+    asyncio.run(replay(args.path, args.speed, args.take_ms, args.hold_ms, args.dry))
+
+
+if __name__ == "__main__":
+    main()
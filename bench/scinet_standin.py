@@ -0,0 +1,241 @@
+# bench/scinet_standin.py
+"""
+سرور جایگزین محلی Sci-Net (aiohttp) با همان سطحی که ربات استفاده می‌کند:
+  - فرم لاگین (input[name=user]/input[name=pass]) و صفحهٔ .requests
+  - arequest('requests', cb) در صفحه + فید JSON در /requests و رویداد events.request
+  - /take/<doi> (برد: 200 صفحهٔ work، باخت: 302 به /requests) و /refuse/<doi>
+  - صفحهٔ جزئیات /<doi> با جریان آپلود upload_to_scinet (#progress، remove signatures، .clean > .button، submit)
+درخواست‌ها با نرخ قابل تنظیم تزریق می‌شوند و یک رقیب مجازی هر درخواست را پس از تأخیر مشخص take می‌کند.
+آمار در /__stats (JSON) در دسترس است.
+
+اجرای مستقل:
+    python bench/scinet_standin.py --port 8790 --rate 0.5 --competitor-ms 1500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import html
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+from urllib.parse import unquote
+
+from aiohttp import web
+
+SESSION_COOKIE = "connect.sid"
+
+_LOGIN_HTML = """<!doctype html><html><body>
+<form method="post" action="/login">
+  <input name="user"><input name="pass" type="password"><button type="submit">login</button>
+</form></body></html>"""
+
+_MAIN_HTML = """<!doctype html><html><head><script>
+window.events = window.events || {};
+window.events.request = window.events.request || [];
+window.arequest = window.arequest || function(endpoint, cb, params) {
+  return fetch('/' + endpoint, {credentials: 'include', headers: {'Accept': 'application/json'}})
+    .then(r => r.json()).then(resp => cb && cb(resp)).catch(() => {});
+};
+const shown = new Set();
+function render(resp) {
+  const box = document.querySelector('.requests');
+  for (const d of (resp && resp.docs) || []) {
+    if (shown.has(d._id)) continue;
+    shown.add(d._id);
+    for (const fn of window.events.request) { try { fn(d); } catch (e) {} }
+    const el = document.createElement('div'); el.textContent = d.doi; box && box.appendChild(el);
+  }
+}
+function tick() { window.arequest('requests', render); }
+document.addEventListener('DOMContentLoaded', () => { tick(); setInterval(tick, __POLL_MS__); });
+</script></head><body><div class="requests"></div></body></html>"""
+
+_DETAIL_HTML = """<!doctype html><html><body>
+<h1>__DOI__</h1>
+<input type="file" id="file">
+<div id="progress">progress</div>
+<div><div><div><div><div><div>remove signatures →</div></div></div></div></div></div>
+<div class="clean"><a class="button" href="#">clean</a></div>
+<a href="#" onclick="fetch('/submit/__DOI_URL__',{method:'POST',credentials:'include'});return false;">submit</a>
+<a class="button" href="/refuse/__DOI_URL__">X</a>
+</body></html>"""
+
+
+class StandIn:
+    def __init__(self, *, rate: float = 0.5, competitor_ms: float = 1500.0, competitor_jitter: float = 0.3,
+                 list_size: int = 50, pad_bytes: int = 0, poll_ms: int = 1000, seed: int = 1):
+        self.rate = rate
+        self.competitor_ms = competitor_ms
+        self.competitor_jitter = competitor_jitter
+        self.list_size = list_size
+        self.pad_bytes = pad_bytes
+        self.poll_ms = poll_ms
+        self.rnd = random.Random(seed)
+        self.sessions: set[str] = set()
+        self.requests: Dict[str, Dict[str, Any]] = {}
+        self.order: List[str] = []
+        self.stats: Dict[str, Any] = {"injected": 0, "won": 0, "lost": 0, "competitor": 0,
+                                      "refused": 0, "submitted": 0, "take_ms": [], "feed_polls": 0}
+        self._tasks: List[asyncio.Task] = []
+        self._n = 0
+
+    # ── app ────────────────────────────────────────────────
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/", self.index)
+        app.router.add_post("/login", self.login)
+        app.router.add_get("/requests", self.feed)
+        app.router.add_get("/take/{doi:.+}", self.take)
+        app.router.add_get("/refuse/{doi:.+}", self.refuse)
+        app.router.add_post("/submit/{doi:.+}", self.submit)
+        app.router.add_get("/work/{doi:.+}", self.detail)
+        app.router.add_get("/__stats", self.stats_view)
+        app.router.add_get("/favicon.ico", lambda r: web.Response(status=204))
+        app.router.add_get("/{doi:10\\..+}", self.detail)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        if self.rate > 0:
+            self._tasks.append(asyncio.create_task(self._inject_loop()))
+
+    async def _on_cleanup(self, app):
+        for t in self._tasks:
+            t.cancel()
+
+    def _authed(self, req: web.Request) -> bool:
+        return req.cookies.get(SESSION_COOKIE) in self.sessions
+
+    # ── request generation ────────────────────────────────
+    def inject(self) -> Dict[str, Any]:
+        self._n += 1
+        n = self._n
+        doi = f"10.{self.rnd.randint(1000, 9999)}/standin.{n}"
+        doc = {
+            "_id": uuid.uuid4().hex[:24],
+            "doi": doi,
+            "title": f"Stand-in request number {n} about reproducible measurement",
+            "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            "request": {"from": f"user{n % 17}", "reward": self.rnd.randint(1, 30)},
+        }
+        if self.pad_bytes:
+            doc["abstract"] = "x" * self.pad_bytes
+        self.requests[doi] = {"doc": doc, "status": "open", "t_created": time.monotonic()}
+        self.order.insert(0, doi)
+        self.stats["injected"] += 1
+        if self.competitor_ms >= 0:
+            j = self.competitor_jitter
+            delay = self.competitor_ms * self.rnd.uniform(1 - j, 1 + j) / 1000.0
+            asyncio.get_running_loop().call_later(delay, self._competitor_take, doi)
+        return doc
+
+    def _competitor_take(self, doi: str):
+        r = self.requests.get(doi)
+        if r and r["status"] == "open":
+            r["status"] = "competitor"
+            self.stats["competitor"] += 1
+
+    async def _inject_loop(self):
+        while True:
+            await asyncio.sleep(self.rnd.expovariate(self.rate))
+            self.inject()
+
+    # ── handlers ───────────────────────────────────────────
+    async def index(self, req: web.Request):
+        if not self._authed(req):
+            return web.Response(text=_LOGIN_HTML, content_type="text/html")
+        return web.Response(text=_MAIN_HTML.replace("__POLL_MS__", str(self.poll_ms)), content_type="text/html")
+
+    async def login(self, req: web.Request):
+        await req.post()
+        sid = uuid.uuid4().hex
+        self.sessions.add(sid)
+        resp = web.HTTPFound("/")
+        resp.set_cookie(SESSION_COOKIE, sid, path="/")
+        return resp
+
+    async def feed(self, req: web.Request):
+        if not self._authed(req):
+            return web.json_response({"error": "auth"}, status=401)
+        self.stats["feed_polls"] += 1
+        docs = [self.requests[d]["doc"] for d in self.order if self.requests[d]["status"] == "open"]
+        return web.json_response({"docs": docs[: self.list_size]}, dumps=lambda o: json.dumps(o, ensure_ascii=False))
+
+    async def take(self, req: web.Request):
+        if not self._authed(req):
+            raise web.HTTPFound("/")
+        doi = unquote(req.match_info["doi"])
+        r = self.requests.get(doi)
+        if not r or r["status"] != "open":
+            if r and r["status"] == "us":
+                return web.Response(text="already yours", content_type="text/html")
+            self.stats["lost"] += 1
+            raise web.HTTPFound("/requests")
+        r["status"] = "us"
+        self.stats["won"] += 1
+        self.stats["take_ms"].append((time.monotonic() - r["t_created"]) * 1000)
+        return web.Response(text=f"<html><body>work {html.escape(doi)}</body></html>", content_type="text/html")
+
+    async def refuse(self, req: web.Request):
+        doi = unquote(req.match_info["doi"])
+        r = self.requests.get(doi)
+        if r and r["status"] == "us":
+            r["status"] = "refused"
+            self.stats["refused"] += 1
+        raise web.HTTPFound("/requests")
+
+    async def submit(self, req: web.Request):
+        doi = unquote(req.match_info["doi"])
+        r = self.requests.get(doi)
+        if r:
+            r["status"] = "submitted"
+            self.stats["submitted"] += 1
+        return web.json_response({"ok": True})
+
+    async def detail(self, req: web.Request):
+        doi = unquote(req.match_info["doi"])
+        body = (_DETAIL_HTML.replace("__DOI_URL__", html.escape(doi))
+                .replace("__DOI__", html.escape(doi)))
+        return web.Response(text=body, content_type="text/html")
+
+    def summary(self) -> Dict[str, Any]:
+        s = dict(self.stats)
+        ms = sorted(s.pop("take_ms"))
+        pct = lambda q: round(ms[min(len(ms) - 1, int(q * (len(ms) - 1)))], 1) if ms else None
+        s["take_ms_p50"] = pct(0.5)
+        s["take_ms_p90"] = pct(0.9)
+        s["win_rate"] = round(s["won"] / s["injected"], 3) if s["injected"] else None
+        return s
+
+    async def stats_view(self, req: web.Request):
+        return web.json_response(self.summary())
+
+
+async def start_standin(port: int, **kw) -> tuple[StandIn, web.AppRunner]:
+    srv = StandIn(**kw)
+    runner = web.AppRunner(srv.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return srv, runner
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8790)
+    ap.add_argument("--rate", type=float, default=0.5, help="درخواست جدید در ثانیه")
+    ap.add_argument("--competitor-ms", type=float, default=1500.0, help="تأخیر take رقیب (منفی = بدون رقیب)")
+    ap.add_argument("--list-size", type=int, default=50)
+    ap.add_argument("--pad-bytes", type=int, default=0, help="حجم اضافهٔ هر داک در فید")
+    ap.add_argument("--poll-ms", type=int, default=1000)
+    args = ap.parse_args()
+    srv = StandIn(rate=args.rate, competitor_ms=args.competitor_ms, list_size=args.list_size,
+                  pad_bytes=args.pad_bytes, poll_ms=args.poll_ms)
+    web.run_app(srv.app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# bench/skip_registry.py
+"""
+میکروبنچمارک رجیستری skip در اندازه‌های 10k / 100k / 1M.
+مسیر قدیم: list + «doi not in skip» (اسکن خطی) + بازنویسی کل state.json در هر افزودن
+مسیر جدید: SkipRegistry (set + ژورنال فقط-افزودنی، فشرده‌سازی دوره‌ای)
+
+اجرا:
+    python bench/skip_registry.py [-s 10000 100000 1000000] [-n 200]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.utils.skip_registry import SkipRegistry
+
+
+def _dois(n: int, start: int = 0) -> list[str]:
+    return [f"10.{1000 + i % 9000}/j.bench.{i}" for i in range(start, start + n)]
+
+
+def _ns_per(fn, items) -> float:
+    t0 = time.perf_counter_ns()
+    for x in items:
+        fn(x)
+    return (time.perf_counter_ns() - t0) / max(1, len(items))
+
+
+def bench(size: int, n: int, tmp: Path):
+    dois = _dois(size)
+    hits = dois[:: max(1, size // n)][:n]
+    misses = _dois(n, start=size * 2)
+    new = _dois(n, start=size * 3)
+
+    # ── قدیم ──
+    legacy = list(dois)
+    state_file = tmp / f"state_{size}.json"
+    lookups = max(5, n // 20) if size >= 1_000_000 else n   # اسکن خطی 1M کند است
+    hit_ns = _ns_per(lambda d: d in legacy, hits[-lookups:])
+    miss_ns = _ns_per(lambda d: d in legacy, misses[:lookups])
+    writes = max(3, n // 50) if size >= 100_000 else n
+    t0 = time.perf_counter()
+    for d in new[:writes]:
+        if d not in legacy:
+            legacy.append(d)
+        state_file.write_text(json.dumps({"skip": legacy, "active": d, "initialized": True,
+                                          "enabled": True}, ensure_ascii=False))
+    save_us = (time.perf_counter() - t0) / writes * 1e6
+    t0 = time.perf_counter()
+    json.loads(state_file.read_text())
+    load_ms = (time.perf_counter() - t0) * 1000
+    print(f"  list+json      in(hit)={hit_ns / 1000:10.1f}µs in(miss)={miss_ns / 1000:10.1f}µs "
+          f"add+save={save_us:10.1f}µs load={load_ms:8.1f}ms file={state_file.stat().st_size / 1e6:.1f}MB")
+
+    # ── جدید ──
+    journal = tmp / f"skip_{size}.journal"
+    reg = SkipRegistry(journal)
+    reg.update(dois)
+    reg.close()
+    t0 = time.perf_counter()
+    reg = SkipRegistry(journal)
+    load_ms = (time.perf_counter() - t0) * 1000
+    hit_ns = _ns_per(lambda d: d in reg, hits)
+    miss_ns = _ns_per(lambda d: d in reg, misses)
+    add_us = _ns_per(reg.add, new) / 1000
+    t0 = time.perf_counter()
+    reg.compact()
+    compact_ms = (time.perf_counter() - t0) * 1000
+    reg.close()
+    print(f"  SkipRegistry   in(hit)={hit_ns / 1000:10.3f}µs in(miss)={miss_ns / 1000:10.3f}µs "
+          f"add+append={add_us:8.1f}µs load={load_ms:8.1f}ms compact={compact_ms:8.1f}ms "
+          f"file={journal.stat().st_size / 1e6:.1f}MB")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-s", "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("-n", type=int, default=200, help="تعداد lookup/افزودن در هر اندازه")
+    args = ap.parse_args()
+    tmp = Path(tempfile.mkdtemp(prefix="skip_bench_"))
+    try:
+        for size in args.sizes:
+            print(f"size={size:,}")
+            bench(size, args.n, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
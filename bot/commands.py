@@ -5,7 +5,7 @@ from telegram.ext import ContextTypes, CommandHandler
 from functools import wraps
 
 from scinet_bot_fast import is_owner  
-from scinet_bot_fast import state, SciNetClient  
+from scinet_bot_fast import SciNetClient  
 
 def admin_only(func):
     @wraps(func)
@@ -25,10 +25,14 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     iran_page = app.bot_data.get("iran_page")
     giga_page = app.bot_data.get("giga_page")
     monitor_task = app.bot_data.get("monitor_task")
+    # state در main() ساخته می‌شود؛ هنگام اجرای دستور از ماژول خوانده شود
+    from scinet_bot_fast import state
     s = []
     s.append("🔎 وضعیت ربات:")
     s.append(f"• فعال: {'بله' if state.enabled else 'خیر'}")
     s.append(f"• DOI فعلی: {state.active or 'هیچ'}")
+    if client is not None:
+        s.append(f"• اسلات‌های take: {len(client._slots.held())}/{client._slots.capacity}")
     s.append(f"• IranPaper tab: {'باز' if iran_page and not iran_page.is_closed() else 'بسته'}")
     s.append(f"• GigaLib tab: {'باز' if giga_page and not giga_page.is_closed() else 'بسته'}")
     s.append(f"• مانیتورینگ: {'درحال اجرا' if monitor_task and not monitor_task.done() else 'غیرفعال'}")
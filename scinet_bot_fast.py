@@ -3,23 +3,37 @@
 
 from __future__ import annotations
 import asyncio, json, logging, os, sys, functools, time, html, random
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field
 from pathlib import Path
 from textwrap import dedent
 from typing import Dict, Any, Optional
 from urllib.parse import urljoin, quote
-from src.downloader.iranpaper import iranpaper_download
+from src.downloader.iranpaper import iranpaper_download, iranpaper_lookup, iranpaper_fetch
 
-from src.worker import WorkerPool
+from src.worker import WorkerPool, MAX_CONCURRENT_DOWNLOADS
 import uuid
 sys.path.append(os.path.dirname(__file__))
 
-import base64, re
+import base64
+from collections import Counter
 
-from src.downloader.gigalib import gigalib_login, gigalib_download
+from src.downloader.gigalib import gigalib_login, gigalib_download, gigalib_lookup, gigalib_fetch
+from src.downloader.speculative import SpeculativeLookups
+from src.metadata import MetadataSession, MetadataCache, HedgedResolver, MetadataPrefetcher, is_negative
 from src.utils.stealth import human_sleep, human_type
 from src.downloader.iranpaper import iranpaper_login, IranPaperClient
 from src.pdf_cleaner import clean_pdf_watermarks_async
+from src.detect import (DetectionBus, PendingTable, SnapshotDiffer, LatencyTracker, TakeSlots,
+                        CandidateRanker, scan_dois, normalize_doi)
+from src.detect.poller import DirectPoller
+from src.detect.taker import DirectTaker, WON, LOST, ERROR, TAKE_BODY_LIMIT, classify_take
+from src.detect.rules import RuleSet
+from src.detect.negcache import REASON_DOI, REASON_PREFIX, NegativeCache
+from src.detect.recorder import CdpRecorder
+from src.utils.cookies import load_storage_cookies
+from src.utils import jsonfast
+from src.utils.skip_registry import SkipRegistry
+from src.utils.persist import CoalescedWriter
 
 
 import aiohttp
@@ -34,6 +48,7 @@ from telegram.ext import (
 )
 load_dotenv()
 from src.config.download_policy import get_policy
+from src.config.response_filter import get_response_filter
 POLICY = get_policy()
 DRY_RUN = POLICY.dry_run
 
@@ -42,6 +57,13 @@ DRY_RUN = POLICY.dry_run
 DOWNLOAD_DIR = Path(os.getenv("DOWNLOAD_DIR", "./downloads"))
 SCINET_URL   = "https://sci-net.xyz/"
 STATE_FILE   = Path(os.getenv("SCINET_STATE_FILE", "state.json"))
+# ژورنال فقط-افزودنی DOIهای رسیدگی‌شده (skip)؛ SKIP_MAX_AGE_DAYS=0 یعنی نگه‌داشتن برای همیشه
+SKIP_FILE    = Path(os.getenv("SCINET_SKIP_FILE", "skip.journal"))
+SKIP_MAX_AGE = float(os.getenv("SKIP_MAX_AGE_DAYS", "0")) * 86400
+# فقط این تعداد DOI اخیر در init script صفحه قرار می‌گیرد؛ بقیه را __claim_py در پایتون رد می‌کند
+SKIP_PAGE_WINDOW = int(os.getenv("SKIP_PAGE_WINDOW", "512"))
+# تجمیع ذخیره‌های state: حداکثر یک نوشتن (اتمیک، در thread پس‌زمینه) در هر بازه
+STATE_SAVE_INTERVAL = float(os.getenv("STATE_SAVE_INTERVAL", "0.5"))
 
 TG_TOKEN     = os.getenv("TELEGRAM_BOT_TOKEN")
 TG_CHAT      = int(os.getenv("SCINET_GROUP_CHAT_ID", "0"))
@@ -56,6 +78,68 @@ IRANPAPER_PASS = os.getenv("IRANPAPER_PASS")
 
 HEADFUL      = os.getenv("HEADFUL", "0") == "1"     
 
+# سقف جدول پاسخ‌های منتظر CDP (ثانیه / تعداد)
+CDP_PENDING_TTL = float(os.getenv("CDP_PENDING_TTL", "60"))
+CDP_PENDING_MAX = int(os.getenv("CDP_PENDING_MAX", "512"))
+
+# دیده‌های گذرگاه تشخیص: سقف LRU، TTL (ثانیه) و snapshot روی دیسک برای عبور از recovery/ری‌استارت
+SEEN_MAX = int(os.getenv("SEEN_MAX", "50000"))
+SEEN_TTL = float(os.getenv("SEEN_TTL", str(6 * 3600)))
+SEEN_FILE = Path(os.getenv("SEEN_FILE", "seen.json"))
+SEEN_SNAPSHOT_INTERVAL = float(os.getenv("SEEN_SNAPSHOT_INTERVAL", "30"))
+
+# Poller مستقیم HTTP (اختیاری) برای فید درخواست‌ها، مستقل از رفرش صفحه
+DIRECT_POLL          = os.getenv("DIRECT_POLL", "0") == "1"
+DIRECT_POLL_URL      = os.getenv("DIRECT_POLL_URL", urljoin(SCINET_URL, "requests"))
+DIRECT_POLL_INTERVAL = float(os.getenv("DIRECT_POLL_INTERVAL", "2.0"))
+
+# اجرای /take از پایتون روی استخر اتصال گرم (فالو‌بک: page.evaluate)
+DIRECT_TAKE         = os.getenv("DIRECT_TAKE", "1") == "1"
+DIRECT_TAKE_TIMEOUT = float(os.getenv("DIRECT_TAKE_TIMEOUT", "5.0"))
+
+# lookup گمانه‌زنانهٔ منبع دانلود همزمان با /take (جستجو تا لینک PDF، بدون دریافت)؛ بودجه به ثانیه
+SPEC_LOOKUP        = os.getenv("SPEC_LOOKUP", "1") == "1"
+SPEC_LOOKUP_BUDGET = float(os.getenv("SPEC_LOOKUP_BUDGET", "20"))
+# سقف انتظار برای دکمهٔ دانلود روی صفحهٔ آماده‌شده؛ اگر کهنه بود، مسیر کامل اجرا می‌شود
+SPEC_FETCH_TIMEOUT_MS = int(os.getenv("SPEC_FETCH_TIMEOUT_MS", "5000"))
+
+# استخر HTTP مشترک متادیتا (Crossref/OpenAlex): سقف اتصال هر میزبان و کش DNS
+META_LIMIT_PER_HOST = int(os.getenv("META_LIMIT_PER_HOST", "8"))
+META_DNS_TTL        = int(os.getenv("META_DNS_TTL", "600"))
+# warm دوره‌ای اتصال‌ها؛ پیش‌فرض خاموش، چون بی‌وقفه به APIهای عمومی درخواست می‌زند
+META_WARM           = os.getenv("META_WARM", "0") == "1"
+META_WARM_INTERVAL  = float(os.getenv("META_WARM_INTERVAL", "45"))
+# کش ماندگار متادیتا (SQLite + LRU)؛ TTL نتیجهٔ مثبت/منفی به ثانیه
+META_CACHE_FILE    = Path(os.getenv("META_CACHE_FILE", "metadata_cache.sqlite3"))
+META_CACHE_POS_TTL = float(os.getenv("META_CACHE_POS_TTL", str(30 * 86400)))
+META_CACHE_NEG_TTL = float(os.getenv("META_CACHE_NEG_TTL", "3600"))
+META_CACHE_LRU     = int(os.getenv("META_CACHE_LRU", "512"))
+# سقف کل انتظار متادیتا و فیلدهایی که با رسیدنشان (از هر منبع) بدون منتظر منبع کندتر برمی‌گردیم
+META_DEADLINE        = float(os.getenv("META_DEADLINE", "5.0"))
+META_REQUIRED_FIELDS = tuple(f.strip() for f in os.getenv("META_REQUIRED_FIELDS", "title,type").split(",") if f.strip())
+# پیش‌واکشی متادیتای DOIهای هر snapshot از /requests (OpenAlex چند-DOI + Crossref با همزمانی محدود)
+META_PREFETCH_ENABLED     = os.getenv("META_PREFETCH", "1") == "1"
+META_PREFETCH_BATCH       = int(os.getenv("META_PREFETCH_BATCH", "50"))
+META_PREFETCH_CONCURRENCY = int(os.getenv("META_PREFETCH_CONCURRENCY", "4"))
+
+# اعلان «رزرو شد» و شروع دانلود بلافاصله پس از take؛ متادیتا بعداً پیام را ویرایش می‌کند و قواعد post
+# موازی با دانلود اجرا می‌شوند (رد شدن → لغو دانلود پیش از آپلود). 0 = رفتار قدیمی (اول متادیتا)
+NOTIFY_FIRST = os.getenv("NOTIFY_FIRST", "1") == "1"
+
+# قواعد اعلانی پیش/پس از take (JSON)؛ اگر فایل نباشد، قواعد پیش‌فرض. با /rules reload بارگذاری مجدد می‌شود
+TAKE_RULES_FILE = Path(os.getenv("TAKE_RULES_FILE", "take_rules.json"))
+
+# تعداد اسلات‌های همزمان take/دانلود؛ 0 = خودکار از تب‌های منبع و MAX_CONCURRENT_DOWNLOADS
+TAKE_SLOTS = int(os.getenv("TAKE_SLOTS", "0"))
+
+# ضبط رویدادهای CDP برای بازپخش آفلاین (bench/replay_cdp.py)؛ خالی = خاموش
+CDP_RECORD = os.getenv("CDP_RECORD", "").strip()
+
+SESSION_FILE = Path("session_giga_iran.json")
+USER_AGENT   = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/121.0.0.0 Safari/537.36")
+
 
 
 
@@ -146,20 +230,49 @@ def is_owner(uid:int)->bool:
 # ── State ───────────────────────────────────────────────────
 @dataclass(slots=True)
 class BotState:
-    skip: list[str] = field(default_factory=list)
+    # skip در state.json نیست؛ هر DOI تازه فقط یک خط به SKIP_FILE اضافه می‌کند
+    skip: SkipRegistry = field(default_factory=lambda: SkipRegistry(SKIP_FILE, max_age=SKIP_MAX_AGE,
+                                                                    recent_size=SKIP_PAGE_WINDOW))
     active: Optional[str] = None
     initialized: bool = False
     enabled: bool = True
-    def save(self): STATE_FILE.write_text(json.dumps(asdict(self), ensure_ascii=False))
+    _persist: Optional[CoalescedWriter] = field(default=None, repr=False, compare=False)
+    def __post_init__(self):
+        self._persist = CoalescedWriter(STATE_FILE, self._dump, interval=STATE_SAVE_INTERVAL, name="bot_state")
+    def _dump(self) -> bytes:
+        return json.dumps({"active": self.active, "initialized": self.initialized, "enabled": self.enabled},
+                          ensure_ascii=False).encode("utf-8")
+    def save(self):
+        # روی loop هیچ I/O ای نیست؛ نوشتن در thread پس‌زمینهٔ _persist
+        self._persist.mark()
+    def close(self):
+        """shutdown: تغییرات باقی‌مانده همزمان نوشته و ژورنال skip بسته می‌شود."""
+        self._persist.close()
+        self.skip.close()
     @classmethod
     def load(cls):
         try:
-            return cls(**json.loads(STATE_FILE.read_text())) if STATE_FILE.exists() else cls()
+            data = json.loads(STATE_FILE.read_text()) if STATE_FILE.exists() else {}
         except Exception:
-            return cls()
-state = BotState.load()
+            logger.warning("state file %s unreadable; starting from defaults", STATE_FILE, exc_info=True)
+            data = {}
+        st = cls(**{k: data[k] for k in ("active", "initialized", "enabled") if k in data})
+        # مهاجرت: لیست skip قدیمی state.json به ژورنال منتقل می‌شود. load چیزی در state.json
+        # نمی‌نویسد؛ کلید قدیمی در اولین save عادی حذف می‌شود و تا آن موقع مهاجرت تکراری بی‌اثر است
+        legacy = data.get("skip")
+        if isinstance(legacy, list):
+            st.skip.update(x for x in legacy if isinstance(x, str))
+        return st
+# در main() بارگذاری می‌شود تا import ماژول (تست‌ها، بنچ) state.json و ژورنال skip را لمس نکند
+state: Optional[BotState] = None
 
 # ── متادیتا Crossref/OpenAlex ───────────────────────────────
+# یک session ماندگار برای همهٔ درخواست‌های متادیتا؛ در main بسته می‌شود
+META_HTTP = MetadataSession(limit_per_host=META_LIMIT_PER_HOST, dns_ttl=META_DNS_TTL)
+META_HOSTS = ("https://api.crossref.org/", "https://api.openalex.org/")
+# در main() باز می‌شود تا import ماژول فایل SQLite در cwd نسازد
+META_CACHE: Optional[MetadataCache] = None
+
 @dbg
 async def xref(sess: aiohttp.ClientSession, doi: str):
     try:
@@ -179,24 +292,45 @@ async def xref(sess: aiohttp.ClientSession, doi: str):
         logger.debug("⚠️ Crossref error %s", e)
         return "", "", None, "", ""
 
+def _oalex_fields(m: dict):
+    return (
+        m.get("title") or "",
+        ((m.get("primary_location") or {}).get("source") or {}).get("display_name", ""),
+        m.get("publication_year"),
+        m.get("abstract_inverted_index") or "",
+        m.get("type") or ""
+    )
+
 @dbg
 async def oalex(sess: aiohttp.ClientSession, doi: str):
     try:
         async with sess.get(f"https://api.openalex.org/works/doi:{doi}", timeout=8) as r:
             if not (200 <= r.status < 300):
                 return "", "", None, "", ""
-            m = await r.json()
-            return (
-                m.get("title", ""),
-                m.get("primary_location", {}).get("source", {}).get("display_name", ""),
-                m.get("publication_year"),
-                m.get("abstract_inverted_index", ""),
-                m.get("type", "")
-            )
+            return _oalex_fields(await r.json())
     except Exception as e:
         logger.debug("⚠️ OpenAlex error %s", e)
         return "", "", None, "", ""
 
+async def oalex_batch(sess: aiohttp.ClientSession, dois: list[str]) -> Dict[str, Dict[str, Any]]:
+    """چند DOI در یک درخواست OpenAlex (filter=doi:a|b|...)؛ کلید خروجی DOI نرمال‌شده."""
+    params = {
+        "filter": "doi:" + "|".join("https://doi.org/" + normalize_doi(d) for d in dois),
+        "per-page": str(max(len(dois), 1)),
+        "select": "doi,title,type,publication_year,primary_location,abstract_inverted_index",
+    }
+    async with sess.get("https://api.openalex.org/works", params=params, timeout=15) as r:
+        if not (200 <= r.status < 300):
+            logger.debug("⚠️ OpenAlex batch status %s", r.status)
+            return {}
+        data = await r.json()
+    out: Dict[str, Dict[str, Any]] = {}
+    for m in data.get("results") or []:
+        title, journal, year, abstract, type_ = _oalex_fields(m)
+        out[normalize_doi(m.get("doi"))] = {"title": title, "journal": journal, "year": year,
+                                           "abstract": _openalex_abs_to_text(abstract), "type": type_}
+    return out
+
 def _openalex_abs_to_text(inv):
     """abstract_inverted_index را به متن خوانا تبدیل می‌کند."""
     if not isinstance(inv, dict):
@@ -209,25 +343,54 @@ def _openalex_abs_to_text(inv):
             if 0 <= i < len(arr):
                 arr[i] = word
     return " ".join(w for w in arr if w)
-@dbg
-async def metadata(doi:str) -> Dict[str, Any]:
-    async with aiohttp.ClientSession(headers={"User-Agent":"doi-bot/fast"}) as s:
-        cr, oa = await asyncio.gather(xref(s, doi), oalex(s, doi))
+async def _xref_meta(doi: str) -> Dict[str, Any]:
+    title, journal, year, abstract, type_ = await xref(META_HTTP.get(), doi)
+    return {"title": title, "journal": journal, "year": year, "abstract": abstract, "type": type_}
 
-    abs_cr = cr[3] if cr and len(cr) >= 4 else ""
-    abs_oa_raw = oa[3] if oa and len(oa) >= 4 else ""
-    abs_oa = _openalex_abs_to_text(abs_oa_raw)
-
-    type_val = (cr[4] or oa[4]) if (cr and oa) else (cr[4] if cr else (oa[4] if oa else ""))
+async def _oalex_meta(doi: str) -> Dict[str, Any]:
+    title, journal, year, abstract, type_ = await oalex(META_HTTP.get(), doi)
+    return {"title": title, "journal": journal, "year": year,
+            "abstract": _openalex_abs_to_text(abstract), "type": type_}
 
+def _finalize_meta(m: Dict[str, Any]) -> Dict[str, Any]:
     return {
-        "title":   (cr[0] or oa[0] or "—"),
-        "journal": (cr[1] or oa[1]),
-        "year":    (cr[2] or oa[2]),
-        "abstract": (abs_cr or abs_oa or ""),
-        "type":    (type_val or ""),
+        "title":   (m.get("title") or "—"),
+        "journal": (m.get("journal") or ""),
+        "year":    m.get("year"),
+        "abstract": (m.get("abstract") or ""),
+        "type":    (m.get("type") or ""),
     }
 
+def _store_meta(doi: str, m: Dict[str, Any]):
+    META_CACHE.put(doi, _finalize_meta(m))
+
+# Crossref مقدم بر OpenAlex (ترتیب ادغام فیلدها)؛ منبع دیرتر فقط جاهای خالی کش را پر می‌کند
+META_RESOLVER = HedgedResolver(
+    {"crossref": _xref_meta, "openalex": _oalex_meta},
+    deadline=META_DEADLINE, required=META_REQUIRED_FIELDS, on_fill=_store_meta,
+)
+META_PREFETCH = MetadataPrefetcher(
+    batch_fetch=lambda dois: oalex_batch(META_HTTP.get(), dois), one_fetch=_xref_meta,
+    store=_store_meta, has=lambda doi: META_CACHE.has(doi),
+    batch_size=META_PREFETCH_BATCH, concurrency=META_PREFETCH_CONCURRENCY,
+)
+
+@dbg
+async def metadata(doi:str) -> Dict[str, Any]:
+    # اگر همین DOI در batch پیش‌واکشی است، به‌جای درخواست دوباره منتظر همان بمان
+    await META_PREFETCH.wait(doi, META_DEADLINE)
+    cached = META_CACHE.get(doi)
+    # ردیف منفی («—»؛ شاید فقط قطعی موقت API) برای قواعد post معتبر نیست؛ دوباره بگیر
+    if cached is not None and not is_negative(cached):
+        return cached
+
+    meta = _finalize_meta(await META_RESOLVER.resolve(doi))
+    # نتیجهٔ خالی (هر دو منبع خطا یا deadline پیش از هر پاسخی) معتبر نیست و کش نمی‌شود؛
+    # اگر منبع دیرتری بعداً چیزی بیاورد، on_fill همان را ثبت می‌کند
+    if not is_negative(meta):
+        META_CACHE.put(doi, meta)
+    return meta
+
 
 class SciNetClient:
     def __init__(self):
@@ -235,10 +398,40 @@ class SciNetClient:
         self._pw = None
         self._browser = None
         self._cdp = None
-        self._seen_ids: set[str] = set()
-        self._seen_dois: set[str] = set()
-        self._doi_re = re.compile(r"\b10\.\d{4,9}/[-._;()/:A-Z0-9]+\b", re.I)
+        # همهٔ منابع تشخیص از این گذرگاه رد می‌شوند (ضدتکرار single-flight)
+        self._bus = DetectionBus(self._dispatch_detected, max_size=SEEN_MAX, ttl=SEEN_TTL)
+        restored = self._bus.restore(SEEN_FILE)
+        if restored:
+            logger.info("Seen sets restored | %d keys from %s", restored, SEEN_FILE)
+        # snapshot دیده‌ها در thread پس‌زمینه، حداکثر یک بار در هر SEEN_SNAPSHOT_INTERVAL
+        self._seen_persist = CoalescedWriter(SEEN_FILE, self._bus.dump, interval=SEEN_SNAPSHOT_INTERVAL, name="seen")
+        self._bus.on_change = self._seen_persist.mark
+        # شمارندهٔ پیش‌فیلتر بدنه‌های CDP (staged/skipped)
+        self._body_filter_stats: Counter[str] = Counter()
+        # ایندکس آخرین snapshot لیست /requests (فقط داک‌های جدید/تغییرکرده پردازش می‌شوند)
+        self._snapshots = SnapshotDiffer()
+        # زمان‌سنجی مراحل تشخیص → take برای هر منبع (/latency)
+        self._latency = LatencyTracker()
         self._keepalive_task: asyncio.Task | None = None
+        self._poller: DirectPoller | None = None
+        self._taker: DirectTaker | None = None
+        # ظرفیت take (جایگزین window.busy)؛ اندازه در main از منابع دانلود تعیین می‌شود
+        self._slots = TakeSlots(1)
+        # قواعد مشترک پیش/پس از take (پایتون + observer صفحه)
+        self._rules = RuleSet(TAKE_RULES_FILE)
+        # init script فعلی قواعد در صفحه؛ با reload جایگزین می‌شود، نه اینکه روی قبلی انباشته شود
+        self._rules_script = None
+        # رتبه‌بندی کاندیدهای هر batch و صف کاندیدهای معوق (بدون اسلات آزاد)
+        self._ranker = CandidateRanker(rules=self._rules)
+        # DOI/پیشوندهایی که هیچ منبعی پیدایشان نکرد → پیش از take رد (بدون take → cancel)
+        self._negcache = NegativeCache()
+        # جستجوی منبع دانلود همزمان با take؛ با باخت لغو می‌شود
+        self._spec = SpeculativeLookups(SPEC_LOOKUP_BUDGET, lambda pg: page_lock(pg))
+        # مسیر هر take (direct/page) و نتیجه‌اش؛ در /diag
+        self._take_paths: Counter[str] = Counter()
+        # DOIهایی که در پنجرهٔ skipSet صفحه نبودند ولی __claim_py در رجیستری پایتون ردشان کرد
+        self._skip_py_rejects = 0
+        self._recorder: CdpRecorder | None = CdpRecorder(CDP_RECORD) if CDP_RECORD else None
         # لاگ تشخیص‌ها را حتی در حالت غیر DEBUG هم می‌توان روشن گذاشت
         self._detect_log_enabled = os.getenv("DETECT_LOG", "1") == "1"
 
@@ -267,18 +460,52 @@ class SciNetClient:
     async def start(self):
         self._pw = await async_playwright().start()
         await self._launch_browser()
+        if DIRECT_POLL:
+            self._poller = DirectPoller(
+                DIRECT_POLL_URL, self._on_polled_body, self._export_cookies,
+                interval=DIRECT_POLL_INTERVAL, user_agent=USER_AGENT,
+            )
+            self._poller.start()
+            logger.info("Direct poller started | url=%s interval=%.1fs", DIRECT_POLL_URL, DIRECT_POLL_INTERVAL)
+        if DIRECT_TAKE and not DRY_RUN:
+            self._taker = DirectTaker(
+                SCINET_URL, self._export_cookies,
+                timeout=DIRECT_TAKE_TIMEOUT, user_agent=USER_AGENT,
+            )
+            self._taker.start()
+
+    async def shutdown(self):
+        if self._poller:
+            await self._poller.stop()
+        if self._taker:
+            await self._taker.stop()
+        if self._recorder:
+            self._recorder.close()
+        self._seen_persist.close()
+        self._ranker.close()
+        self._negcache.close()
+
+    async def _export_cookies(self) -> list[dict]:
+        """کوکی‌های زندهٔ کانتکست؛ اگر مرورگر در حال بازیابی است، از storage_state."""
+        try:
+            if self.page and not self.page.is_closed():
+                return await self.page.context.cookies(SCINET_URL)
+        except Exception:
+            pass
+        return load_storage_cookies(SESSION_FILE)
+
+    async def _on_polled_body(self, url: str, body: bytes):
+        await self._process_body(url, body, src_prefix="poll", marks={"event": time.monotonic()})
 
     @dbg
     async def _launch_browser(self):
-        ua = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-              "AppleWebKit/537.36 (KHTML, like Gecko) "
-              "Chrome/121.0.0.0 Safari/537.36")
+        ua = USER_AGENT
 
         self._browser = await self._pw.chromium.launch(
             headless=not HEADFUL,
             args=["--disable-extensions"] + ([] if HEADFUL else ["--disable-gpu"])
         )
-        session_file = Path("session_giga_iran.json")
+        session_file = SESSION_FILE
         ctx_kwargs = dict(user_agent=ua, bypass_csp=True)
         if session_file.exists():
             ctx_kwargs["storage_state"] = str(session_file)
@@ -309,6 +536,13 @@ class SciNetClient:
         self.page.on("crash", lambda *_: asyncio.create_task(self._recover("page crash")))
         self.page.on("close", lambda *_: asyncio.create_task(self._recover("page closed")))
         await self.page.expose_function("__notify_py", self._notify_py)
+        await self.page.expose_function("__claim_py", self._claim_from_page)
+        await self.page.expose_function("__classify_take_py", self._classify_take_from_page)
+        await self.page.expose_function("__acquire_slot_py", self._acquire_slot)
+        await self.page.expose_function("__release_slot_py", self.release_slot)
+        await self.page.expose_function("__rank_py", self._rank_from_page)
+        await self.page.expose_function("__defer_py", self._defer_from_page)
+        await self.page.expose_function("__rules_error_py", self._rules.record_js_errors)
 
         try:
             await self._login()
@@ -417,10 +651,12 @@ class SciNetClient:
         while True:
             try:
                 await asyncio.sleep(delay)
-                # ریستِ دیده‌ها تا تداخل نشه
-                self._seen_ids.clear()
-                self._seen_dois.clear()
+                # دیده‌ها نگه داشته می‌شوند (فقط منقضی‌ها حذف) تا اولین snapshot پس از بازیابی
+                # کل لیست را دوباره به handler نفرستد
+                self._bus.prune()
                 await self._launch_browser()
+                if self._taker:
+                    self._taker.invalidate_cookies()  # کانتکست تازه = کوکی تازه
                 break
             except Exception:
                 logger.exception("Recovery retry failed; next in %ds", delay)
@@ -441,7 +677,7 @@ class SciNetClient:
     @dbg
     async def _enable_ultrafast_request_listener(self):
 
-        import asyncio, json, base64, time as _t
+        import asyncio, json, base64
         p = self.page; assert p
         self._cdp = await p.context.new_cdp_session(p)
         try:
@@ -452,18 +688,83 @@ class SciNetClient:
         except Exception:
             await self._cdp.send("Network.enable", {})
 
-        dry = DRY_RUN
-        self._pending: dict[str, dict] = {}
-        DOI_RE = self._doi_re
+        self._attach_cdp_handlers()
+        body_filter = get_response_filter()
+        _process_body = self._process_body
 
-        async def _handle_matches(src: str, url: str, text: str):
-            matches = DOI_RE.findall(text or "")
-            if matches:
-                self._log_detect(src=src, url=url or "", doi=",".join(matches), note="regex")
-                for m in matches:
-                    await self._handle_new_request_payload({"doi": m}, dry=dry, is_doc=True)
+        # فالو‌بک Playwright
+        async def _pw_on_response(resp):
+            try:
+                t_event = time.monotonic()
+                url = resp.url or ""
+                raw = b""
+                ctype = (resp.headers or {}).get("content-type", "")
+                if not body_filter.should_fetch(resp.request.resource_type, ctype, url):
+                    return
+                if "application/json" in ctype.lower():
+                    raw = await resp.body()
+                await _process_body(url, raw, src_prefix="pw", marks={"event": t_event, "body": time.monotonic()})
+            except Exception:
+                if DEBUG_MODE: logger.exception("pw response fallback")
+
+        p.on("response", lambda r: asyncio.create_task(_pw_on_response(r)))
 
-        async def on_request(params: dict):
+    async def _handle_matches(self, src: str, url: str, text: str | bytes, marks: dict | None = None):
+        matches = scan_dois(text)
+        if matches:
+            self._log_detect(src=src, url=url or "", doi=",".join(matches), note="regex")
+            for m in matches:
+                self._bus.publish(src, {"doi": m}, is_doc=True, marks=marks)
+
+    async def _process_body(self, url: str, body: str | bytes, src_prefix: str = "cdp",
+                            marks: dict | None = None):
+        """مسیر مشترک بدنه‌های CDP، فالو‌بک Playwright و poller مستقیم؛ به اتصال CDP وابسته نیست."""
+        lurl = (url or "").lower()
+
+        # 1) لیستی: /requests
+        if "/requests" in lurl:
+            docs = self._snapshots.process(url, body)
+            if docs is not None:
+                if META_PREFETCH_ENABLED and docs:
+                    # متادیتای همهٔ DOIهای تازه در پس‌زمینه؛ پس از take قواعد post محلی اجرا می‌شوند
+                    META_PREFETCH.submit(str(d.get("doi")) for d in docs if isinstance(d, dict) and d.get("doi"))
+                # بهترین کاندید زودتر اسلات می‌گیرد (تسک‌ها به همین ترتیب اجرا می‌شوند)
+                for doc in self._ranker.rank(docs):
+                    if isinstance(doc, dict) and doc.get("doi"):
+                        self._log_detect(src=f"{src_prefix}_resp_list", url=url, doi=str(doc.get("doi")), note="docs[]")
+                    self._bus.publish(f"{src_prefix}_resp_list", doc, is_doc=True, marks=marks)
+                return
+
+        # 2) تکی: /request
+        if "/request" in lurl:
+            try:
+                data = jsonfast.loads(body or "{}")
+                node = (data.get("success") or {}).get("data") or data.get("data")
+                if isinstance(node, dict):
+                    if node.get("doi"):
+                        self._log_detect(src=f"{src_prefix}_resp_single", url=url, doi=str(node.get("doi")), note="success.data")
+                    self._bus.publish(f"{src_prefix}_resp_single", node, is_doc=False, marks=marks)
+                    return
+            except Exception:
+                pass
+
+        # 3) عمومی‌تر: /api/* ، /graphql و هرچیزی → Regex
+        await self._handle_matches(f"{src_prefix}_resp_generic", url, body, marks)
+
+    def _attach_cdp_handlers(self):
+        """
+        هندلرهای رویدادهای Network را روی self._cdp ثبت می‌کند.
+        جدا از ساخت سشن CDP است تا بازپخش (src/detect/recorder.ReplayCDP) هم از همین مسیر رد شود.
+        """
+        self._pending = PendingTable(ttl=CDP_PENDING_TTL, max_size=CDP_PENDING_MAX)
+        bus = self._bus
+        body_filter = get_response_filter()
+        cdp = self._cdp
+        rec = self._recorder
+        if rec is not None:
+            rec.new_session()
+
+        async def on_request(params: dict, t_event: float):
             try:
                 req  = (params or {}).get("request", {}) or {}
                 url  = req.get("url") or ""
@@ -471,47 +772,14 @@ class SciNetClient:
                 if not (url or post):
                     return
                 blob = f"{url}\n{post}"
-                matches = DOI_RE.findall(blob)
+                matches = scan_dois(blob)
                 if matches:
                     self._log_detect(src="cdp_req", url=url, doi=",".join(matches), note="from url/postData")
                     for m in matches:
-                        await self._handle_new_request_payload({"doi": m}, dry=dry, is_doc=True)
+                        bus.publish("cdp_req", {"doi": m}, is_doc=True, marks={"event": t_event})
             except Exception:
                 if DEBUG_MODE: logger.exception("cdp on_request")
 
-        async def _process_body(url: str, body: str):
-            lurl = (url or "").lower()
-
-            # 1) لیستی: /requests
-            if "/requests" in lurl:
-                try:
-                    data = json.loads(body or "{}")
-                    docs = data.get("docs") or []
-                    if isinstance(docs, list):
-                        for doc in docs:
-                            if isinstance(doc, dict) and doc.get("doi"):
-                                self._log_detect(src="cdp_resp_list", url=url, doi=str(doc.get("doi")), note="docs[]")
-                            await self._handle_new_request_payload(doc, dry=dry, is_doc=True)
-                        return
-                except Exception:
-                    pass
-
-            # 2) تکی: /request
-            if "/request" in lurl:
-                try:
-                    data = json.loads(body or "{}")
-                    node = (data.get("success") or {}).get("data") or data.get("data")
-                    if isinstance(node, dict):
-                        if node.get("doi"):
-                            self._log_detect(src="cdp_resp_single", url=url, doi=str(node.get("doi")), note="success.data")
-                        await self._handle_new_request_payload(node, dry=dry, is_doc=False)
-                        return
-                except Exception:
-                    pass
-
-            # 3) عمومی‌تر: /api/* ، /graphql و هرچیزی → Regex
-            await _handle_matches("cdp_resp_generic", url, body or "")
-
         async def on_response(params: dict):
             try:
                 resp = params.get("response") or {}
@@ -519,8 +787,12 @@ class SciNetClient:
                 rid  = params.get("requestId")
                 if not rid:
                     return
-                # عمداً فیلتر URL نمی‌گذاریم تا پاسخ‌های /api/* هم استیج شوند.
-                self._pending[rid] = {"url": url, "ts": _t.time()}
+                # فقط پاسخ‌های مرتبط (/requests، /request، /api/* یا XHR/Fetch با JSON) استیج می‌شوند
+                if not body_filter.should_fetch(params.get("type"), resp.get("mimeType"), url):
+                    self._body_filter_stats["skipped"] += 1
+                    return
+                self._body_filter_stats["staged"] += 1
+                self._pending.put(rid, url)
             except Exception:
                 if DEBUG_MODE: logger.exception("cdp on_response")
 
@@ -531,52 +803,59 @@ class SciNetClient:
                 return
             url = entry["url"]
             try:
-                body_res = await self._cdp.send("Network.getResponseBody", {"requestId": rid})
+                body_res = await cdp.send("Network.getResponseBody", {"requestId": rid})
+                if rec is not None:
+                    rec.body(rid, body_res)
                 body = body_res.get("body") or ""
                 if body_res.get("base64Encoded"):
+                    # bytes می‌ماند؛ JSON و اسکنر DOI مستقیماً روی bytes کار می‌کنند
                     try:
-                        body = base64.b64decode(body).decode("utf-8", "ignore")
+                        body = base64.b64decode(body)
                     except Exception:
-                        body = ""
-                await _process_body(url, body)
+                        body = b""
+                # رویداد = responseReceived (زمان استیج)، body = پس از getResponseBody
+                await self._process_body(url, body, marks={"event": entry["ts"], "body": time.monotonic()})
             except Exception as e:
                 msg = str(e).lower()
                 if "no resource with given identifier" in msg or "no data found" in msg:
                     return
                 if DEBUG_MODE: logger.exception("cdp getResponseBody")
 
-        async def on_ws_frame(params: dict):
+        def on_loading_failed(params: dict):
+            # fail/cancel: بدنه‌ای در کار نیست؛ فقط از جدول حذف کن
+            rid = (params or {}).get("requestId")
+            if rid:
+                self._pending.fail(rid)
+
+        async def on_ws_frame(params: dict, t_event: float):
             try:
                 payload = ((params.get("response") or {}).get("payloadData")) or ""
                 if not payload:
                     return
-                await _handle_matches("cdp_ws_rx", "", payload)
+                await self._handle_matches("cdp_ws_rx", "", payload, {"event": t_event})
             except Exception:
                 if DEBUG_MODE: logger.exception("cdp ws frame")
 
+        def _on(method: str, cb):
+            # در حالت ضبط (CDP_RECORD) هر رویداد پیش از پردازش نوشته می‌شود
+            if rec is not None:
+                def _rec_cb(ev, _cb=cb):
+                    rec.event(method, ev)
+                    return _cb(ev)
+                cdp.on(method, _rec_cb)
+            else:
+                cdp.on(method, cb)
+
         # ثبت رویدادها
-        self._cdp.on("Network.requestWillBeSent",  lambda ev: asyncio.create_task(on_request(ev)))
-        self._cdp.on("Network.responseReceived",   lambda ev: asyncio.create_task(on_response(ev)))
-        self._cdp.on("Network.loadingFinished",    lambda ev: asyncio.create_task(on_loading_finished(ev)))
+        _on("Network.requestWillBeSent",  lambda ev: asyncio.create_task(on_request(ev, time.monotonic())))
+        _on("Network.responseReceived",   lambda ev: asyncio.create_task(on_response(ev)))
+        _on("Network.loadingFinished",    lambda ev: asyncio.create_task(on_loading_finished(ev)))
+        _on("Network.loadingFailed",      on_loading_failed)
         try:
-            self._cdp.on("Network.webSocketFrameReceived", lambda ev: asyncio.create_task(on_ws_frame(ev)))
+            _on("Network.webSocketFrameReceived", lambda ev: asyncio.create_task(on_ws_frame(ev, time.monotonic())))
         except Exception:
             pass
 
-        # فالو‌بک Playwright
-        async def _pw_on_response(resp):
-            try:
-                url = resp.url or ""
-                txt = ""
-                ctype = (resp.headers or {}).get("content-type", "")
-                if "application/json" in ctype.lower():
-                    txt = await resp.text()
-                await _process_body(url, txt)
-            except Exception:
-                if DEBUG_MODE: logger.exception("pw response fallback")
-
-        p.on("response", lambda r: asyncio.create_task(_pw_on_response(r)))
-
 
     @dbg
     async def _inject_observer(self):
@@ -586,14 +865,16 @@ class SciNetClient:
         """
         p = self.page; assert p
         dry = DRY_RUN
-        skip_json = json.dumps(state.skip, ensure_ascii=False)
+        # فقط پنجرهٔ اخیر: هزینهٔ parse در هر ناوبری ثابت می‌ماند؛ تاریخچهٔ قدیمی‌تر در __claim_py
+        skip_json = json.dumps(state.skip.recent(), ensure_ascii=False)
         enabled_js = "true" if state.enabled else "false"
 
         js = dedent(f"""
         (() => {{
           const DRY = {str(dry).lower()};
           window.skipSet = new Set({skip_json});
-          window.busy = false;
+          window.slotsFree = {self._slots.free};
+          window.busy = window.slotsFree <= 0;
           window.enabled = {enabled_js};
 
           const seenDois = new Set();
@@ -603,20 +884,21 @@ class SciNetClient:
             return (typeof d === 'string') ? d.trim() : "";
           }}
 
-          function precheckTitle(title) {{
-            const t = String(title || "");
-            const words = t.trim().split(/\\s+/).filter(Boolean);
-            if (words.length > 0 && words.length < 5) return "short_title_pre";
-            // "book" یا "ebook/e-book" به صورت کلمه‌ی مستقل (notebook را نمی‌گیرد)
-            if (/\\b(?:e-?book|book)\\b/i.test(t)) return "book_in_title_pre";
-            return null; // اوکی
-          }}
-
           async function handleDoc(doc) {{
             const doi = doiFrom(doc);
             if (!doi) return;
             if (seenDois.has(doi) || window.skipSet.has(doi)) return;
             seenDois.add(doi);
+            // ادعا روی گذرگاه تشخیص پایتون؛ اگر منبع دیگری زودتر رسیده، کنار بکش.
+            // بدون قواعد کامل در صفحه (__preTakeCheck نیامده یا قاعده‌ای در JS خراب بوده)
+            // کاندید به پایتون سپرده می‌شود تا با قواعد پایتون بسنجد و take بزند
+            const handoff = window.enabled && !DRY &&
+              !(typeof window.__preTakeCheck === 'function' && window.__preTakeCheck.complete);
+            try {{
+              const claim = {{ doi, _id: (doc && doc._id) || "", createdAt: (doc && doc.createdAt) || "",
+                              src: "js_observer", handoff, doc: handoff ? doc : null }};
+              if (!(await window.__claim_py(claim))) return;
+            }} catch (e) {{ if (handoff) return; }}
 
             const request = (doc && doc.request) || {{}};
             const payload = {{
@@ -636,35 +918,44 @@ class SciNetClient:
               return;
             }}
 
-            // ⬇️ پیش‌سنجی قبل از take فقط بر اساس عنوان
+            // ⬇️ پیش‌سنجی قبل از take با قواعد کامپایل‌شده (window.__preTakeCheck)
             const title = String((doc && (doc.title || doc.Title)) || "");
-            const reason = precheckTitle(title);
-            if (reason) {{
-              try {{ await window.__notify_py({{ doi, reason }}); }} catch (e) {{}}
+            if (typeof window.__preTakeCheck !== 'function') return;
+            const hit = window.__preTakeCheck({{
+              title, doi, requester: payload.requester, reward: payload.reward
+            }});
+            if (hit) {{
+              try {{ await window.__notify_py({{ doi, reason: hit.reason, rule: hit.rule }}); }} catch (e) {{}}
               return; // رد شد: take نزن
             }}
 
-            if (window.busy) return;
-            window.busy = true;
+            // ظرفیت در پایتون نگه داشته می‌شود؛ slotsFree فقط آینهٔ آن برای رد سریع است.
+            // بدون اسلات آزاد، کاندید در پایتون معوق می‌ماند تا اسلات بعدی
+            const defer = async () => {{ try {{ await window.__defer_py(doc); }} catch (e) {{}} }};
+            if (window.slotsFree <= 0) return defer();
+            try {{
+              if (!(await window.__acquire_slot_py(doi))) return defer();
+            }} catch (e) {{ return; }}
             try {{
               const res = await fetch('/take/' + encodeURIComponent(doi), {{
-                method: 'GET', credentials: 'include', redirect: 'manual'
+                method: 'GET', credentials: 'include'
               }});
-              const final = new URL(res.url, location.href);
-              const ok = res.redirected || res.ok ||
-                         final.pathname.startsWith('/work/') || final.pathname.startsWith('/requests/');
+              // تفسیر پاسخ در پایتون (classify_take)، همان منطق مسیر مستقیم
+              const info = {{ status: res.status, redirected: res.redirected,
+                             path: new URL(res.url, location.href).pathname,
+                             body: res.ok ? (await res.text()).slice(0, {TAKE_BODY_LIMIT}) : "" }};
+              const ok = (await window.__classify_take_py(doi, info)) === "won";
               if (ok) {{
                 window.skipSet.add(doi);
                 try {{
                   await window.__notify_py(Object.assign({{}}, payload, {{__src:"js_observer"}}));
                 }} catch (e) {{}}
               }} else {{
-                window.busy = false;
                 try {{ await window.__notify_py({{ doi, reason: "competitor_won" }}); }} catch (e) {{}}
 
               }}
             }} catch (e) {{
-              window.busy = false;
+              try {{ await window.__release_slot_py(doi); }} catch (e2) {{}}
             }}
           }}
 
@@ -690,7 +981,20 @@ class SciNetClient:
                   try {{
                     if (endpoint === 'requests' && resp && Array.isArray(resp.docs)) {{
                       try {{ console.debug("observer: arequest('requests') intercepted, docs=", resp.docs.length); }} catch(e){{}}
-                      for (const d of resp.docs) handleDoc(d);
+                      const fresh = resp.docs.filter(d => {{
+                        const x = doiFrom(d);
+                        return x && !seenDois.has(x) && !window.skipSet.has(x);
+                      }});
+                      // چند کاندید تازه → اول رتبه‌بندی در پایتون، بعد take به همان ترتیب
+                      if (fresh.length > 1 && window.__rank_py) {{
+                        const brief = fresh.map(d => [doiFrom(d), String(d.title || ""),
+                                                      String(((d.request || {{}}).reward) ?? "")]);
+                        window.__rank_py(brief)
+                          .then(order => {{ for (const i of order) handleDoc(fresh[i]); }})
+                          .catch(() => {{ for (const d of fresh) handleDoc(d); }});
+                      }} else {{
+                        for (const d of fresh) handleDoc(d);
+                      }}
                     }}
                   }} catch (e) {{}}
                   return cb && cb(resp);
@@ -705,6 +1009,7 @@ class SciNetClient:
           try {{ console.debug("observer: injected and alive"); }} catch(e){{}}
         }})();
         """)
+        await self._install_rules_script()
         await p.add_init_script(js)
         await p.goto(SCINET_URL)
 
@@ -736,7 +1041,7 @@ class SciNetClient:
 
                 # اگر ربات غیرفعال/یا مشغول است، پینگ نزن
                 enabled = await p.evaluate("typeof window.enabled === 'undefined' ? true : Boolean(window.enabled)")
-                busy    = await p.evaluate("Boolean(window.busy)")
+                busy    = self._slots.free <= 0
                 if enabled and not busy:
                     # از همان کانتکستِ تب، یک fetch سبک بزن (کوکی‌ها همان سشن هستند)
                     await p.evaluate("""
@@ -768,15 +1073,45 @@ class SciNetClient:
             # فاصله‌ی تصادفی بین 20 تا 40 ثانیه
             await asyncio.sleep(random.uniform(20, 40))
 
+    def _claim_from_page(self, info: dict) -> bool:
+        """پل JS→Python برای ادعای DOI روی گذرگاه تشخیص (observer خودش take می‌زند)."""
+        info = info or {}
+        src = info.get("src") or "js_observer"
+        doi = info.get("doi") or ""
+        if doi.strip() in state.skip:
+            # بیرون از پنجرهٔ skipSet صفحه؛ DOI به صفحه برمی‌گردد تا دوباره پرسیده نشود
+            self._skip_py_rejects += 1
+            asyncio.create_task(self._sync_slots_in_page(doi.strip()))
+            return False
+        won = self._bus.claim(src, doi, info.get("_id"))
+        if won and info.get("handoff") and isinstance(info.get("doc"), dict):
+            # صفحه قواعد کامل ندارد: همان مسیر CDP (قواعد پایتون + take) و observer کنار می‌کشد
+            asyncio.create_task(self._dispatch_detected(info["doc"], src=src, is_doc=True))
+            return False
+        if won:
+            # observer خودش take می‌زند؛ take_done در _notify_py ثبت می‌شود
+            self._latency.begin(doi, src, created_at=info.get("createdAt"))
+            neg = self._negcache.check(doi)
+            if neg is not None:
+                # در کش منفی: observer را از take بازدار و مثل رد پیش‌سنجی اعلان کن
+                asyncio.create_task(self._notify_py({"doi": doi, "reason": neg}))
+                return False
+        return won
+
+    async def _dispatch_detected(self, doc: dict, *, src: str, is_doc: bool, marks: dict | None = None):
+        await self._handle_new_request_payload(doc, dry=DRY_RUN, is_doc=is_doc, src=src, marks=marks)
+
     @dbg
-    async def _handle_new_request_payload(self, node_or_payload: dict, dry: bool = False, is_doc: bool = True):
+    async def _handle_new_request_payload(self, node_or_payload: dict, dry: bool = False, is_doc: bool = True,
+                                          src: str | None = None, marks: dict | None = None):
         """
         به‌محض کشف درخواست (از CDP یا کلاینت):
         - اگر DRY: فقط notify
         - اگر عادی: پیش‌سنجی عنوان → تلاش فوری برای /take → notify
+        ضدتکرار قبلاً در DetectionBus انجام شده است.
         """
         # استخراج فیلدها از داکیومنت یا payload
-        src_hint = node_or_payload.get("__src") if isinstance(node_or_payload, dict) else None
+        src_hint = src or (node_or_payload.get("__src") if isinstance(node_or_payload, dict) else None)
         if is_doc:
             doi = (node_or_payload.get("doi") or node_or_payload.get("DOI") or node_or_payload.get("id") or "").strip()
             req = node_or_payload.get("request") or {}
@@ -786,12 +1121,6 @@ class SciNetClient:
                 "requester": req.get("from") or "",
                 "reward": str((req.get("reward") if isinstance(req, dict) else "") or ""),
             }
-            _id = node_or_payload.get("_id")
-            # ضدتکرار
-            if (_id and _id in self._seen_ids) or (doi and doi in self._seen_dois):
-                return
-            if _id: self._seen_ids.add(_id)
-            if doi: self._seen_dois.add(doi)
         else:
             doi = (node_or_payload.get("doi") or "").strip()
             payload = {
@@ -803,79 +1132,232 @@ class SciNetClient:
 
         if not doi:
             return
+        # پس از ری‌استارت یا انقضای seen، DOI رسیدگی‌شده ممکن است دوباره از گذرگاه رد شود
+        if doi in state.skip:
+            logger.debug("Skip registry hit, not dispatching | doi=%s src=%s", doi, src_hint)
+            return
+
+        lat = self._latency
+        lat.begin(doi, src_hint or "handler", marks, created_at=node_or_payload.get("createdAt"))
+        lat.mark(doi, "handled")
 
         # لاگ کشف (اولین نقطه)
         self._log_detect(src=src_hint or "handler",
                          url=payload.get("detail"), doi=doi,
                          note="handle_new_request_payload")
 
-        # --- PRE-TAKE: فقط روی عنوان، بدون Crossref ---
+        # --- PRE-TAKE: قواعد مرحلهٔ pre (عنوان/پیشوند DOI) و کش منفی، بدون Crossref ---
         title = ""
         if isinstance(node_or_payload, dict):
             title = (node_or_payload.get("title") or node_or_payload.get("Title") or "").strip()
 
-        if title:
-            # عنوان کوتاه؟
-            if len(title.split()) < 5:
-                await self._notify_py({
-                    "doi": doi,
-                    "detail": payload.get("detail", ""),
-                    "requester": payload.get("requester", ""),
-                    "reward": payload.get("reward", ""),
-                    "reason": "short_title_pre",
-                })
-                return
-
-            # book / ebook / e-book به‌صورت کلمهٔ مستقل
-            if re.search(r"\b(?:e-?book|book)\b", title, re.IGNORECASE):
-                await self._notify_py({
-                    "doi": doi,
-                    "detail": payload.get("detail", ""),
-                    "requester": payload.get("requester", ""),
-                    "reward": payload.get("reward", ""),
-                    "reason": "book_in_title_pre",
-                })
-                return
+        rule = self._rules.evaluate("pre", {
+            "title": title, "doi": doi,
+            "requester": payload.get("requester", ""), "reward": payload.get("reward", ""),
+        })
+        reason = rule.reason if rule is not None else self._negcache.check(doi)
+        if reason is not None:
+            lat.finish(doi, "rejected_pre")
+            await self._notify_py({
+                "doi": doi,
+                "detail": payload.get("detail", ""),
+                "requester": payload.get("requester", ""),
+                "reward": payload.get("reward", ""),
+                "reason": reason,
+            })
+            return
         # --- پایان PRE-TAKE ---
+        lat.mark(doi, "pretake")
 
         # DRY: فقط اعلان
         if dry:
+            lat.finish(doi, "dry")
             await self._notify_py(payload)
             return
 
-        # حالت عادی: فوراً از همان سشن صفحه رزرو کن
-        ok = await self.page.evaluate("""
-          async (d) => {
-            try {
-              const r = await fetch('/take/' + encodeURIComponent(d), {
-                method: 'GET', credentials: 'include', redirect: 'manual'
-              });
-              const final = new URL(r.url, location.href);
-              const success = r.redirected || r.ok ||
-                              final.pathname.startsWith('/work/') || final.pathname.startsWith('/requests/');
-              if (success) {
-                (window.skipSet ||= new Set()).add(d);
-                window.busy = true;
-                return 1;
-              }
-              return 0;
-            } catch { return 0; }
-          }
-        """, doi)
+        # همهٔ اسلات‌ها پر است → take نزن
+        if not self._acquire_slot(doi):
+            lat.finish(doi, "no_slot")
+            # معوق: با آزادشدن اسلات، بهترین کاندید معوق دوباره فرستاده می‌شود
+            self._ranker.defer(node_or_payload, src_hint or "handler", is_doc)
+            logger.info("No free take slot, deferred | doi=%s held=%s", doi, self._slots.held())
+            return
+
+        # حالت عادی: فوراً رزرو کن
+        lat.mark(doi, "take_sent")
+        ok = False
+        try:
+            ok = await self._take(doi)
+        finally:
+            if not ok:
+                await self.release_slot(doi)  # باخت/خطا: اسلات آزاد
+        lat.mark(doi, "take_done")
+        lat.finish(doi, "won" if ok else "lost")
 
         if not ok:
             return  # شخص دیگری جلوتر رزرو کرده
 
         await self._notify_py(payload)
 
+    async def _take(self, doi: str) -> bool:
+        """
+        رزرو فوری /take/<doi>؛ True یعنی ما برنده شدیم.
+        اول از مسیر مستقیم پایتون (DirectTaker)؛ فقط اگر سشن پریده بود (auth) یا اتصال اصلاً
+        برقرار نشد (not_sent) همان تلاش از داخل صفحه تکرار می‌شود. روی error (timeout/5xx)
+        take اول شاید روی سرور نشسته باشد، پس take دوم زده نمی‌شود.
+        """
+        taker = self._taker
+        if taker is not None:
+            t0 = time.perf_counter()
+            res = await taker.take(doi)
+            if res == ERROR:
+                logger.warning("TAKE outcome unknown via direct (timeout/5xx) | doi=%s; no page retry", doi)
+            if res in (WON, LOST, ERROR):
+                self._take_paths[f"direct_{res}"] += 1
+                if res == WON:
+                    logger.info("TAKE won via direct | doi=%s %.1fms", doi, (time.perf_counter() - t0) * 1000)
+                    # skipSet صفحه را هم‌راستا کن تا observer دوباره take نزند
+                    asyncio.create_task(self._sync_slots_in_page(doi))
+                return res == WON
+            self._take_paths[f"direct_{res}_fallback"] += 1
+
+        t0 = time.perf_counter()
+        ok = await self._take_in_page(doi)
+        self._take_paths["page_won" if ok else "page_lost"] += 1
+        if ok:
+            logger.info("TAKE won via page | doi=%s %.1fms", doi, (time.perf_counter() - t0) * 1000)
+        return ok
+
+    # --- take rules ------------------------------------------------------
+    async def reload_rules(self) -> str:
+        """قواعد را از فایل دوباره می‌خواند و __preTakeCheck صفحه را بدون ری‌لود جایگزین می‌کند."""
+        src = self._rules.load()
+        p = self.page
+        if p and not p.is_closed():
+            js = await self._install_rules_script()   # برای ناوبری‌های بعدی
+            await p.add_script_tag(content=js)         # برای همین صفحه
+        return src
+
+    async def _install_rules_script(self) -> str:
+        """init script قواعد را ثبت و نسخهٔ قبلی را dispose می‌کند تا با هر reload انباشته نشوند."""
+        js = self._rules.to_js()
+        old, self._rules_script = self._rules_script, await self.page.add_init_script(js)
+        # Playwright قدیمی handle برنمی‌گرداند؛ آنجا اسکریپت آخر (جدیدتر) __preTakeCheck را بازنویسی می‌کند
+        if old is not None and hasattr(old, "dispose"):
+            try:
+                await old.dispose()
+            except Exception:
+                logger.debug("dispose old rules init script failed", exc_info=True)
+        return js
+
+    # --- take slots ------------------------------------------------------
+    def set_take_capacity(self, capacity: int):
+        self._slots.resize(capacity)
+        logger.info("Take slots | capacity=%d", self._slots.capacity)
+        if self.page and not self.page.is_closed():
+            asyncio.create_task(self._sync_slots_in_page())
+        self._drain_deferred()
+
+    def _acquire_slot(self, doi: str) -> bool:
+        """یک اسلات برای DOI می‌گیرد (پل JS هم همین را صدا می‌زند)؛ False یعنی ظرفیت پر است."""
+        ok = self._slots.try_acquire(doi)
+        if ok and self.page and not self.page.is_closed():
+            asyncio.create_task(self._sync_slots_in_page())
+        if ok and SPEC_LOOKUP and not DRY_RUN:
+            # take همین الان زده می‌شود؛ جستجوی منبع را موازی با آن شروع کن
+            self._spec.start(doi, lookup_sources())
+        return ok
+
+    async def release_slot(self, doi: str):
+        """آزادسازی اسلات DOI و افزودنش به skipSet صفحه (جایگزین window.busy=false)."""
+        self._slots.release(doi)
+        self._ranker.discard(doi)
+        self._spec.cancel(doi)
+        self._drain_deferred()
+        await self._sync_slots_in_page(doi)
+
+    def _drain_deferred(self):
+        """به تعداد اسلات‌های آزاد، بهترین کاندیدهای معوق را دوباره به handler می‌فرستد."""
+        if DRY_RUN:
+            return
+        for _ in range(self._slots.free):
+            item = self._ranker.pop_deferred()
+            if item is None:
+                break
+            doc, src, is_doc = item
+            asyncio.create_task(self._dispatch_detected(doc, src=f"{src}_deferred", is_doc=is_doc))
+
+    def _rank_from_page(self, brief: list) -> list[int]:
+        """پل JS: [[doi, title, reward], ...] → اندیس‌ها به ترتیب امتیاز."""
+        docs = []
+        for i, item in enumerate(brief or []):
+            doi, title, reward = (list(item) + ["", "", ""])[:3]
+            docs.append({"doi": doi, "title": title, "request": {"reward": reward}, "_i": i})
+        return [d["_i"] for d in self._ranker.rank(docs)]
+
+    def _defer_from_page(self, doc: dict):
+        if isinstance(doc, dict):
+            self._ranker.defer(doc, "js_observer", True)
+
+    async def _sync_slots_in_page(self, doi: str | None = None):
+        """آینهٔ ظرفیت در صفحه: slotsFree و busy (=همه پر)، به‌علاوهٔ skipSet برای DOI."""
+        p = self.page
+        if not p or p.is_closed():
+            return
+        try:
+            await p.evaluate(
+                "([d, n]) => { window.slotsFree = n; window.busy = n <= 0;"
+                " if (d) (window.skipSet ||= new Set()).add(d); }",
+                [doi or "", self._slots.free])
+        except Exception:
+            if DEBUG_MODE: logger.exception("sync slots in page")
+
+    def _classify_take_from_page(self, doi: str, info: dict) -> str:
+        """
+        پل JS: نتیجهٔ fetch('/take/<doi>') صفحه (ریدایرکت دنبال شده) → classify_take.
+        ریدایرکت دنبال‌شده مثل 302 با Location = مسیر نهایی تفسیر می‌شود.
+        """
+        info = info or {}
+        if info.get("redirected"):
+            return classify_take(302, info.get("path") or "/", "", doi)
+        return classify_take(int(info.get("status") or 0), "", info.get("body") or "", doi)
+
+    async def _take_in_page(self, doi: str) -> bool:
+        """مسیر قدیمی: fetch('/take/<doi>') از همان سشن صفحه؛ تفسیر با classify_take."""
+        info = await self.page.evaluate("""
+          async ([d, limit]) => {
+            try {
+              const r = await fetch('/take/' + encodeURIComponent(d), {
+                method: 'GET', credentials: 'include'
+              });
+              return { status: r.status, redirected: r.redirected,
+                       path: new URL(r.url, location.href).pathname,
+                       body: r.ok ? (await r.text()).slice(0, limit) : "" };
+            } catch { return null; }
+          }
+        """, [doi, TAKE_BODY_LIMIT])
+        ok = info is not None and self._classify_take_from_page(doi, info) == WON
+        if ok:
+            await self._sync_slots_in_page(doi)
+        return ok
+
     # --- JS→Python bridge -----------------------------------------------
     @dbg
     async def _notify_py(self, payload: Dict[str, str]):
         doi = payload.get("doi", "")
         reason = payload.get("reason")
-
-        if doi and doi not in state.skip:
-            state.skip.append(doi)
+        if payload.get("rule"):
+            self._rules.count_js_hit(payload["rule"])  # رد شده توسط قواعد observer
+
+        # مسیر observer: take در صفحه زده شده و نتیجه همین‌جا می‌رسد
+        if doi:
+            if reason in (None, "competitor_won"):
+                self._latency.mark(doi, "take_done")
+            self._latency.finish(doi, {None: "won", "competitor_won": "lost"}.get(reason, "rejected_pre"))
+
+        # رد کش منفی فقط اعلان می‌شود: با افزودن به skip انقضای کش (TTL) عملاً دائمی می‌شد
+        if doi and reason not in (REASON_DOI, REASON_PREFIX):
+            state.skip.add(doi)
         state.active = doi or None
         state.save()
 
@@ -886,60 +1368,50 @@ class SciNetClient:
 
         # اگر از سمت اعتبارسنجی/پیش‌سنجی رد شده
         if reason:
-            reason_text = {
+            # دلایل پیش از رزرو متن خود را از قواعد (take_rules) می‌گیرند
+            rule = self._rules.by_reason(reason)
+            reason_text = (rule.message if rule is not None and rule.message else {
                 "contains_book": "⚠️ DOI شامل عبارت book یا ebook است.",
                 "invalid_crossref": "🚫 DOI در CrossRef معتبر نیست.",
                 "invalid_format": "🚫 قالب DOI معتبر نیست.",
-                # دلایل جدید پیش از رزرو (فقط عنوان)
-                "short_title_pre": "⛔️ رد شد (قبل از رزرو): عنوان کمتر از ۵ کلمه است.",
-                "book_in_title_pre": "⛔️ رد شد (قبل از رزرو): عبارت book/ebook در عنوان است.",
                 "competitor_won": "⏱️ رزرو توسط رقیب انجام شد (دیر رسیدیم).",
-            }.get(reason, "⚠️ علت ناشناخته")
+                "neg_cache_doi": "🗂 این DOI اخیراً در هیچ منبعی پیدا نشد (کش منفی).",
+                "neg_cache_prefix": "🗂 مقالات این ناشر (پیشوند DOI) اخیراً پیاپی پیدا نشدند (کش منفی).",
+            }.get(reason, "⚠️ علت ناشناخته"))
 
             msg = f"📭 درخواست نادیده گرفته شد:\nDOI: <code>{doi}</code>\nدلیل: {reason_text}"
             await bot_app.bot.send_message(TG_CHAT, msg, parse_mode="HTML")
             logger.info(f"📭 Skipped DOI: {doi} | Reason: {reason_text}")
 
-            # آزادسازی busy و افزودن به skipSet صفحه (احتیاط)
-            try:
-                page = bot_app.bot_data.get("client").page
-                if page and doi:
-                    await page.evaluate("(d)=>{window.busy=false;(window.skipSet ||= new Set()).add(d);}", doi)
-            except Exception:
-                pass
+            # آزادسازی اسلات و افزودن به skipSet صفحه (احتیاط)
+            if doi:
+                await self.release_slot(doi)
             return
 
-        # متادیتا و فیلترهای پس از رزرو (باقی می‌مانند به‌عنوان Safety Net)
-        meta = await metadata(doi)
-        title_words = (meta.get("title") or "").split()
-        if len(title_words) < 5:
-            msg = (
-                f"📚 درخواست لغو شد چون عنوان کمتر از ۵ کلمه است:\n"
-                f"<code>{doi}</code>\n"
-                f"عنوان: <b>{html.escape(meta.get('title', 'نامشخص'))}</b>"
-            )
-            await bot_app.bot.send_message(TG_CHAT, msg, parse_mode="HTML")
-            # آزادسازی busy
+        tg_kw = dict(doi=doi, reward=payload.get("reward", ""), requester=payload.get("requester", ""),
+                     detail=urljoin(SCINET_URL, payload.get("detail", "")))
+
+        # حالت اول-اعلان: پیام کوتاه و دانلود همین حالا؛ متادیتا و قواعد post موازی با دانلود
+        if NOTIFY_FIRST and not DRY_RUN:
+            # دانلود منتظر رفت‌وبرگشت تلگرام نمی‌ماند
+            gate = asyncio.get_running_loop().create_future()
+            asyncio.create_task(start_download_process(bot_app, payload, {}, gate=gate))
             try:
-                page = bot_app.bot_data.get("client").page
-                if page and doi:
-                    await page.evaluate("(d)=>{window.busy=false;(window.skipSet ||= new Set()).add(d);}", doi)
+                msg = await send_telegram(title="⏳ رزرو شد؛ در حال گرفتن مشخصات مقاله…", year=None,
+                                          journal="", abstract="", **tg_kw)
             except Exception:
-                pass
-            logger.info(f"⛔️ DOI {doi} رد شد چون عنوان خیلی کوتاه بود ({len(title_words)} کلمه).")
+                # بدون پیام اولیه هم باید بررسی post اجرا شود تا gate و اسلات تعیین تکلیف شوند
+                logger.warning("[%s] initial take message failed; post check runs without edit", doi,
+                               exc_info=True)
+                msg = None
+            asyncio.create_task(self._post_take_check(doi, msg, gate, tg_kw))
             return
 
-        if "book" in (meta.get("type") or "").lower():
-            msg = f"📚 درخواست لغو شد چون DOI مربوط به کتاب است:\n<code>{doi}</code>"
-            await bot_app.bot.send_message(TG_CHAT, msg, parse_mode="HTML")
-            # آزادسازی busy
-            try:
-                page = bot_app.bot_data.get("client").page
-                if page and doi:
-                    await page.evaluate("(d)=>{window.busy=false;(window.skipSet ||= new Set()).add(d);}", doi)
-            except Exception:
-                pass
-            logger.info(f"⛔️ DOI {doi} مربوط به کتاب بود، درخواست لغو شد.")
+        # متادیتا و قواعد مرحلهٔ post (باقی می‌مانند به‌عنوان Safety Net)
+        meta = await metadata(doi)
+        rule = self._post_rule(doi, meta)
+        if rule is not None:
+            await self._reject_post(doi, meta, rule)
             return
 
         # === DRY-RUN: فقط پیام، بدون دانلود/آپلود ===
@@ -950,13 +1422,9 @@ class SciNetClient:
                 requester=payload.get("requester", ""),
                 detail=urljoin(SCINET_URL, payload.get("detail", ""))
             )
-            # آزادسازی busy (اگر قبل‌تر ست شده باشد)
-            try:
-                page = bot_app.bot_data.get("client").page
-                if page and doi:
-                    await page.evaluate("(d)=>{window.busy=false;(window.skipSet ||= new Set()).add(d);}", doi)
-            except Exception:
-                pass
+            # آزادسازی اسلات (اگر قبل‌تر گرفته شده باشد)
+            if doi:
+                await self.release_slot(doi)
             return
 
         # حالت عادی: پیام + شروع فرآیند دانلود/آپلود
@@ -968,10 +1436,58 @@ class SciNetClient:
         )
         asyncio.create_task(start_download_process(bot_app, payload, meta))
 
+    def _post_rule(self, doi: str, meta: Dict[str, Any]):
+        return self._rules.evaluate("post", {
+            "doi": doi, "title": meta.get("title") or "", "type": meta.get("type") or "",
+            "journal": meta.get("journal") or "",
+        })
+
+    async def _reject_post(self, doi: str, meta: Dict[str, Any], rule, *, release: bool = True):
+        msg = (
+            f"{rule.message or '📚 درخواست لغو شد (' + rule.reason + ')'}:\n"
+            f"<code>{doi}</code>\n"
+            f"عنوان: <b>{html.escape(meta.get('title') or 'نامشخص')}</b>"
+        )
+        await bot_app.bot.send_message(TG_CHAT, msg, parse_mode="HTML")
+        # آزادسازی اسلات (در حالت NOTIFY_FIRST با خود تسک دانلود است)
+        if doi and release:
+            await self.release_slot(doi)
+        logger.info(f"⛔️ DOI {doi} رد شد (قاعدهٔ {rule.id}).")
+
+    async def _post_take_check(self, doi: str, msg, gate: asyncio.Future, tg_kw: dict):
+        """
+        حالت NOTIFY_FIRST: متادیتا و قواعد post موازی با دانلود. نتیجه (True=قبول) در gate می‌نشیند؛
+        تسک دانلود پیش از آپلود (یا پیش از گزارش شکست) منتظر آن است و روی رد خودش تمیز برمی‌گردد و
+        اسلات را آزاد می‌کند، پس اینجا فقط پیام رد فرستاده می‌شود و تسک وسط کار لغو نمی‌شود.
+        در هر دو حال پیام اولیه با عنوان/مجله/چکیده ویرایش می‌شود.
+        """
+        t0 = time.perf_counter()
+        meta = _finalize_meta({})
+        rule = None
+        try:
+            try:
+                meta = await metadata(doi)
+            except Exception:
+                logger.exception("post-take metadata failed for %s", doi)
+            rule = self._post_rule(doi, meta)
+        finally:
+            if not gate.done():
+                gate.set_result(rule is None)
+        logger.info("post-take check | doi=%s %s in %.0fms", doi,
+                    "ok" if rule is None else f"rejected({rule.id})", (time.perf_counter() - t0) * 1000)
+        if msg is not None:
+            try:
+                await edit_telegram(msg, title=meta["title"], year=meta["year"], journal=meta["journal"],
+                                    abstract=meta["abstract"], **tg_kw)
+            except Exception:
+                logger.warning("editing notification failed for %s", doi, exc_info=True)
+        if rule is not None:
+            await self._reject_post(doi, meta, rule, release=False)
+
 
 # ── Telegram helpers ───────────────────────────────────────
-@dbg
-async def send_telegram(**kw):
+def _request_message(**kw):
+    """متن و کیبورد پیام درخواست (مشترک بین ارسال اولیه و ویرایش پس از رسیدن متادیتا)."""
     esc = html.escape
     parts = [
         "📌 <b>درخواست جدید Sci-Net</b>",
@@ -986,16 +1502,29 @@ async def send_telegram(**kw):
     if kw['abstract']:
         parts.append("\n" + esc(str(kw['abstract'])))
 
+    # با چند اسلات همزمان، دکمهٔ «تموم شد» باید DOI خودش را بداند (سقف callback_data ۶۴ بایت است)
+    done_data = f"done:{kw['doi']}"
+    if len(done_data.encode()) > 64:
+        done_data = "done"
     kb = InlineKeyboardMarkup([
-        [InlineKeyboardButton("تموم شد", callback_data="done")],
+        [InlineKeyboardButton("تموم شد", callback_data=done_data)],
         [InlineKeyboardButton("فعال‌سازی", callback_data="on"),
          InlineKeyboardButton("غیرفعال‌سازی", callback_data="off")]
     ])
-    await bot_app.bot.send_message(
-        TG_CHAT, "\n".join(parts), parse_mode="HTML",
+    return "\n".join(parts), kb
+
+@dbg
+async def send_telegram(**kw):
+    text, kb = _request_message(**kw)
+    return await bot_app.bot.send_message(
+        TG_CHAT, text, parse_mode="HTML",
         disable_web_page_preview=True, reply_markup=kb
     )
 
+async def edit_telegram(message, **kw):
+    text, kb = _request_message(**kw)
+    await message.edit_text(text, parse_mode="HTML", disable_web_page_preview=True, reply_markup=kb)
+
 # ── فعال/غیرفعال ───────────────────────────────────────────
 @dbg
 async def enable_bot(flag:bool):
@@ -1021,17 +1550,16 @@ async def toggle_cb(update:Update, context:ContextTypes.DEFAULT_TYPE):
 async def done_cb(update:Update, context:ContextTypes.DEFAULT_TYPE):
     if not is_owner(update.callback_query.from_user.id):
         await update.callback_query.answer(" فقط مالک می‌تواند", show_alert=True); return
-    doi = state.active
-    state.active = None
-    if doi and doi not in state.skip:
-        state.skip.append(doi)
+    doi = update.callback_query.data.partition(":")[2] or state.active
+    if state.active == doi:
+        state.active = None
+    if doi:
+        state.skip.add(doi)
     state.save()
     logger.debug("DONE doi=%s skipSize=%d", doi, len(state.skip))
     client:SciNetClient = context.application.bot_data["client"]
-    await client.page.evaluate(f"""
-        window.busy=false;
-        window.skipSet.add({json.dumps(doi)});
-    """)
+    if doi:
+        await client.release_slot(doi)
     await update.callback_query.answer()
     await update.callback_query.edit_message_reply_markup(None)
     await context.bot.send_message(
@@ -1086,13 +1614,16 @@ async def flush_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     client: SciNetClient = app.bot_data["client"]
     page: Page = client.page
 
-    doi = state.active
+    # همهٔ DOIهایی که اسلات گرفته‌اند (به‌علاوهٔ active قدیمی)
+    dois = client._slots.held()
+    if state.active and state.active not in dois:
+        dois.append(state.active)
 
-    # 1) اگر DOI فعلی داریم، تلاش برای رد کردنش (refuse) از خودِ سشنِ صفحه
-    refused = False
-    if doi:
+    # 1) برای هر DOI فعال، تلاش برای رد کردنش (refuse) از خودِ سشنِ صفحه
+    refused = 0
+    for doi in dois:
         try:
-            refused = await page.evaluate("""
+            refused += bool(await page.evaluate("""
                 async(d) => {
                     try {
                       const r = await fetch('/refuse/' + encodeURIComponent(d), {
@@ -1102,17 +1633,13 @@ async def flush_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
                       return r.redirected || r.ok || u.pathname.startsWith('/requests');
                     } catch { return false; }
                 }
-            """, doi)
-        except Exception:
-            refused = False
-
-        # 2) چه رد شد چه نشد: busy رو آزاد کن و DOI رو به skipSet/State اضافه کن
-        try:
-            await page.evaluate("(d)=>{window.busy=false;(window.skipSet ||= new Set()).add(d);}", doi)
+            """, doi))
         except Exception:
             pass
-        if doi not in state.skip:
-            state.skip.append(doi)
+
+        # 2) چه رد شد چه نشد: اسلات رو آزاد کن و DOI رو به skipSet/State اضافه کن
+        await client.release_slot(doi)
+        state.skip.add(doi)
 
     # 3) ریست وضعیت فعال
     state.active = None
@@ -1120,13 +1647,13 @@ async def flush_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # 4) انتخاب حالت نرم/سخت
     if mode in ("hard", "reset", "restart"):
-        await context.bot.send_message(TG_CHAT, f"♻️ Hard flush: ری‌استارت کانتکست مرورگر… (refused={refused})")
+        await context.bot.send_message(TG_CHAT, f"♻️ Hard flush: ری‌استارت کانتکست مرورگر… (refused={refused}/{len(dois)})")
         try:
             await client._recover("user hard flush")
         except Exception:
             pass
     else:
-        await context.bot.send_message(TG_CHAT, f"🧹 Soft flush: DOI فعلی رد/اسکیپ شد، صفحه ری‌لود می‌شود… (refused={refused})")
+        await context.bot.send_message(TG_CHAT, f"🧹 Soft flush: DOI فعلی رد/اسکیپ شد، صفحه ری‌لود می‌شود… (refused={refused}/{len(dois)})")
         try:
             await page.reload(wait_until="domcontentloaded", timeout=30000)
         except Exception:
@@ -1135,7 +1662,10 @@ async def flush_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ── main ───────────────────────────────────────────────────
 @dbg
 async def main():
-    global bot_app
+    global bot_app, state, META_CACHE
+    state = BotState.load()
+    META_CACHE = MetadataCache(META_CACHE_FILE, pos_ttl=META_CACHE_POS_TTL, neg_ttl=META_CACHE_NEG_TTL,
+                               lru_size=META_CACHE_LRU)
     bot_app = (Application.builder().token(TG_TOKEN).rate_limiter(AIORateLimiter()).build())
     client = SciNetClient(); await client.start()
 
@@ -1178,6 +1708,10 @@ async def main():
     else:
         logger.info("DRY-RUN فعال است: IranPaper/GigaLib ساخته نمی‌شوند.")
 
+    # ظرفیت take: هر تب منبع همزمان یک دانلود، با سقف صف کارگرها
+    source_pages = sum(1 for pg in (iran_page, giga_page) if pg is not None)
+    client.set_take_capacity(TAKE_SLOTS or max(1, min(source_pages, MAX_CONCURRENT_DOWNLOADS)))
+
     await client.page.context.storage_state(path="session_giga_iran.json")
 
     from bot.setup import register_commands
@@ -1188,11 +1722,13 @@ async def main():
     bot_app.bot_data["state"] = state
 
     bot_app.add_handler(CommandHandler("start", start_cmd))
-    bot_app.add_handler(CallbackQueryHandler(done_cb, pattern="^done$"))
+    bot_app.add_handler(CallbackQueryHandler(done_cb, pattern="^done(:.*)?$"))
     bot_app.add_handler(CallbackQueryHandler(toggle_cb, pattern="^(on|off)$"))
     bot_app.add_handler(CommandHandler("testdoi", test_doi_cmd))
     bot_app.add_handler(CommandHandler("monitor", monitor_cmd))
     bot_app.add_handler(CommandHandler("diag", diag_cmd))
+    bot_app.add_handler(CommandHandler("latency", latency_cmd))
+    bot_app.add_handler(CommandHandler("rules", rules_cmd))
     bot_app.add_handler(CommandHandler("flush", flush_cmd))
 
 
@@ -1201,6 +1737,9 @@ async def main():
                 DEBUG_MODE, HEADFUL, DRY_RUN, sources)
 
     asyncio.create_task(heartbeat())
+    # اتصال‌های Crossref/OpenAlex را گرم نگه دار تا متادیتای پس از take هندشیک تازه نپردازد (اختیاری)
+    if META_WARM:
+        META_HTTP.start_warming(META_HOSTS, META_WARM_INTERVAL)
     print("[+] Telegram bot started ✅")
     # به‌جای await bot_app.run_polling()
     await bot_app.initialize()
@@ -1213,6 +1752,11 @@ async def main():
         await asyncio.Future()
     finally:
         # خاموش‌سازی تمیز
+        await client.shutdown()
+        await META_PREFETCH.stop()
+        await META_HTTP.close()
+        META_CACHE.close()
+        state.close()
         await bot_app.updater.stop()
         await bot_app.stop()
         await bot_app.shutdown()
@@ -1222,11 +1766,38 @@ async def main():
     
 # ── اد شده توسط ممد ────────────────────────────────────────────
 # ── فرآیند دانلود و آپلود ───────────────────────────────────
-async def start_download_process(bot_app, payload: dict, meta: dict):
+# با چند اسلات همزمان، هر تب (منبع یا Sci-Net) در هر لحظه فقط یک کار انجام می‌دهد
+_page_locks: dict[int, asyncio.Lock] = {}
+
+def page_lock(page) -> asyncio.Lock:
+    return _page_locks.setdefault(id(page), asyncio.Lock())
+
+def lookup_sources() -> list[tuple]:
+    """(منبع، صفحه، تابع lookup) به ترتیب Policy برای lookup گمانه‌زنانه."""
+    if 'bot_app' not in globals():
+        return []
+    pages = {
+        "iranpaper": (bot_app.bot_data.get("iran_page"), iranpaper_lookup),
+        "gigalib": (bot_app.bot_data.get("giga_page"), gigalib_lookup),
+    }
+    return [(src, *pages[src]) for src in POLICY.sources() if src in pages]
+
+async def release_take_slot(doi: str):
+    """اسلات take مربوط به DOI را آزاد می‌کند (جایگزین window.busy=false)."""
+    try:
+        client = bot_app.bot_data.get("client")
+        if client and doi:
+            await client.release_slot(doi)
+    except Exception:
+        pass
+
+async def start_download_process(bot_app, payload: dict, meta: dict, gate: Optional[asyncio.Future] = None):
     """
     انتها-به-انتها برای یک DOI بر اساس Policy:
       - ترتیب و انتخاب منابع از POLICY.sources() می‌آید.
-      - در DRY_RUN فقط اعلان می‌فرستیم و busy را آزاد می‌کنیم.
+      - در DRY_RUN فقط اعلان می‌فرستیم و اسلات را آزاد می‌کنیم.
+      - gate (حالت NOTIFY_FIRST): آپلود (و گزارش شکست) تا نتیجهٔ قواعد post منتظر می‌ماند؛
+        روی رد، تسک بدون پیام دوم برمی‌گردد. آزادسازی اسلات در همهٔ مسیرها با همین تسک است.
     """
     if DRY_RUN:
         doi_dbg = html.escape(payload.get("doi", "") or "")
@@ -1238,15 +1809,8 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
             )
         except Exception:
             pass
-        # آزادسازی busy (اگر قبلاً ست شده)
-        try:
-            client = bot_app.bot_data.get("client")
-            page = getattr(client, "page", None)
-            doi_val = payload.get("doi", "")
-            if page and doi_val:
-                await page.evaluate("(d)=>{window.busy=false;(window.skipSet ||= new Set()).add(d);}", doi_val)
-        except Exception:
-            pass
+        # آزادسازی اسلات (اگر قبلاً گرفته شده)
+        await release_take_slot(payload.get("doi", ""))
         return
 
     doi = payload.get("doi")
@@ -1262,26 +1826,62 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
         TG_CHAT, f"⏳ شروع دانلود مقاله:\n<code>{doi}</code>", parse_mode="HTML"
     )
 
+    spec = bot_app.bot_data["client"]._spec
+    spec_saved: Optional[float] = None
+
+    async def fetch_speculated(src: str, page: Page, fetch, t_needed: float) -> Optional[str]:
+        """اگر lookup گمانه‌زنانه همین DOI را روی page آماده کرده، فقط مرحلهٔ دریافت (داخل قفل صفحه)."""
+        nonlocal spec_saved
+        saved = spec.consume(doi, src, page, t_needed)
+        if saved is None:
+            return None
+        try:
+            path = await fetch(page, doi, download_dir=str(DOWNLOAD_DIR), timeout_ms=SPEC_FETCH_TIMEOUT_MS)
+        except Exception:
+            logger.warning(f"[{doi}] دریافت از صفحهٔ آمادهٔ {src} ناموفق بود؛ مسیر کامل ...", exc_info=True)
+            spec.record(None)
+            return None
+        spec.record(saved)
+        spec_saved = saved
+        logger.info(f"[{doi}] lookup گمانه‌زنانهٔ {src} استفاده شد | صرفه‌جویی {saved:.1f}s")
+        return path
+
     async def try_iranpaper() -> Optional[str]:
         if not iran_page:
             return None
-        logger.info(f"[{doi}] تلاش از IranPaper ...")
-        return await iranpaper_download(iran_page, doi, download_dir=str(DOWNLOAD_DIR))
+        t_needed = time.monotonic()
+        await spec.wait(doi, "iranpaper")
+        async with page_lock(iran_page):
+            path = await fetch_speculated("iranpaper", iran_page, iranpaper_fetch, t_needed)
+            if path:
+                return path
+            logger.info(f"[{doi}] تلاش از IranPaper ...")
+            return await iranpaper_download(iran_page, doi, download_dir=str(DOWNLOAD_DIR))
 
 
     async def try_gigalib() -> Optional[str]:
         if not giga_page:
             return None
-        logger.info(f"[{doi}] تلاش از GigaLib ...")
-        # اطمینان از لاگین (ممکن است سشن پریده باشد)
-        try:
-            await gigalib_login(giga_page)
-        except Exception:
-            pass
-        return await gigalib_download(giga_page, doi, download_dir=str(DOWNLOAD_DIR))
+        t_needed = time.monotonic()
+        await spec.wait(doi, "gigalib")
+        async with page_lock(giga_page):
+            path = await fetch_speculated("gigalib", giga_page, gigalib_fetch, t_needed)
+            if path:
+                return path
+            logger.info(f"[{doi}] تلاش از GigaLib ...")
+            # اطمینان از لاگین (ممکن است سشن پریده باشد)
+            try:
+                await gigalib_login(giga_page)
+            except Exception:
+                pass
+            return await gigalib_download(giga_page, doi, download_dir=str(DOWNLOAD_DIR))
 
     downloaded_file_path: Optional[str] = None
     errors: list[str] = []
+    # منابعی که واقعاً اجرا شدند و بدون خطا «پیدا نشد» برگرداندند
+    not_found: list[str] = []
+    ranker = bot_app.bot_data["client"]._ranker
+    negcache = bot_app.bot_data["client"]._negcache
 
     # ترتیب منابع را از Policy بگیر
     for src in POLICY.sources():
@@ -1295,12 +1895,17 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
                 continue
 
             if downloaded_file_path:
+                ranker.record(doi, True, src)
+                negcache.record_success(doi)
                 await bot_app.bot.send_message(
                     TG_CHAT,
-                    f"✅ دانلود موفق از {src}:\n<code>{doi}</code>\nمسیر: <code>{html.escape(downloaded_file_path)}</code>",
+                    f"✅ دانلود موفق از {src}:\n<code>{doi}</code>\nمسیر: <code>{html.escape(downloaded_file_path)}</code>"
+                    + (f"\n⚡️ جستجوی پیش‌دستانه: {spec_saved:.1f}s زودتر" if spec_saved else ""),
                     parse_mode="HTML"
                 )
                 break  # موفق؛ از حلقه خارج شو
+            if iran_page if src == "iranpaper" else giga_page:
+                not_found.append(src)
 
         except Exception as e:
             logger.warning(f"[{doi}] منبع {src} ناموفق بود.", exc_info=True)
@@ -1308,6 +1913,18 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
 
     if not downloaded_file_path:
         # هیچ منبعی موفق نشد
+        if gate is not None and not await gate:
+            # قواعد post رد کرده‌اند و پیام رد رفته است؛ پیام شکست دوم و لغو لازم نیست،
+            # و این رد به حساب در دسترس نبودن مقاله گذاشته نمی‌شود
+            await release_take_slot(doi)
+            return
+        ranker.record(doi, False)
+        # خطای منبع (timeout، پریدن لاگین، قطعی) نشانهٔ نبودن مقاله نیست؛ فقط «پیدا نشد» واقعی ثبت می‌شود
+        if not_found:
+            negcache.record_failure(doi)
+        else:
+            logger.info("[%s] no source reported not-found (errors: %s); negative cache untouched",
+                        doi, ", ".join(errors) or "-")
         await bot_app.bot.send_message(
             TG_CHAT,
             "❌ فایل یافت/دانلود نشد "
@@ -1315,16 +1932,17 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
             parse_mode="HTML"
         )
 
-        # تلاش برای لغو روی سایت؛ اگر لغو نشود، لینک را بفرست و busy را آزاد نکن
+        # تلاش برای لغو روی سایت؛ اگر لغو نشود، لینک را بفرست و اسلات را آزاد نکن
         try:
-            ok_cancel = await cancel_scinet_request(scinet_page, detail_url, doi)
+            async with page_lock(scinet_page):
+                ok_cancel = await cancel_scinet_request(scinet_page, detail_url, doi)
             if ok_cancel:
                 await bot_app.bot.send_message(
                     TG_CHAT,
                     f"✅ درخواست کنسل شد:\n<code>{html.escape(doi)}</code>",
                     parse_mode="HTML"
                 )
-                # cancel_scinet_request خودش busy=false می‌کند و DOI را به skipSet می‌افزاید
+                # cancel_scinet_request خودش اسلات را آزاد می‌کند و DOI را به skipSet می‌افزاید
             else:
                 await bot_app.bot.send_message(
                     TG_CHAT,
@@ -1335,7 +1953,7 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
                     parse_mode="HTML",
                     disable_web_page_preview=True
                 )
-                # عمداً busy را آزاد نکن
+                # عمداً اسلات را آزاد نکن
         except Exception as e:
             logger.exception("cancel after download-fail")
             await bot_app.bot.send_message(
@@ -1347,7 +1965,7 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
                 parse_mode="HTML",
                 disable_web_page_preview=True
             )
-            # عمداً busy را آزاد نکن
+            # عمداً اسلات را آزاد نکن
         return
 
     # ← در این نقطه downloaded_file_path داریم (دانلود موفق بوده) و می‌خواهیم قبل از آپلود، تمیزش کنیم
@@ -1381,10 +1999,23 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
         logger.warning("PDF cleaning failed: %s", e, exc_info=True)
       
 
+    # حالت اول-اعلان: تا نتیجهٔ قواعد post نیامده آپلود نکن؛ رد → بدون آپلود برگرد
+    if gate is not None and not await gate:
+        logger.info(f"[{doi}] قواعد post رد کردند؛ آپلود انجام نمی‌شود.")
+        if not KEEP_LOCAL_PDFS:
+            for f in {downloaded_file_path, cleaned_file_path} - {None}:
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
+        await release_take_slot(doi)
+        return
+
     # ـــــــــــــــــــــــ 2) آپلود به SciNet ـــــــــــــــــــــــ
     try:
         logger.info(f"[{doi}] شروع آپلود به SciNet: {detail_url}")
-        await upload_to_scinet(scinet_page, detail_url, to_upload_path)
+        async with page_lock(scinet_page):
+            await upload_to_scinet(scinet_page, detail_url, to_upload_path)
         logger.info(f"[{doi}] آپلود موفق بود.")
         await bot_app.bot.send_message(
             TG_CHAT,
@@ -1393,8 +2024,6 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
         )
 
         try:
-            import os
-            from pathlib import Path  # اگر بالاتر ایمپورت نشده
             if not KEEP_LOCAL_PDFS:
                 if cleaned_file_path and Path(cleaned_file_path).exists():
                     os.remove(cleaned_file_path)
@@ -1412,13 +2041,8 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
             logger.warning(f"نتوانستم فایل‌ها را پاک/نگه دارم: {e}")
         # ⬆️⬆️ پایان بلاک پاک‌سازی/نگه‌داری ⬆️⬆️
 
-        # رسیدگی موفق → busy را آزاد کن
-        try:
-            await scinet_page.evaluate(
-                "(d)=>{window.busy=false;(window.skipSet ||= new Set()).add(d);}", doi
-            )
-        except Exception:
-            pass
+        # رسیدگی موفق → اسلات را آزاد کن
+        await release_take_slot(doi)
 
     except Exception as upload_err:
         logger.error(f"[{doi}] خطا در آپلود به SciNet: {upload_err}", exc_info=True)
@@ -1430,16 +2054,17 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
             parse_mode="HTML"
         )
 
-        # تلاش برای لغو؛ اگر نشد لینک بده و busy را آزاد نکن
+        # تلاش برای لغو؛ اگر نشد لینک بده و اسلات را آزاد نکن
         try:
-            ok_cancel = await cancel_scinet_request(scinet_page, detail_url, doi)
+            async with page_lock(scinet_page):
+                ok_cancel = await cancel_scinet_request(scinet_page, detail_url, doi)
             if ok_cancel:
                 await bot_app.bot.send_message(
                     TG_CHAT,
                     f"✅ درخواست کنسل شد:\n<code>{html.escape(doi)}</code>",
                     parse_mode="HTML"
                 )
-                # cancel_scinet_request خودش busy=false می‌کند
+                # cancel_scinet_request خودش اسلات را آزاد می‌کند
             else:
                 await bot_app.bot.send_message(
                     TG_CHAT,
@@ -1450,7 +2075,7 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
                     parse_mode="HTML",
                     disable_web_page_preview=True
                 )
-                # عمداً busy را آزاد نکن
+                # عمداً اسلات را آزاد نکن
         except Exception as e:
             logger.exception("cancel after upload-fail")
             await bot_app.bot.send_message(
@@ -1462,7 +2087,7 @@ async def start_download_process(bot_app, payload: dict, meta: dict):
                 parse_mode="HTML",
                 disable_web_page_preview=True
             )
-            # عمداً busy را آزاد نکن
+            # عمداً اسلات را آزاد نکن
 
 
 
@@ -1561,10 +2186,7 @@ async def cancel_scinet_request(page: Page, detail_url: str, doi: str) -> bool:
                 await page.wait_for_load_state("networkidle", timeout=5000)
             except Exception:
                 pass
-            try:
-                await page.evaluate("(d)=>{window.busy=false;(window.skipSet ||= new Set()).add(d);}", doi)
-            except Exception:
-                pass
+            await release_take_slot(doi)
             return True
 
         # 2) fallback: fetch مستقیم در context صفحه
@@ -1578,7 +2200,6 @@ async def cancel_scinet_request(page: Page, detail_url: str, doi: str) -> bool:
                     const success = r.redirected || r.ok || u.pathname.startsWith('/requests');
                     if (success) {
                         (window.skipSet ||= new Set()).add(d);
-                        window.busy = false;
                         return 1;
                     }
                     return 0;
@@ -1586,6 +2207,7 @@ async def cancel_scinet_request(page: Page, detail_url: str, doi: str) -> bool:
             }
         """, doi)
         if ok:
+            await release_take_slot(doi)
             return True
 
         # 3) fallback نهایی: رفتن مستقیم به URL لغو
@@ -1595,10 +2217,7 @@ async def cancel_scinet_request(page: Page, detail_url: str, doi: str) -> bool:
                 await page.wait_for_load_state("networkidle", timeout=4000)
             except Exception:
                 pass
-            try:
-                await page.evaluate("(d)=>{window.busy=false;(window.skipSet ||= new Set()).add(d);}", doi)
-            except Exception:
-                pass
+            await release_take_slot(doi)
             return True
         except Exception:
             pass
@@ -1683,6 +2302,7 @@ async def diag_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     url: location.href,
                     enabled: Boolean(window.enabled),
                     busy: Boolean(window.busy),
+                    slotsFree: window.slotsFree,
                     observerAlive: Boolean(window.__observerAlive),
                     hasArequest: !!window.arequest,
                     eventsReqLen: (window.events && window.events.request && window.events.request.length) || 0,
@@ -1703,8 +2323,27 @@ async def diag_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "state_enabled": getattr(state_obj, "enabled", None),
         "state_active": getattr(state_obj, "active", None),
         "state_skip_len": len(getattr(state_obj, "skip", []) or []),
-        "seen_dois_len": len(getattr(client, "_seen_dois", set()) or []),
-        "seen_ids_len": len(getattr(client, "_seen_ids", set()) or []),
+        "skip_registry": state_obj.skip.stats() if isinstance(getattr(state_obj, "skip", None), SkipRegistry) else None,
+        "state_persist": state_obj._persist.stats() if getattr(state_obj, "_persist", None) else None,
+        "detect_bus": client._bus.stats() if client else {},
+        "seen_snapshot": client._seen_persist.stats() if client else None,
+        "cdp_body_filter": dict(client._body_filter_stats) if client else {},
+        "cdp_pending": client._pending.stats() if getattr(client, "_pending", None) is not None else {},
+        "requests_snapshots": client._snapshots.stats() if client else {},
+        "direct_poller": client._poller.stats() if client and client._poller else None,
+        "direct_taker": client._taker.stats() if client and client._taker else None,
+        "take_paths": dict(client._take_paths) if client else {},
+        "skip_page": {"window": SKIP_PAGE_WINDOW, "py_rejects": client._skip_py_rejects} if client else None,
+        "take_slots": client._slots.stats() if client else {},
+        "ranking": client._ranker.stats() if client else {},
+        "take_rules": client._rules.stats() if client else {},
+        "negative_cache": client._negcache.stats() if client else {},
+        "speculative_lookup": client._spec.stats() if client else {},
+        "metadata_http": META_HTTP.stats(),
+        "metadata_cache": META_CACHE.stats() if META_CACHE else {},
+        "metadata_sources": META_RESOLVER.stats(),
+        "metadata_prefetch": META_PREFETCH.stats(),
+        "cdp_recorder": client._recorder.stats() if client and client._recorder else None,
     }
 
     payload = {"server": srv_info, "client_js": js_info}
@@ -1722,6 +2361,52 @@ async def diag_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 
+# ── /latency ───────────────────────────────
+@dbg
+async def latency_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_owner(update.effective_user.id):
+        return
+    client: SciNetClient = context.application.bot_data.get("client")
+    if not client:
+        await update.message.reply_text("❌ client پیدا نشد.")
+        return
+    text = ("⏱ latency (ms از رویداد تشخیص):\n<code>"
+            + html.escape(client._latency.format_text()) + "</code>")
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
+# ── /rules ─────────────────────────────────
+@dbg
+async def rules_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/rules | /rules reload | /rules dump"""
+    if not is_owner(update.effective_user.id):
+        return
+    client: SciNetClient = context.application.bot_data.get("client")
+    if not client:
+        await update.message.reply_text("❌ client پیدا نشد.")
+        return
+    action = (context.args[0].lower() if context.args else "")
+    if action == "reload":
+        try:
+            src = await client.reload_rules()
+        except Exception as e:
+            logger.exception("take rules reload failed")
+            await update.message.reply_text(f"❌ بارگذاری قواعد ناموفق بود (قواعد قبلی فعال‌اند): {e}")
+            return
+        await update.message.reply_text(f"✅ قواعد v{client._rules.version} از {src} بارگذاری شد.")
+        return
+    if action == "dump":
+        try:
+            path = client._rules.dump()
+        except Exception as e:
+            await update.message.reply_text(f"❌ ذخیرهٔ قواعد ناموفق بود: {e}")
+            return
+        await update.message.reply_text(f"💾 قواعد در {path} نوشته شد.")
+        return
+    text = "📏 take rules:\n<code>" + html.escape(client._rules.format_text()) + "</code>"
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
 @dbg
 async def monitor_loop(page: Page, duration_seconds: int):
     start_time = time.time()
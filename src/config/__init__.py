@@ -1 +1,4 @@
 from .download_policy import DownloadPolicy, get_policy
+from .response_filter import ResponseFilter, get_response_filter
+from .ranking import RankingWeights, get_ranking
+from .negative_cache import NegativeCacheConfig, get_negative_cache
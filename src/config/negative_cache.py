@@ -0,0 +1,34 @@
+# src/config/negative_cache.py
+from dataclasses import dataclass
+import os
+
+
+def _float(name: str, default: str) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+
+@dataclass(frozen=True)
+class NegativeCacheConfig:
+    """
+    کش منفی «در دسترس نبودن» مقاله‌ها: DOIهایی که هیچ منبعی پیدا نکرد و پیشوندهایی
+    که پشت‌سرهم شکست خورده‌اند، تا انقضا پیش از take رد می‌شوند (بدون take → cancel).
+    """
+    enabled: bool = os.getenv("NEG_CACHE", "1") == "1"
+    path: str = os.getenv("NEG_CACHE_FILE", "negative_cache.json")
+    # DOI: مدت رد پس از اولین شکست؛ هر شکست بعدی دو برابر (تا سقف)
+    doi_ttl: float = _float("NEG_DOI_TTL", str(24 * 3600))
+    doi_max_ttl: float = _float("NEG_DOI_MAX_TTL", str(14 * 24 * 3600))
+    # پیشوند: پس از چند شکست پیاپی (بدون هیچ موفقیتی در میان) و برای چه مدت
+    prefix_threshold: int = int(_float("NEG_PREFIX_THRESHOLD", "3"))
+    prefix_ttl: float = _float("NEG_PREFIX_TTL", str(6 * 3600))
+
+
+_CFG = None
+def get_negative_cache() -> NegativeCacheConfig:
+    global _CFG
+    if _CFG is None:
+        _CFG = NegativeCacheConfig()
+    return _CFG
@@ -0,0 +1,41 @@
+# src/config/ranking.py
+from dataclasses import dataclass
+import os
+
+
+def _csv(name: str, default: str = "") -> tuple[str, ...]:
+    raw = os.getenv(name, default)
+    return tuple(x.strip().lower() for x in raw.split(",") if x.strip())
+
+
+def _float(name: str, default: str) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+
+@dataclass(frozen=True)
+class RankingWeights:
+    """
+    وزن‌های امتیازدهی کاندیدها در یک batch از /requests.
+    score = reward·log(1+جایزه) + title·کیفیت‌عنوان + prefix·(ترجیح/پرهیز ناشر) + history·(نرخ موفقیت پیشوند)
+    """
+    reward: float = _float("RANK_W_REWARD", "1.0")
+    title: float = _float("RANK_W_TITLE", "0.5")
+    prefix: float = _float("RANK_W_PREFIX", "1.0")
+    history: float = _float("RANK_W_HISTORY", "2.0")
+    # پیشوندهای DOI (مثل 10.1016) که منابع ما معمولاً دارند/ندارند
+    prefer_prefixes: tuple[str, ...] = _csv("RANK_PREFER_PREFIXES")
+    avoid_prefixes: tuple[str, ...] = _csv("RANK_AVOID_PREFIXES")
+    # کاندیدهایی که اسلات آزاد نداشتند تا چند ثانیه برای اسلات بعدی نگه داشته شوند
+    defer_ttl: float = _float("RANK_DEFER_TTL", "120")
+    history_file: str = os.getenv("RANK_HISTORY_FILE", "prefix_stats.json")
+
+
+_WEIGHTS = None
+def get_ranking() -> RankingWeights:
+    global _WEIGHTS
+    if _WEIGHTS is None:
+        _WEIGHTS = RankingWeights()
+    return _WEIGHTS
@@ -0,0 +1,58 @@
+# src/config/response_filter.py
+from dataclasses import dataclass
+import os
+import re
+
+
+def _csv(name: str, default: str, *, lower: bool = True) -> tuple[str, ...]:
+    # الگوهای regex نباید کوچک شوند (\D → \d معنی را برعکس می‌کند)؛ آن‌ها با re.I کامپایل می‌شوند
+    raw = os.getenv(name, default)
+    return tuple((x.strip().lower() if lower else x.strip()) for x in raw.split(",") if x.strip())
+
+
+@dataclass(frozen=True)
+class ResponseFilter:
+    """
+    پیش‌فیلتر پاسخ‌های شبکه قبل از Network.getResponseBody.
+    فقط بدنهٔ پاسخ‌هایی گرفته می‌شود که به endpointهای مجاز بخورند،
+    یا از نوع XHR/Fetch با MIME متنی/JSON باشند.
+    """
+    # نوع منابعی که هرگز بدنه‌شان را نمی‌خواهیم (CDP Network.ResourceType)
+    deny_types: tuple[str, ...] = _csv(
+        "CDP_BODY_DENY_TYPES",
+        "image,font,stylesheet,media,manifest,ping,cspviolationreport,texttrack,signedexchange,prefetch",
+    )
+    # نوع منابعی که بدون تطابق URL هم (با MIME مجاز) بررسی می‌شوند
+    allow_types: tuple[str, ...] = _csv("CDP_BODY_ALLOW_TYPES", "xhr,fetch,eventsource")
+    allow_mimes: tuple[str, ...] = _csv("CDP_BODY_ALLOW_MIMES", "json,text/plain")
+    # الگوهای URL (regex) که همیشه بررسی می‌شوند/هرگز بررسی نمی‌شوند
+    allow_urls: tuple[str, ...] = _csv("CDP_BODY_ALLOW_URLS", r"/requests\b,/request\b,/api/", lower=False)
+    deny_urls: tuple[str, ...] = _csv(
+        "CDP_BODY_DENY_URLS",
+        r"google-analytics,googletagmanager,doubleclick,yandex\.ru/metrika,mc\.yandex,/favicon\.ico",
+        lower=False,
+    )
+
+    def __post_init__(self):
+        object.__setattr__(self, "_allow_re", re.compile("|".join(self.allow_urls), re.I) if self.allow_urls else None)
+        object.__setattr__(self, "_deny_re", re.compile("|".join(self.deny_urls), re.I) if self.deny_urls else None)
+
+    def should_fetch(self, resource_type: str | None, mime: str | None, url: str | None) -> bool:
+        rtype = (resource_type or "").lower()
+        url = url or ""
+        if rtype in self.deny_types:
+            return False
+        if self._deny_re is not None and self._deny_re.search(url):
+            return False
+        if self._allow_re is not None and self._allow_re.search(url):
+            return True
+        mime = (mime or "").lower()
+        return rtype in self.allow_types and any(m in mime for m in self.allow_mimes)
+
+
+_FILTER = None
+def get_response_filter() -> ResponseFilter:
+    global _FILTER
+    if _FILTER is None:
+        _FILTER = ResponseFilter()
+    return _FILTER
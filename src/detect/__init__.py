@@ -0,0 +1,9 @@
+from .doi import normalize_doi, doi_prefix, scan_dois
+from .bus import DetectionBus
+from .pending import PendingTable
+from .snapshot import SnapshotDiffer
+from .latency import LatencyTracker
+from .slots import TakeSlots
+from .ranking import CandidateRanker
+from .rules import RuleSet
+from .negcache import NegativeCache
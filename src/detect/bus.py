@@ -0,0 +1,105 @@
+# src/detect/bus.py
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .doi import normalize_doi
+from .seen import SeenSet
+
+logger = logging.getLogger(__name__)
+
+# handler(doc, src=..., is_doc=...)
+Handler = Callable[..., Awaitable[None]]
+
+
+class DetectionBus:
+    """
+    گذرگاه واحد تشخیص: همهٔ منابع (CDP/WS/Playwright/JS observer) اینجا publish می‌کنند.
+    ادعا (claim) روی DOI نرمال‌شده و _id به‌صورت همگام و پیش از هر await انجام می‌شود؛
+    بنابراین فقط اولین نسخه به handler (و /take) می‌رسد و بقیه شمرده و دور ریخته می‌شوند.
+    دیده‌ها SeenSet محدود (LRU + TTL) اند و با dump/restore از ری‌استارت و recovery عبور می‌کنند؛
+    on_change پس از هر ادعا (برنده، یا تکراری که زمانش تازه شد) صدا زده می‌شود (مثلاً علامت‌گذاری snapshot).
+    """
+
+    def __init__(self, handler: Optional[Handler] = None, *, max_size: int = 50_000,
+                 ttl: float = 6 * 3600, on_change: Optional[Callable[[], None]] = None):
+        self.handler = handler
+        self.seen_ids = SeenSet(max_size, ttl)
+        self.seen_dois = SeenSet(max_size, ttl)
+        self.on_change = on_change
+        self.wins: Counter[str] = Counter()
+        self.suppressed: Counter[str] = Counter()
+
+    def claim(self, src: str, doi: str | None = None, _id: Any = None) -> bool:
+        """اگر این درخواست قبلاً دیده نشده، آن را به نام src ثبت می‌کند و True برمی‌گرداند."""
+        key_doi = normalize_doi(doi)
+        key_id = str(_id).strip() if _id else ""
+        if not (key_doi or key_id):
+            return False
+        seen = (key_id and key_id in self.seen_ids) or (key_doi and key_doi in self.seen_dois)
+        # تکرار هم زمان دیده‌شدن را تازه می‌کند تا درخواستی که هنوز در لیست است با انقضای TTL دوباره برنده نشود
+        if key_id:
+            self.seen_ids.add(key_id)
+        if key_doi:
+            self.seen_dois.add(key_doi)
+        if self.on_change is not None:
+            self.on_change()
+        if seen:
+            self.suppressed[src] += 1
+            return False
+        self.wins[src] += 1
+        return True
+
+    def publish(self, src: str, doc: Dict[str, Any], *, is_doc: bool = True,
+                marks: Optional[Dict[str, float]] = None) -> Optional[asyncio.Task]:
+        """
+        یک داکیومنت/payload کشف‌شده را منتشر می‌کند.
+        اگر برنده باشد، handler بلافاصله در یک Task جدا اجرا می‌شود.
+        marks: زمان‌های monotonic مراحل پیش از گذرگاه (event/body) برای LatencyTracker.
+        """
+        if not isinstance(doc, dict):
+            return None
+        doi = doc.get("doi") or doc.get("DOI") or (doc.get("id") if is_doc else None) or ""
+        if not isinstance(doi, str):
+            doi = str(doi)
+        if not self.claim(src, doi, doc.get("_id")):
+            return None
+        if self.handler is None:
+            return None
+        return asyncio.create_task(self.handler(doc, src=src, is_doc=is_doc, marks=marks))
+
+    def reset(self):
+        self.seen_ids.clear()
+        self.seen_dois.clear()
+
+    def prune(self) -> int:
+        return self.seen_ids.prune() + self.seen_dois.prune()
+
+    def dump(self) -> bytes:
+        """snapshot دیده‌ها (قابل صدا زدن از thread نویسنده)."""
+        return json.dumps({"ids": self.seen_ids.items(), "dois": self.seen_dois.items()}).encode("utf-8")
+
+    def restore(self, path: str | Path) -> int:
+        """بازگردانی snapshot؛ فایل نبود/خراب = شروع خالی."""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            logger.warning("seen snapshot %s unreadable; starting empty", path, exc_info=True)
+            return 0
+        return self.seen_ids.restore(data.get("ids") or []) + self.seen_dois.restore(data.get("dois") or [])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "seen_ids": self.seen_ids.stats(),
+            "seen_dois": self.seen_dois.stats(),
+            "wins": dict(self.wins),
+            "suppressed": dict(self.suppressed),
+        }
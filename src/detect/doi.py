@@ -0,0 +1,52 @@
+# src/detect/doi.py
+from __future__ import annotations
+
+import re
+from typing import List
+
+_DOI_PREFIXES = ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:")
+
+DOI_RE = re.compile(r"\b10\.\d{4,9}/[-._;()/:A-Z0-9]+\b", re.I)
+DOI_BYTES_RE = re.compile(rb"\b10\.\d{4,9}/[-._;()/:A-Z0-9]+\b", re.I)
+_PREFIX_BYTES_RE = re.compile(rb"10\.")
+
+
+def normalize_doi(doi: str | None) -> str:
+    """
+    شکل یکسان DOI برای کلید ضدتکرار/کش:
+    حذف فاصله و پیشوندهای doi.org/doi:، حروف کوچک و حذف علائم انتهایی.
+    """
+    d = (doi or "").strip()
+    low = d.lower()
+    for p in _DOI_PREFIXES:
+        if low.startswith(p):
+            low = low[len(p):]
+            break
+    return low.rstrip(".,;")
+
+
+def doi_prefix(doi: str | None) -> str:
+    """پیشوند ناشر DOI (مثلاً 10.1016)؛ برای DOI نامعتبر رشتهٔ خالی."""
+    key = normalize_doi(doi)
+    head, sep, _ = key.partition("/")
+    return head if sep and head.startswith("10.") else ""
+
+
+def scan_dois(buf: str | bytes | bytearray | memoryview | None) -> List[str]:
+    """
+    DOIها را مستقیماً روی bytes/memoryview پیدا می‌کند (بدون decode کل بدنه).
+    اول یک پیش‌فیلتر ارزان b"10." و فقط برای تطابق‌های واقعی str ساخته می‌شود.
+    ورودی str هم برای URL/postData/فریم WS پذیرفته می‌شود.
+    """
+    if not buf:
+        return []
+    if isinstance(buf, str):
+        if "10." not in buf:
+            return []
+        return DOI_RE.findall(buf)
+    if isinstance(buf, memoryview):
+        if _PREFIX_BYTES_RE.search(buf) is None:
+            return []
+    elif b"10." not in buf:
+        return []
+    return [m.decode("ascii", "ignore") for m in DOI_BYTES_RE.findall(buf)]
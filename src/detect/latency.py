@@ -0,0 +1,121 @@
+# src/detect/latency.py
+from __future__ import annotations
+
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional
+
+from .doi import normalize_doi
+
+# مراحل مسیر تشخیص → take به ترتیب زمانی
+STAGES = ("event", "body", "handled", "pretake", "take_sent", "take_done")
+
+
+def _parse_created(created: Any) -> Optional[float]:
+    """createdAt سایت (ISO-8601 یا epoch ms) → epoch ثانیه."""
+    if created in (None, ""):
+        return None
+    try:
+        if isinstance(created, (int, float)):
+            return float(created) / (1000.0 if created > 1e11 else 1.0)
+        return datetime.fromisoformat(str(created).replace("Z", "+00:00")).timestamp()
+    except Exception:
+        return None
+
+
+def _pct(sorted_vals: list[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[i]
+
+
+class LatencyTracker:
+    """
+    زمان‌سنجی هر DOI از لحظهٔ رویداد تشخیص تا پاسخ /take با ساعت monotonic.
+    برای هر منبع تشخیص و هر مرحله یک پنجرهٔ غلتان نگه می‌داریم تا
+    صدک‌ها (p50/p90/p99) در /latency گزارش شوند.
+    """
+
+    def __init__(self, window: int = 500, max_open: int = 256):
+        self.window = window
+        self.max_open = max_open
+        self._open: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._hist: Dict[str, Dict[str, Deque[float]]] = {}
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+
+    def begin(self, doi: str, src: str, marks: Optional[Dict[str, float]] = None,
+              created_at: Any = None) -> Optional[Dict[str, Any]]:
+        key = normalize_doi(doi)
+        if not key:
+            return None
+        now = time.monotonic()
+        tr = self._open.get(key)
+        if tr is None:
+            tr = {"src": src, "marks": {"event": now}, "created": _parse_created(created_at),
+                  "wall_at_event": time.time()}
+            if marks:
+                tr["marks"].update(marks)
+                ev = tr["marks"]["event"]
+                tr["wall_at_event"] = time.time() - (now - ev)
+            self._open[key] = tr
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        elif created_at and tr.get("created") is None:
+            tr["created"] = _parse_created(created_at)
+        return tr
+
+    def mark(self, doi: str, stage: str, t: Optional[float] = None):
+        tr = self._open.get(normalize_doi(doi))
+        if tr is not None:
+            tr["marks"].setdefault(stage, t if t is not None else time.monotonic())
+
+    def finish(self, doi: str, outcome: str = "done"):
+        tr = self._open.pop(normalize_doi(doi), None)
+        if tr is None:
+            return
+        src = tr["src"] or "unknown"
+        marks = tr["marks"]
+        ev = marks.get("event")
+        hist = self._hist.setdefault(src, {})
+        for stage in STAGES[1:]:
+            t = marks.get(stage)
+            if t is not None and ev is not None:
+                hist.setdefault(stage, deque(maxlen=self.window)).append((t - ev) * 1000)
+        if tr.get("created") is not None:
+            lag = (tr["wall_at_event"] - tr["created"]) * 1000
+            if lag >= 0:
+                hist.setdefault("created_to_event", deque(maxlen=self.window)).append(lag)
+        oc = self.outcomes.setdefault(src, {})
+        oc[outcome] = oc.get(outcome, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for src, stages in self._hist.items():
+            row = {}
+            for stage, vals in stages.items():
+                s = sorted(vals)
+                row[stage] = {
+                    "n": len(s),
+                    "p50": round(_pct(s, 0.50), 1),
+                    "p90": round(_pct(s, 0.90), 1),
+                    "p99": round(_pct(s, 0.99), 1),
+                }
+            out[src] = {"ms": row, "outcomes": dict(self.outcomes.get(src, {}))}
+        return out
+
+    def format_text(self) -> str:
+        """متن خلاصه برای دستور /latency (میلی‌ثانیه، نسبت به رویداد تشخیص)."""
+        st = self.stats()
+        if not st:
+            return "هنوز نمونه‌ای ثبت نشده است."
+        lines = []
+        for src, row in sorted(st.items()):
+            oc = ", ".join(f"{k}={v}" for k, v in sorted(row["outcomes"].items()))
+            lines.append(f"[{src}] {oc}")
+            for stage in STAGES[1:] + ("created_to_event",):
+                v = row["ms"].get(stage)
+                if v:
+                    lines.append(f"  {stage:<16} n={v['n']:<4} p50={v['p50']:>8} p90={v['p90']:>8} p99={v['p99']:>8}")
+        return "\n".join(lines)
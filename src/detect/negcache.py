@@ -0,0 +1,138 @@
+# src/detect/negcache.py
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.config.negative_cache import NegativeCacheConfig, get_negative_cache
+from src.utils.persist import CoalescedWriter
+from .doi import doi_prefix, normalize_doi
+
+logger = logging.getLogger(__name__)
+
+REASON_DOI = "neg_cache_doi"
+REASON_PREFIX = "neg_cache_prefix"
+
+
+class NegativeCache:
+    """
+    کش ماندگار «پیدا نشد» با کلید DOI و پیشوند DOI.
+    وقتی همهٔ منابع برای یک DOI شکست می‌خورند، آن DOI تا انقضا (با backoff نمایی) و
+    پیشوندی که چند بار پیاپی شکست خورده تا prefix_ttl پیش از take رد می‌شوند؛
+    یک دانلود موفق از همان پیشوند، شمارش پیاپی و رد پیشوند را پاک می‌کند.
+    زمان‌ها wall-clock هستند تا پس از ری‌استارت معتبر بمانند.
+    """
+
+    def __init__(self, cfg: Optional[NegativeCacheConfig] = None, path: str | Path | None = None):
+        self.cfg = cfg or get_negative_cache()
+        self.path = Path(path or self.cfg.path)
+        # DOI نرمال‌شده → {"doi", "fails", "last", "until"}
+        self.dois: Dict[str, Dict[str, Any]] = {}
+        # پیشوند → {"fails", "ok", "streak", "until"}
+        self.prefixes: Dict[str, Dict[str, Any]] = {}
+        self.checks = 0
+        self.hits = {REASON_DOI: 0, REASON_PREFIX: 0}
+        self._load()
+        # ذخیره بیرون از event loop و اتمیک؛ جهش‌ها زیر همان lock که dump می‌گیرد
+        self._lock = threading.Lock()
+        self._persist = CoalescedWriter(self.path, self._dump, interval=1.0, lock=self._lock,
+                                        name="negative_cache")
+
+    # --- persistence -----------------------------------------------------
+    def _load(self):
+        try:
+            if self.path.exists():
+                raw = json.loads(self.path.read_text(encoding="utf-8")) or {}
+                self.dois = raw.get("doi") or {}
+                self.prefixes = raw.get("prefix") or {}
+        except Exception:
+            logger.warning("negative cache unreadable: %s", self.path, exc_info=True)
+        self._prune()
+
+    def _prune(self):
+        """DOIهایی که مدت‌ها از انقضایشان گذشته دیگر برای backoff هم لازم نیستند."""
+        horizon = time.time() - self.cfg.doi_max_ttl
+        for key in [k for k, v in self.dois.items() if v.get("until", 0) < horizon]:
+            del self.dois[key]
+
+    def _dump(self) -> bytes:
+        return json.dumps({"doi": self.dois, "prefix": self.prefixes}, ensure_ascii=False).encode("utf-8")
+
+    def save(self):
+        self._persist.mark()
+
+    def close(self):
+        """shutdown: تغییرات باقی‌مانده همزمان نوشته می‌شوند."""
+        self._persist.close()
+
+    # --- lookup ----------------------------------------------------------
+    def check(self, doi: str) -> Optional[str]:
+        """دلیل رد (REASON_DOI/REASON_PREFIX) اگر DOI یا پیشوندش هنوز منفی است؛ وگرنه None."""
+        if not self.cfg.enabled:
+            return None
+        self.checks += 1
+        now = time.time()
+        e = self.dois.get(normalize_doi(doi))
+        if e and e.get("until", 0) > now:
+            self.hits[REASON_DOI] += 1
+            return REASON_DOI
+        p = self.prefixes.get(doi_prefix(doi))
+        if p and p.get("until", 0) > now:
+            self.hits[REASON_PREFIX] += 1
+            return REASON_PREFIX
+        return None
+
+    # --- outcomes --------------------------------------------------------
+    def record_failure(self, doi: str):
+        """همهٔ منابع برای این DOI شکست خوردند."""
+        key = normalize_doi(doi)
+        if not key:
+            return
+        now = time.time()
+        prefix = doi_prefix(doi)
+        blocked = None
+        with self._lock:
+            e = self.dois.setdefault(key, {"doi": doi.strip(), "fails": 0})
+            e["fails"] += 1
+            e["last"] = now
+            e["until"] = now + min(self.cfg.doi_ttl * 2 ** (e["fails"] - 1), self.cfg.doi_max_ttl)
+            if prefix:
+                p = self.prefixes.setdefault(prefix, {"fails": 0, "ok": 0, "streak": 0, "until": 0})
+                p["fails"] += 1
+                p["streak"] += 1
+                if p["streak"] >= self.cfg.prefix_threshold:
+                    p["until"] = now + self.cfg.prefix_ttl
+                    blocked = p["streak"]
+        if blocked is not None:
+            logger.info("negative cache: prefix %s blocked for %.0fs (streak=%d)",
+                        prefix, self.cfg.prefix_ttl, blocked)
+        self.save()
+
+    def record_success(self, doi: str):
+        """دانلود موفق: DOI از کش خارج و شمارش پیاپی پیشوند صفر می‌شود."""
+        with self._lock:
+            changed = self.dois.pop(normalize_doi(doi), None) is not None
+            p = self.prefixes.get(doi_prefix(doi))
+            if p is not None:
+                p["ok"] += 1
+                p["streak"] = 0
+                p["until"] = 0
+                changed = True
+        if changed:
+            self.save()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "enabled": self.cfg.enabled,
+            "checks": self.checks,
+            "hits": dict(self.hits),
+            "dois": len(self.dois),
+            "dois_blocked": sum(1 for v in self.dois.values() if v.get("until", 0) > now),
+            "prefixes_blocked": {k: round(v["until"] - now) for k, v in self.prefixes.items()
+                                 if v.get("until", 0) > now},
+        }
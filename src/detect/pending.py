@@ -0,0 +1,70 @@
+# src/detect/pending.py
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class PendingTable:
+    """
+    جدول پاسخ‌های منتظر loadingFinished با سقف اندازه و عمر (TTL).
+    درخواست‌های fail/cancel یا stream بی‌پایان (long-poll/SSE) دیگر تا ابد نمی‌مانند:
+    با هر put، ورودی‌های قدیمی‌تر از ttl و مازاد بر max_size از ابتدای صف حذف می‌شوند.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 512):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.evicted_ttl = 0
+        self.evicted_size = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, rid: str, url: str):
+        now = time.monotonic()
+        self._items.pop(rid, None)
+        self._items[rid] = {"url": url, "ts": now}
+        self._evict(now)
+
+    def pop(self, rid: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        return self._items.pop(rid, default)
+
+    def fail(self, rid: str):
+        """برای Network.loadingFailed: ورودی را بدون گرفتن بدنه حذف می‌کند."""
+        if self._items.pop(rid, None) is not None:
+            self.failed += 1
+
+    def sweep(self):
+        self._evict(time.monotonic())
+
+    def _evict(self, now: float):
+        items = self._items
+        while items:
+            rid, entry = next(iter(items.items()))
+            if now - entry["ts"] > self.ttl:
+                items.popitem(last=False)
+                self.evicted_ttl += 1
+            elif len(items) > self.max_size:
+                items.popitem(last=False)
+                self.evicted_size += 1
+            else:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        self.sweep()
+        oldest = 0.0
+        if self._items:
+            oldest = time.monotonic() - next(iter(self._items.values()))["ts"]
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_size": self.evicted_size,
+            "failed": self.failed,
+            "oldest_age_s": round(oldest, 1),
+        }
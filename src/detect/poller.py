@@ -0,0 +1,160 @@
+# src/detect/poller.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+from src.utils.cookies import cookie_header
+
+logger = logging.getLogger(__name__)
+
+BodyFn = Callable[[str, bytes], Awaitable[None]]
+CookieSource = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+
+class DirectPoller:
+    """
+    Poller مستقیم HTTP برای فید درخواست‌های Sci-Net، مستقل از چرخهٔ رفرش صفحه.
+    کوکی‌ها از کانتکست Playwright (یا storage_state) گرفته می‌شوند، اتصال‌ها keep-alive
+    هستند و با ETag/Last-Modified درخواست شرطی زده می‌شود (304 = بدون تغییر).
+    بدنه‌ها به همان مسیر _process_body → DetectionBus → _handle_new_request_payload می‌روند.
+    وقتی مرورگر در حال بازیابی است هم به کار ادامه می‌دهد.
+    """
+
+    def __init__(self, url: str, on_body: BodyFn, cookie_source: CookieSource, *,
+                 interval: float = 2.0, jitter: float = 0.2, timeout: float = 5.0,
+                 user_agent: str = "", cookie_refresh: float = 300.0):
+        self.url = url
+        self.on_body = on_body
+        self.cookie_source = cookie_source
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.cookie_refresh = cookie_refresh
+
+        self._task: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._cookie = ""
+        self._cookie_ts = 0.0
+        self._etag = ""
+        self._last_modified = ""
+
+        self.polls = 0
+        self.not_modified = 0
+        self.bodies = 0
+        self.errors = 0
+        self.auth_failures = 0
+        self.last_status: Optional[int] = None
+        self.last_rtt_ms = 0.0
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _refresh_cookies(self):
+        try:
+            cookies = await self.cookie_source()
+        except Exception:
+            logger.debug("poller cookie refresh failed", exc_info=True)
+            return
+        hdr = cookie_header(cookies, self.url)
+        if hdr:
+            self._cookie = hdr
+        self._cookie_ts = time.monotonic()
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=2, keepalive_timeout=60, ttl_dns_cache=300)
+            headers = {"Accept": "application/json, text/plain, */*", "X-Requested-With": "XMLHttpRequest"}
+            if self.user_agent:
+                headers["User-Agent"] = self.user_agent
+            self._session = aiohttp.ClientSession(
+                connector=connector, headers=headers,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def poll_once(self):
+        if not self._cookie or time.monotonic() - self._cookie_ts > self.cookie_refresh:
+            await self._refresh_cookies()
+        sess = self._ensure_session()
+        headers = {"Cookie": self._cookie}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+
+        self.polls += 1
+        t0 = time.perf_counter()
+        async with sess.get(self.url, headers=headers, allow_redirects=False) as r:
+            self.last_status = r.status
+            if r.status == 304:
+                self.not_modified += 1
+                self.last_rtt_ms = (time.perf_counter() - t0) * 1000
+                return
+            if r.status in (301, 302, 303, 401, 403):
+                # سشن پریده یا به لاگین ریدایرکت شد → کوکی تازه بگیر
+                self.auth_failures += 1
+                self._cookie_ts = 0.0
+                return
+            if not (200 <= r.status < 300):
+                self.errors += 1
+                return
+            body = await r.read()
+            self.last_rtt_ms = (time.perf_counter() - t0) * 1000
+            self._etag = r.headers.get("ETag", "")
+            self._last_modified = r.headers.get("Last-Modified", "")
+        self.bodies += 1
+        await self.on_body(self.url, body)
+
+    async def _loop(self):
+        backoff = self.interval
+        while True:
+            try:
+                await self.poll_once()
+                backoff = self.interval
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                self.errors += 1
+                backoff = min(max(backoff, self.interval) * 2, 60.0)
+                logger.debug("direct poll failed: %s", e)
+            delay = backoff * random.uniform(1 - self.jitter, 1 + self.jitter)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "url": self.url,
+            "interval_s": self.interval,
+            "polls": self.polls,
+            "bodies": self.bodies,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "auth_failures": self.auth_failures,
+            "last_status": self.last_status,
+            "last_rtt_ms": round(self.last_rtt_ms, 1),
+        }
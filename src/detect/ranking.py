@@ -0,0 +1,170 @@
+# src/detect/ranking.py
+from __future__ import annotations
+
+import json
+import logging
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.config.ranking import RankingWeights, get_ranking
+from src.utils.persist import CoalescedWriter
+from .doi import doi_prefix, normalize_doi
+from .rules import RuleSet
+
+logger = logging.getLogger(__name__)
+
+
+def _doc_doi(doc: Dict[str, Any]) -> str:
+    d = doc.get("doi") or doc.get("DOI") or doc.get("id") or ""
+    return d.strip() if isinstance(d, str) else str(d)
+
+
+def _reward(doc: Dict[str, Any]) -> float:
+    req = doc.get("request") if isinstance(doc.get("request"), dict) else {}
+    raw = req.get("reward", doc.get("reward"))
+    try:
+        return max(0.0, float(raw))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CandidateRanker:
+    """
+    رتبه‌بندی کاندیدهای یک batch از /requests پیش از هر take.
+    امتیاز از جایزه، کیفیت عنوان، ترجیح پیشوند ناشر و نرخ موفقیت تاریخی دانلود
+    برای همان پیشوند ساخته می‌شود. کاندیدهایی که اسلات آزاد نداشتند «معوق» می‌مانند
+    و با آزادشدن اسلات، بهترینشان دوباره فرستاده می‌شود.
+    """
+
+    def __init__(self, weights: Optional[RankingWeights] = None, history_path: str | Path | None = None,
+                 rules: Optional[RuleSet] = None):
+        self.w = weights or get_ranking()
+        # کاندیدی که قواعد pre ردش می‌کنند، آخر صف می‌رود
+        self.rules = rules
+        self.history_path = Path(history_path or self.w.history_file)
+        # پیشوند → {"ok": n, "fail": n, "sources": {منبع: n}}
+        self.history: Dict[str, Dict[str, Any]] = self._load()
+        # ذخیرهٔ تاریخچه بیرون از event loop: اتمیک و حداکثر یک بار در هر بازه
+        self._history_lock = threading.Lock()
+        self._persist = CoalescedWriter(self.history_path, self._dump, interval=2.0,
+                                        lock=self._history_lock, name="prefix_stats")
+        # کلید DOI → (امتیاز، زمان، doc، src، is_doc)
+        self._deferred: Dict[str, Tuple[float, float, Dict[str, Any], str, bool]] = {}
+        self.ranked_batches = 0
+        self.reordered = 0
+        self.deferred_total = 0
+        self.deferred_sent = 0
+        self.deferred_expired = 0
+
+    # --- history ---------------------------------------------------------
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if self.history_path.exists():
+                return json.loads(self.history_path.read_text(encoding="utf-8")) or {}
+        except Exception:
+            logger.warning("prefix history unreadable: %s", self.history_path, exc_info=True)
+        return {}
+
+    def _dump(self) -> bytes:
+        return json.dumps(self.history, ensure_ascii=False).encode("utf-8")
+
+    def save(self):
+        self._persist.mark()
+
+    def close(self):
+        """shutdown: تاریخچهٔ باقی‌مانده همزمان نوشته می‌شود."""
+        self._persist.close()
+
+    def record(self, doi: str, ok: bool, source: str | None = None):
+        """نتیجهٔ نهایی دانلود یک DOI (برای امتیاز تاریخی همان پیشوند)."""
+        prefix = doi_prefix(doi)
+        if not prefix:
+            return
+        with self._history_lock:
+            h = self.history.setdefault(prefix, {"ok": 0, "fail": 0, "sources": {}})
+            h["ok" if ok else "fail"] += 1
+            if ok and source:
+                h["sources"][source] = h["sources"].get(source, 0) + 1
+        self.save()
+
+    def success_rate(self, doi: str) -> float:
+        """نرخ موفقیت هموارشده (Laplace)؛ پیشوند بی‌سابقه = 0.5."""
+        h = self.history.get(doi_prefix(doi)) or {}
+        ok, fail = h.get("ok", 0), h.get("fail", 0)
+        return (ok + 1) / (ok + fail + 2)
+
+    # --- scoring ---------------------------------------------------------
+    @staticmethod
+    def title_quality(title: str) -> float:
+        """امتیازی بین 0 و 1؛ عنوان‌های توصیفی‌تر کمی بالاتر."""
+        t = (title or "").strip()
+        if not t:
+            return 0.0
+        q = min(len(t.split()), 12) / 12
+        if t.isupper():
+            q -= 0.5
+        return max(0.0, q)
+
+    def score(self, doc: Dict[str, Any]) -> float:
+        doi = _doc_doi(doc)
+        title = str(doc.get("title") or doc.get("Title") or "")
+        if not doi:
+            return -math.inf
+        if self.rules is not None and self.rules.evaluate("pre", {"title": title, "doi": doi}, count=False):
+            return -math.inf
+        q = self.title_quality(title)
+        prefix = doi_prefix(doi)
+        pref = 1.0 if prefix in self.w.prefer_prefixes else (-1.0 if prefix in self.w.avoid_prefixes else 0.0)
+        hist = (self.success_rate(doi) - 0.5) * 2
+        return (self.w.reward * math.log1p(_reward(doc)) + self.w.title * q
+                + self.w.prefix * pref + self.w.history * hist)
+
+    def rank(self, docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """داک‌ها به ترتیب امتیاز نزولی (پایدار)؛ ردشده‌های پیش‌سنجی در انتها."""
+        docs = [d for d in docs if isinstance(d, dict)]
+        if len(docs) < 2:
+            return docs
+        scored = [(self.score(d), i, d) for i, d in enumerate(docs)]
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        self.ranked_batches += 1
+        if any(i != pos for pos, (_, i, _) in enumerate(scored)):
+            self.reordered += 1
+        return [d for _, _, d in scored]
+
+    # --- deferred --------------------------------------------------------
+    def defer(self, doc: Dict[str, Any], src: str, is_doc: bool = True):
+        key = normalize_doi(_doc_doi(doc))
+        if not key or key in self._deferred:
+            return
+        self._deferred[key] = (self.score(doc), time.monotonic(), doc, src, is_doc)
+        self.deferred_total += 1
+
+    def discard(self, doi: str):
+        self._deferred.pop(normalize_doi(doi), None)
+
+    def pop_deferred(self) -> Optional[Tuple[Dict[str, Any], str, bool]]:
+        """بهترین کاندید معوقِ هنوز تازه؛ قدیمی‌تر از defer_ttl دور ریخته می‌شوند."""
+        now = time.monotonic()
+        for key in [k for k, v in self._deferred.items() if now - v[1] > self.w.defer_ttl]:
+            del self._deferred[key]
+            self.deferred_expired += 1
+        if not self._deferred:
+            return None
+        key = max(self._deferred, key=lambda k: (self._deferred[k][0], -self._deferred[k][1]))
+        _, _, doc, src, is_doc = self._deferred.pop(key)
+        self.deferred_sent += 1
+        return doc, src, is_doc
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ranked_batches": self.ranked_batches,
+            "reordered": self.reordered,
+            "deferred_waiting": len(self._deferred),
+            "deferred_total": self.deferred_total,
+            "deferred_sent": self.deferred_sent,
+            "deferred_expired": self.deferred_expired,
+            "prefixes_known": len(self.history),
+        }
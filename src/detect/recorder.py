@@ -0,0 +1,154 @@
+# src/detect/recorder.py
+"""
+ضبط و بازپخش رویدادهای شبکهٔ CDP مسیر تشخیص.
+قالب فایل: JSONL فشرده با gzip؛ هر خط یا یک رویداد CDP است
+{"t": ms از شروع, "m": نام متد, "p": params} یا بدنهٔ یک پاسخ
+{"t": ..., "m": "body", "rid": requestId, "body": ..., "b64": bool}.
+requestIdها با شمارهٔ سشن CDP پیشوند می‌خورند ("2:1234.5")، چون پس از recovery تکرار می‌شوند.
+فایل هر FLUSH_INTERVAL ثانیه sync-flush می‌شود و load_recording انتهای نیمه‌کارهٔ فایل پس از
+crash/kill را نادیده می‌گیرد.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import logging
+import time
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from src.utils import jsonfast
+
+logger = logging.getLogger(__name__)
+
+# رویدادهایی که listener تشخیص به آن‌ها گوش می‌دهد
+RECORDED_EVENTS = (
+    "Network.requestWillBeSent",
+    "Network.responseReceived",
+    "Network.loadingFinished",
+    "Network.loadingFailed",
+    "Network.webSocketFrameReceived",
+)
+
+FLUSH_INTERVAL = 1.0
+
+
+class CdpRecorder:
+    """رویدادها و بدنه‌های دیده‌شده در listener را در یک فایل .jsonl.gz می‌نویسد."""
+
+    def __init__(self, path: str | Path, max_bytes: int = 200 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._fh = gzip.open(self.path, "ab")
+        self._t0 = time.monotonic()
+        self._last_flush = self._t0
+        self.session = 0
+        self.written = 0
+        self.events = 0
+        self.bodies = 0
+
+    def _write(self, rec: Dict[str, Any]):
+        if self._fh is None:
+            return
+        line = jsonfast.dumps(rec) + b"\n"
+        self._fh.write(line)
+        self.written += len(line)
+        now = time.monotonic()
+        if now - self._last_flush >= FLUSH_INTERVAL:
+            # Z_SYNC_FLUSH: تا اینجا حتی اگر پروسه کشته شود قابل خواندن است
+            self._fh.flush()
+            self._last_flush = now
+        if self.written >= self.max_bytes:
+            logger.warning("CDP recorder reached %d bytes; stopping", self.written)
+            self.close()
+
+    def _t(self) -> float:
+        return round((time.monotonic() - self._t0) * 1000, 3)
+
+    def new_session(self):
+        """هر سشن CDP تازه (راه‌اندازی/recovery) شمارهٔ جدید می‌گیرد."""
+        self.session += 1
+
+    def _rid(self, rid: Any) -> str:
+        return f"{self.session}:{rid}"
+
+    def event(self, method: str, params: Dict[str, Any]):
+        self.events += 1
+        if "requestId" in params:
+            params = dict(params, requestId=self._rid(params["requestId"]))
+        self._write({"t": self._t(), "m": method, "p": params})
+
+    def body(self, rid: str, res: Dict[str, Any]):
+        self.bodies += 1
+        self._write({"t": self._t(), "m": "body", "rid": self._rid(rid),
+                     "body": res.get("body") or "", "b64": bool(res.get("base64Encoded"))})
+
+    def close(self):
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            finally:
+                self._fh = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": str(self.path), "open": self._fh is not None,
+                "events": self.events, "bodies": self.bodies, "bytes": self.written}
+
+
+def load_recording(path: str | Path) -> List[Dict[str, Any]]:
+    """رکوردها تا اولین خرابی؛ عضو gzip ناقص یا خط نیمه‌نوشته در انتهای فایل نادیده گرفته می‌شود."""
+    records: List[Dict[str, Any]] = []
+    with gzip.open(path, "rb") as fh:
+        try:
+            for line in fh:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(jsonfast.loads(line))
+                except ValueError:
+                    logger.warning("recording %s: skipping partial line at record %d", path, len(records))
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            logger.warning("recording %s truncated after %d records", path, len(records))
+    return records
+
+
+class ReplayCDP:
+    """
+    جایگزین CDPSession برای بازپخش: همان رابط on/send را دارد؛
+    getResponseBody از بدنه‌های ضبط‌شده جواب داده می‌شود.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.events = [r for r in records if r.get("m") != "body"]
+        self.bodies = {r["rid"]: {"body": r.get("body") or "", "base64Encoded": bool(r.get("b64"))}
+                       for r in records if r.get("m") == "body" and r.get("rid")}
+        self._handlers: Dict[str, List[Callable[[Dict[str, Any]], Any]]] = defaultdict(list)
+        self.emitted = 0
+
+    def on(self, method: str, cb: Callable[[Dict[str, Any]], Any]):
+        self._handlers[method].append(cb)
+
+    async def send(self, method: str, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        if method == "Network.getResponseBody":
+            res = self.bodies.get((params or {}).get("requestId"))
+            if res is None:
+                raise Exception("No resource with given identifier found")
+            return res
+        return {}
+
+    async def play(self, speed: float = 1.0):
+        """speed=1 زمان‌بندی اصلی، speed>1 سریع‌تر، speed<=0 با حداکثر سرعت."""
+        start = time.monotonic()
+        for ev in self.events:
+            if speed > 0:
+                delay = start + ev.get("t", 0) / 1000.0 / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            for cb in self._handlers.get(ev.get("m"), ()):
+                cb(ev.get("p") or {})
+            self.emitted += 1
+            if speed <= 0:
+                await asyncio.sleep(0)
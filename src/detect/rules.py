@@ -0,0 +1,273 @@
+# src/detect/rules.py
+"""
+موتور قواعد پیش/پس از take.
+قواعد به‌صورت اعلانی (JSON) تعریف می‌شوند و یک بار به دو شکل کامپایل می‌شوند:
+  - تابع‌های پایتون برای _handle_new_request_payload / _notify_py / رتبه‌بندی
+  - اسکریپت JS برای observer صفحه (window.__preTakeCheck)
+هر قاعده:
+  {"id": ..., "stage": "pre"|"post", "field": "title"|"doi"|"type"|...,
+   "op": "min_words"|"max_words"|"regex"|"prefix_in"|"prefix_not_in",
+   "value": ..., "flags": "i", "skip_empty": true, "reason": ..., "message": ...}
+قاعده‌ای که «بخورد» یعنی درخواست رد می‌شود؛ اولین قاعدهٔ خورده برنده است.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .doi import doi_prefix
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("pre", "post")
+OPS = ("min_words", "max_words", "regex", "prefix_in", "prefix_not_in")
+
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"id": "short_title", "stage": "pre", "field": "title", "op": "min_words", "value": 5,
+     "reason": "short_title_pre", "message": "⛔️ رد شد (قبل از رزرو): عنوان کمتر از ۵ کلمه است."},
+    {"id": "book_in_title", "stage": "pre", "field": "title", "op": "regex",
+     "value": r"\b(?:e-?book|book)\b", "flags": "i",
+     "reason": "book_in_title_pre", "message": "⛔️ رد شد (قبل از رزرو): عبارت book/ebook در عنوان است."},
+    {"id": "deny_prefix", "stage": "pre", "field": "doi", "op": "prefix_in", "value": [],
+     "reason": "prefix_denied_pre", "message": "⛔️ رد شد (قبل از رزرو): پیشوند ناشر در فهرست ممنوع است."},
+    {"id": "allow_prefix", "stage": "pre", "field": "doi", "op": "prefix_not_in", "value": [],
+     "reason": "prefix_not_allowed_pre", "message": "⛔️ رد شد (قبل از رزرو): پیشوند ناشر در فهرست مجاز نیست."},
+    {"id": "short_title_meta", "stage": "post", "field": "title", "op": "min_words", "value": 5,
+     "skip_empty": False, "reason": "short_title_post",
+     "message": "📚 درخواست لغو شد چون عنوان کمتر از ۵ کلمه است"},
+    {"id": "book_type", "stage": "post", "field": "type", "op": "regex", "value": "book", "flags": "i",
+     "reason": "book_type_post", "message": "📚 درخواست لغو شد چون DOI مربوط به کتاب است"},
+]
+
+
+@dataclass
+class Rule:
+    id: str
+    stage: str
+    field: str
+    op: str
+    value: Any
+    reason: str
+    message: str = ""
+    flags: str = ""
+    skip_empty: bool = True
+    hits: int = 0
+    js_hits: int = 0
+    evals: int = 0
+    ns: int = 0
+    # خطای ساخت قاعده در JS صفحه (مثلاً regex ناسازگار با موتور JS)؛ خالی یعنی سالم
+    js_error: str = ""
+    check: Callable[[str], bool] = field(default=lambda v: False, repr=False)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Rule":
+        r = cls(
+            id=str(d["id"]), stage=str(d.get("stage", "pre")), field=str(d.get("field", "title")),
+            op=str(d["op"]), value=d.get("value"), reason=str(d.get("reason") or d["id"]),
+            message=str(d.get("message") or ""), flags=str(d.get("flags") or ""),
+            skip_empty=bool(d.get("skip_empty", True)),
+        )
+        if r.stage not in STAGES:
+            raise ValueError(f"rule {r.id}: unknown stage {r.stage!r}")
+        if r.op not in OPS:
+            raise ValueError(f"rule {r.id}: unknown op {r.op!r}")
+        r.check = r._compile_py()
+        return r
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "stage": self.stage, "field": self.field, "op": self.op,
+                "value": self.value, "flags": self.flags, "skip_empty": self.skip_empty,
+                "reason": self.reason, "message": self.message}
+
+    # --- Python ----------------------------------------------------------
+    def _compile_py(self) -> Callable[[str], bool]:
+        skip_empty = self.skip_empty
+        if self.op in ("min_words", "max_words"):
+            n = int(self.value)
+            below = self.op == "min_words"
+
+            def check(v: str) -> bool:
+                if not v and skip_empty:
+                    return False
+                words = len(v.split())
+                return words < n if below else words > n
+            return check
+        if self.op == "regex":
+            rx = re.compile(str(self.value), re.I if "i" in self.flags else 0)
+            return lambda v: bool(v) and rx.search(v) is not None
+        prefixes = frozenset(str(x).strip().lower() for x in (self.value or []) if str(x).strip())
+        if not prefixes:
+            return lambda v: False
+        if self.op == "prefix_in":
+            return lambda v: doi_prefix(v) in prefixes
+        return lambda v: bool(v) and doi_prefix(v) not in prefixes
+
+    # --- JS --------------------------------------------------------------
+    def to_js(self) -> str:
+        """
+        بلوک JS این قاعده: تابع بررسی را به checks اضافه می‌کند. هر قاعده در try/catch خودش است؛
+        regex معتبر در پایتون ممکن است در JS نامعتبر باشد، آن‌وقت فقط همین قاعده کنار می‌رود و در bad ثبت می‌شود.
+        """
+        v = f"S(ctx[{json.dumps(self.field)}])"
+        hit = f"return {{ rule: {json.dumps(self.id)}, reason: {json.dumps(self.reason)} }};"
+        cond = "v" if self.skip_empty else "true"
+        if self.op in ("min_words", "max_words"):
+            cmp = "<" if self.op == "min_words" else ">"
+            setup, test = "", (f"const v = {v}; if ({cond}) {{ const n = v ? v.split(/\\s+/).length : 0;"
+                               f" if (n {cmp} {int(self.value)}) {hit} }}")
+        elif self.op == "regex":
+            flags = "i" if "i" in self.flags else ""
+            setup = f"const re = new RegExp({json.dumps(str(self.value))}, {json.dumps(flags)}); "
+            test = f"const v = {v}; if (v && re.test(v)) {hit}"
+        else:
+            prefixes = sorted({str(x).strip().lower() for x in (self.value or []) if str(x).strip()})
+            if not prefixes:
+                return ""
+            setup = f"const set = new Set({json.dumps(prefixes)}); "
+            neg = "!" if self.op == "prefix_not_in" else ""
+            test = f"const v = {v}; if (v && {neg}set.has(P(v))) {hit}"
+        return (f"try {{ {setup}checks.push((ctx) => {{ {test} return null; }}); }}"
+                f" catch (e) {{ bad.push([{json.dumps(self.id)}, String(e)]); }}")
+
+
+class RuleSet:
+    """مجموعهٔ قواعد با بارگذاری مجدد داغ، شمارش برخورد و زمان ارزیابی هر قاعده."""
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path else None
+        self.rules: List[Rule] = [Rule.from_dict(d) for d in DEFAULT_RULES]
+        self.version = 0
+        self.loaded_from = "defaults"
+        try:
+            self.load()
+        except Exception:
+            logger.exception("take rules file invalid; using defaults")
+
+    def load(self) -> str:
+        """قواعد را از فایل (اگر هست) یا پیش‌فرض‌ها می‌سازد؛ در خطا قواعد قبلی می‌مانند."""
+        if self.path is not None and self.path.exists():
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+            src = str(self.path)
+        else:
+            raw, src = DEFAULT_RULES, "defaults"
+        rules = [Rule.from_dict(d) for d in (raw.get("rules", []) if isinstance(raw, dict) else raw)]
+        self.rules = rules
+        self.version += 1
+        self.loaded_from = src
+        logger.info("take rules loaded | v%d from=%s n=%d", self.version, src, len(rules))
+        return src
+
+    def dump(self, path: str | Path | None = None) -> Path:
+        p = Path(path) if path else self.path
+        if p is None:
+            raise ValueError("no rules file configured")
+        p.write_text(json.dumps({"rules": [r.to_dict() for r in self.rules]}, ensure_ascii=False, indent=2),
+                     encoding="utf-8")
+        return p
+
+    def evaluate(self, stage: str, ctx: Dict[str, Any], *, count: bool = True) -> Optional[Rule]:
+        """اولین قاعدهٔ خوردهٔ این مرحله یا None. count=False برای رتبه‌بندی (بدون آمار)."""
+        for r in self.rules:
+            if r.stage != stage:
+                continue
+            raw = ctx.get(r.field)
+            v = raw.strip() if isinstance(raw, str) else ("" if raw is None else str(raw))
+            if not count:
+                if r.check(v):
+                    return r
+                continue
+            t0 = time.perf_counter_ns()
+            hit = r.check(v)
+            r.ns += time.perf_counter_ns() - t0
+            r.evals += 1
+            if hit:
+                r.hits += 1
+                return r
+        return None
+
+    def by_reason(self, reason: str) -> Optional[Rule]:
+        return next((r for r in self.rules if r.reason == reason), None)
+
+    def count_js_hit(self, rule_id: str):
+        """برخوردی که observer صفحه گزارش داده (ارزیابی در JS انجام شده)."""
+        for r in self.rules:
+            if r.id == rule_id:
+                r.js_hits += 1
+                return
+
+    def to_js(self) -> str:
+        """
+        اسکریپت init که window.__preTakeCheck(ctx) را با قواعد مرحلهٔ pre تعریف می‌کند.
+        قاعدهٔ خراب در JS کنار گذاشته و با __rules_error_py به پایتون گزارش می‌شود؛ در آن حالت
+        __preTakeCheck.complete برابر false است و observer تصمیم را به پایتون می‌سپارد.
+        """
+        blocks = [b for b in (r.to_js() for r in self.rules if r.stage == "pre") if b]
+        body = "\n  ".join(blocks)
+        return (
+            "(() => {\n"
+            "  const S = (x) => (x === undefined || x === null) ? '' : String(x).trim();\n"
+            "  const P = (d) => { const h = d.toLowerCase().replace(/^(https?:\\/\\/(dx\\.)?doi\\.org\\/|doi:)/, '')"
+            ".split('/')[0]; return h.startsWith('10.') ? h : ''; };\n"
+            "  const checks = [], bad = [];\n"
+            f"  {body}\n"
+            "  const check = function(ctx) {\n"
+            "    for (const c of checks) { const hit = c(ctx); if (hit) return hit; }\n"
+            "    return null;\n"
+            "  };\n"
+            "  check.complete = bad.length === 0;\n"
+            "  window.__preTakeCheck = check;\n"
+            f"  window.__preTakeRulesVersion = {self.version};\n"
+            "  if (bad.length) {\n"
+            "    try { console.warn('take rules dropped in page:', JSON.stringify(bad)); } catch (e) {}\n"
+            "    try { if (window.__rules_error_py) "
+            f"window.__rules_error_py({self.version}, bad).catch(() => {{}}); }} catch (e) {{}}\n"
+            "  }\n"
+            "})();\n"
+        )
+
+    def record_js_errors(self, version: int, bad: List[Any]) -> int:
+        """
+        گزارش صفحه از قواعدی که در JS ساخته نشدند ([[id, خطا], ...]).
+        گزارش نسخهٔ قدیمی (صفحه‌ای که هنوز قواعد قبلی را دارد) نادیده گرفته می‌شود؛ هر خطا یک بار لاگ می‌شود.
+        """
+        if version != self.version:
+            return 0
+        n = 0
+        for item in bad or []:
+            try:
+                rule_id, err = str(item[0]), str(item[1])
+            except (TypeError, IndexError):
+                continue
+            r = next((x for x in self.rules if x.id == rule_id), None)
+            if r is None:
+                continue
+            n += 1
+            if r.js_error != err:
+                r.js_error = err
+                logger.warning("take rule %s dropped in page (JS): %s; checked in Python only", rule_id, err)
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "from": self.loaded_from,
+            "rules": {
+                r.id: {"stage": r.stage, "hits": r.hits, "js_hits": r.js_hits, "evals": r.evals,
+                       "avg_us": round(r.ns / r.evals / 1000, 2) if r.evals else 0.0,
+                       **({"js_error": r.js_error} if r.js_error else {})}
+                for r in self.rules
+            },
+        }
+
+    def format_text(self) -> str:
+        lines = [f"قواعد v{self.version} ({self.loaded_from})"]
+        for r in self.rules:
+            avg = r.ns / r.evals / 1000 if r.evals else 0.0
+            lines.append(f"[{r.stage}] {r.id:<18} {r.op:<13} hits={r.hits} js={r.js_hits} "
+                         f"evals={r.evals} avg={avg:.2f}µs" + (" [JS dropped]" if r.js_error else ""))
+        return "\n".join(lines)
@@ -0,0 +1,107 @@
+# src/detect/seen.py
+from __future__ import annotations
+
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+class SeenSet:
+    """
+    مجموعهٔ «دیده‌شده» محدود برای ضدتکرار تشخیص: LRU با سقف max_size و انقضای ttl ثانیه.
+    زمان‌ها wall-clock اند تا snapshot روی دیسک پس از ری‌استارت پروسه هم معنی داشته باشد.
+    بررسی عضویت (in) در آمار hit/miss شمرده می‌شود؛ add کلید را تازه و به انتهای LRU می‌برد.
+    """
+
+    def __init__(self, max_size: int = 50_000, ttl: float = 6 * 3600):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        # کلید → زمان آخرین دیده‌شدن
+        self._d: "OrderedDict[str, float]" = OrderedDict()
+        self._key_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def _drop(self, key: str):
+        del self._d[key]
+        self._key_bytes -= sys.getsizeof(key)
+
+    def __contains__(self, key: object) -> bool:
+        ts = self._d.get(key)  # type: ignore[arg-type]
+        if ts is not None and (self.ttl <= 0 or time.time() - ts < self.ttl):
+            self.hits += 1
+            return True
+        if ts is not None:
+            self._drop(key)  # type: ignore[arg-type]
+            self.expired += 1
+        self.misses += 1
+        return False
+
+    def add(self, key: str, ts: float | None = None):
+        if key in self._d:
+            self._d.move_to_end(key)
+        else:
+            self._key_bytes += sys.getsizeof(key)
+        self._d[key] = time.time() if ts is None else ts
+        while len(self._d) > self.max_size:
+            old, _ = self._d.popitem(last=False)
+            self._key_bytes -= sys.getsizeof(old)
+            self.evicted += 1
+
+    def prune(self) -> int:
+        """حذف کلیدهای منقضی از ابتدای LRU (قدیمی‌ترها)."""
+        if self.ttl <= 0:
+            return 0
+        cutoff = time.time() - self.ttl
+        n = 0
+        while self._d:
+            key, ts = next(iter(self._d.items()))
+            if ts >= cutoff:
+                break
+            self._drop(key)
+            n += 1
+        self.expired += n
+        return n
+
+    def clear(self):
+        self._d.clear()
+        self._key_bytes = 0
+
+    def items(self) -> List[Tuple[str, float]]:
+        # list(...) روی OrderedDict در C انجام می‌شود؛ از thread دیگر هم کپی سازگار می‌دهد
+        return list(self._d.items())
+
+    def restore(self, items: Iterable[Any]) -> int:
+        """بازگردانی از snapshot ([کلید، زمان] به ترتیب LRU)؛ منقضی‌ها نادیده گرفته می‌شوند."""
+        cutoff = time.time() - self.ttl if self.ttl > 0 else None
+        n = 0
+        for item in items:
+            try:
+                key, ts = str(item[0]), float(item[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+            if key and (cutoff is None or ts >= cutoff):
+                self.add(key, ts)
+                n += 1
+        return n
+
+    def __len__(self) -> int:
+        return len(self._d)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._d),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            # تقریبی: رشتهٔ کلیدها + جدول دیکشنری + هر ورودی یک float (24B) و یک گرهٔ ترتیب (~48B)
+            "mem_kb": round((self._key_bytes + sys.getsizeof(self._d) + len(self._d) * 72) / 1024, 1),
+        }
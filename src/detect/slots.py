@@ -0,0 +1,64 @@
+# src/detect/slots.py
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from .doi import normalize_doi
+
+
+class TakeSlots:
+    """
+    شمارندهٔ ظرفیت take به‌جای پرچم سراسری window.busy.
+    هر DOI رزروشده تا پایان دانلود/آپلود (یا لغو) یک اسلات را نگه می‌دارد؛
+    take جدید فقط وقتی رد می‌شود که همهٔ اسلات‌ها پر باشند.
+    acquire/release همگام‌اند، پس روی event loop اتمیک هستند.
+    """
+
+    def __init__(self, capacity: int = 1):
+        self.capacity = max(1, int(capacity))
+        # کلید: DOI نرمال‌شده → (DOI اصلی، زمان گرفتن)
+        self._held: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self.acquired = 0
+        self.released = 0
+        self.refused_full = 0
+
+    @property
+    def free(self) -> int:
+        return max(0, self.capacity - len(self._held))
+
+    def resize(self, capacity: int):
+        """ظرفیت تازه؛ اسلات‌های گرفته‌شده آزاد نمی‌شوند، فقط take جدید محدود می‌شود."""
+        self.capacity = max(1, int(capacity))
+
+    def try_acquire(self, doi: str) -> bool:
+        key = normalize_doi(doi)
+        if not key or key in self._held:
+            return False
+        if len(self._held) >= self.capacity:
+            self.refused_full += 1
+            return False
+        self._held[key] = (doi.strip(), time.monotonic())
+        self.acquired += 1
+        return True
+
+    def release(self, doi: str) -> bool:
+        if self._held.pop(normalize_doi(doi), None) is None:
+            return False
+        self.released += 1
+        return True
+
+    def held(self) -> List[str]:
+        return [doi for doi, _ in self._held.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "capacity": self.capacity,
+            "free": self.free,
+            "held": {doi: round(now - ts, 1) for doi, ts in self._held.values()},
+            "acquired": self.acquired,
+            "released": self.released,
+            "refused_full": self.refused_full,
+        }
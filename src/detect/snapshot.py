@@ -0,0 +1,95 @@
+# src/detect/snapshot.py
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.utils import jsonfast
+
+
+class SnapshotDiffer:
+    """
+    دیف افزایشی لیست /requests:
+    از آخرین snapshot هر URL فقط یک ایندکس فشردهٔ _id → hash نگه می‌داریم
+    و فقط داکیومنت‌های جدید یا تغییرکرده به handler می‌روند؛
+    پس کار هر poll با تعداد درخواست‌های تازه رشد می‌کند، نه با طول لیست.
+    """
+
+    def __init__(self, max_urls: int = 16):
+        self.max_urls = max_urls
+        self._index: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self.snapshots = 0
+        self.docs_seen = 0
+        self.docs_changed = 0
+        self.last_parse_ms = 0.0
+        self.last_diff_ms = 0.0
+        self._parse_ms_total = 0.0
+        self._diff_ms_total = 0.0
+
+    def process(self, url: str, body: str | bytes) -> Optional[List[Dict[str, Any]]]:
+        """
+        بدنهٔ یک پاسخ /requests را parse و با snapshot قبلی همان URL مقایسه می‌کند.
+        اگر بدنه JSON معتبر با docs[] نباشد None برمی‌گرداند.
+        """
+        t0 = time.perf_counter()
+        try:
+            data = jsonfast.loads(body or b"{}")
+        except Exception:
+            return None
+        if not isinstance(data, dict):
+            return None
+        docs = data.get("docs") or []
+        if not isinstance(docs, list):
+            return None
+        t1 = time.perf_counter()
+        changed = self._diff(url or "", docs)
+        t2 = time.perf_counter()
+
+        self.snapshots += 1
+        self.docs_seen += len(docs)
+        self.docs_changed += len(changed)
+        self.last_parse_ms = (t1 - t0) * 1000
+        self.last_diff_ms = (t2 - t1) * 1000
+        self._parse_ms_total += self.last_parse_ms
+        self._diff_ms_total += self.last_diff_ms
+        return changed
+
+    def _diff(self, key: str, docs: list) -> List[Dict[str, Any]]:
+        prev = self._index.get(key) or {}
+        cur: Dict[str, int] = {}
+        changed: List[Dict[str, Any]] = []
+        for doc in docs:
+            if not isinstance(doc, dict):
+                continue
+            k = doc.get("_id") or doc.get("doi")
+            if not k:
+                changed.append(doc)
+                continue
+            k = str(k)
+            h = hash(jsonfast.dumps(doc))
+            cur[k] = h
+            if prev.get(k) != h:
+                changed.append(doc)
+        self._index[key] = cur
+        self._index.move_to_end(key)
+        while len(self._index) > self.max_urls:
+            self._index.popitem(last=False)
+        return changed
+
+    def reset(self):
+        self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        n = self.snapshots or 1
+        return {
+            "snapshots": self.snapshots,
+            "docs_seen": self.docs_seen,
+            "docs_changed": self.docs_changed,
+            "indexed": sum(len(v) for v in self._index.values()),
+            "last_parse_ms": round(self.last_parse_ms, 3),
+            "last_diff_ms": round(self.last_diff_ms, 3),
+            "avg_parse_ms": round(self._parse_ms_total / n, 3),
+            "avg_diff_ms": round(self._diff_ms_total / n, 3),
+            "codec": "orjson" if jsonfast.HAVE_ORJSON else "json",
+        }
@@ -0,0 +1,199 @@
+# src/detect/taker.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import quote, unquote, urljoin, urlsplit
+
+import aiohttp
+
+from src.utils.cookies import cookie_header
+from .doi import normalize_doi
+from .poller import CookieSource
+
+logger = logging.getLogger(__name__)
+
+# نتیجهٔ یک تلاش مستقیم؛ NOT_SENT یعنی اتصال اصلاً برقرار نشد (تکرار از صفحه بی‌خطر است)،
+# ERROR یعنی درخواست شاید به سرور رسیده باشد (timeout/5xx) و نباید دوباره take زد
+WON, LOST, AUTH, ERROR, NOT_SENT = "won", "lost", "auth", "error", "not_sent"
+
+# فرم لاگین صفحه (همان سلکتورهای _login)؛ 200 با این فرم یعنی سشن پریده، نه برد
+_LOGIN_MARKERS = ('name="user"', 'name="pass"', "name='user'", "name='pass'")
+# حداکثر بدنه‌ای که برای نشانهٔ برد خوانده می‌شود
+TAKE_BODY_LIMIT = 64 * 1024
+
+
+def _mentions_doi(body: str, doi: str) -> bool:
+    low = body.lower()
+    key = normalize_doi(doi)
+    return bool(key) and (key in low or quote(key, safe="").lower() in low or quote(key).lower() in low)
+
+
+def classify_take(status: int, location: str = "", body: str = "", doi: str = "") -> str:
+    """
+    پاسخ /take/<doi> → won/lost/auth/error؛ مسیر مستقیم و هر دو مسیر صفحه همین را صدا می‌زنند.
+    همان تفسیر کد صفحه: 2xx یا ریدایرکت به /work/ و /requests/ یعنی برد؛ لاگین (401/403،
+    فرم لاگین در بدنه یا ریدایرکت به / و login) یعنی سشن پریده. پاسخ 2xx یا ریدایرکتی که شکلش
+    را نمی‌شناسیم (بدون DOI در بدنه، مسیر دیگر) فقط هشدار می‌گیرد و برد می‌ماند؛ برد واقعی که
+    باخت حساب شود اسلات را آزاد می‌کند و درخواستِ گرفته‌شده هرگز رسیدگی نمی‌شود.
+    """
+    if status in (401, 403):
+        return AUTH
+    if 300 <= status < 400:
+        path = unquote(urlsplit(location or "").path or "/")
+        if path == "/" or "login" in path:
+            return AUTH
+        if path.startswith("/work/"):
+            if doi and normalize_doi(path[len("/work/"):]) != normalize_doi(doi):
+                logger.warning("take: redirect to another work page %s for %s; counting as won", path, doi)
+            return WON
+        if not path.startswith("/requests"):
+            logger.warning("take: unrecognised redirect %s for %s; counting as won", path, doi)
+        return WON
+    if 200 <= status < 300:
+        if any(m in body for m in _LOGIN_MARKERS):
+            return AUTH
+        if doi and body and not _mentions_doi(body, doi):
+            logger.warning("take: 2xx without work-page marker for %s; counting as won", doi)
+        return WON
+    return ERROR
+
+
+class DirectTaker:
+    """
+    اجرای /take/<doi> بیرون از صفحه، روی یک استخر اتصال keep-alive و گرم aiohttp.
+    کوکی‌ها مثل DirectPoller از کانتکست Playwright همگام می‌شوند؛ اگر سشن پریده باشد
+    (auth) یا خطای شبکه رخ دهد، فراخواننده به مسیر page.evaluate برمی‌گردد.
+    """
+
+    def __init__(self, base_url: str, cookie_source: CookieSource, *,
+                 timeout: float = 5.0, user_agent: str = "",
+                 cookie_refresh: float = 300.0, warm_interval: float = 15.0):
+        self.base_url = base_url
+        self.cookie_source = cookie_source
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.cookie_refresh = cookie_refresh
+        self.warm_interval = warm_interval
+
+        self._task: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._cookie = ""
+        self._cookie_ts = 0.0
+
+        self.results: Dict[str, int] = {WON: 0, LOST: 0, AUTH: 0, ERROR: 0, NOT_SENT: 0}
+        self.warms = 0
+        self.last_status: Optional[int] = None
+        self._rtt: Deque[float] = deque(maxlen=200)
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._warm_loop())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def invalidate_cookies(self):
+        self._cookie_ts = 0.0
+
+    async def _refresh_cookies(self):
+        try:
+            cookies = await self.cookie_source()
+        except Exception:
+            logger.debug("taker cookie refresh failed", exc_info=True)
+            return
+        self._cookie = cookie_header(cookies, self.base_url)
+        self._cookie_ts = time.monotonic()
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=60, ttl_dns_cache=300)
+            headers = {"Accept": "text/html,application/json;q=0.9,*/*;q=0.8"}
+            if self.user_agent:
+                headers["User-Agent"] = self.user_agent
+            self._session = aiohttp.ClientSession(
+                connector=connector, headers=headers,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def warm(self):
+        """یک HEAD سبک تا اتصال TCP/TLS در استخر باز بماند و کوکی‌ها تازه شوند."""
+        if not self._cookie or time.monotonic() - self._cookie_ts > self.cookie_refresh:
+            await self._refresh_cookies()
+        sess = self._ensure_session()
+        async with sess.head(self.base_url, headers={"Cookie": self._cookie}, allow_redirects=False) as r:
+            await r.release()
+        self.warms += 1
+
+    async def _warm_loop(self):
+        while True:
+            try:
+                await self.warm()
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                logger.debug("taker warm failed: %s", e)
+            try:
+                await asyncio.sleep(self.warm_interval)
+            except asyncio.CancelledError:
+                return
+
+    async def take(self, doi: str) -> str:
+        """یک تلاش /take/<doi>؛ خروجی یکی از won/lost/auth/error است."""
+        if not self._cookie or time.monotonic() - self._cookie_ts > self.cookie_refresh:
+            await self._refresh_cookies()
+        if not self._cookie:
+            self.results[AUTH] += 1
+            return AUTH
+        sess = self._ensure_session()
+        url = urljoin(self.base_url, "/take/" + quote(doi, safe=""))
+        t0 = time.perf_counter()
+        try:
+            async with sess.get(url, headers={"Cookie": self._cookie}, allow_redirects=False) as r:
+                self.last_status = r.status
+                body = ""
+                if 200 <= r.status < 300:
+                    raw = await r.content.read(TAKE_BODY_LIMIT)
+                    body = raw.decode(r.charset or "utf-8", "replace")
+                res = classify_take(r.status, r.headers.get("Location", ""), body, doi)
+                await r.release()
+        except asyncio.CancelledError:
+            raise
+        except aiohttp.ClientConnectorError as e:
+            # اتصال برقرار نشد؛ /take به سرور نرسیده
+            logger.debug("direct take not sent for %s: %s", doi, e)
+            res = NOT_SENT
+        except Exception as e:
+            logger.debug("direct take failed for %s: %s", doi, e)
+            res = ERROR
+        self._rtt.append((time.perf_counter() - t0) * 1000)
+        if res == AUTH:
+            self.invalidate_cookies()
+        self.results[res] += 1
+        return res
+
+    def stats(self) -> Dict[str, Any]:
+        s = sorted(self._rtt)
+        return {
+            "warm": bool(self._task and not self._task.done()),
+            "warms": self.warms,
+            "results": dict(self.results),
+            "last_status": self.last_status,
+            "rtt_ms_p50": round(s[len(s) // 2], 1) if s else None,
+            "rtt_ms_max": round(s[-1], 1) if s else None,
+        }
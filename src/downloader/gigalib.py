@@ -33,28 +33,11 @@ async def gigalib_login(page: Page):
 
 async def gigalib_download(page: Page, doi: str, download_dir: str = "./downloads") -> str:
     import time
-    from pathlib import Path
-
-    print(f"[GigaLib] Searching DOI: {doi}")
-    Path(download_dir).mkdir(exist_ok=True)
 
     try:
-        await page.goto("http://gigalib.org", timeout=30000)
-        await page.locator("#ContentPlaceHolder1_txt_SearchKey").click()
-        await page.locator("#ContentPlaceHolder1_txt_SearchKey").fill(doi)
-        await page.get_by_role("button", name="درخواست مقاله").click()
-        await asyncio.sleep(3)
-        await page.get_by_role("button", name=doi).click()
-        async with page.expect_download(timeout=60000) as dl_info:
-            await page.get_by_role("button", name=doi).click()
-        download = await dl_info.value
-        safe_name = doi.replace('/', '_').replace(':', '_')
-        file_path = os.path.join(download_dir, f"{safe_name}.pdf")
-        await download.save_as(file_path)
+        await gigalib_lookup(page, doi)
+        return await gigalib_fetch(page, doi, download_dir)
 
-        print(f"[+] GigaLib article downloaded: {file_path}")
-        return file_path
-    
     except Exception as e:
         print(f"⚠️ GigaLib download failed for DOI {doi}: {e}")
         screenshot_path = f"gigalib_error_{int(time.time())}.png"
@@ -62,3 +45,31 @@ async def gigalib_download(page: Page, doi: str, download_dir: str = "./download
         print(f"📸 Error screenshot saved: {screenshot_path}")
         raise
 
+
+async def gigalib_lookup(page: Page, doi: str) -> None:
+    """جستجوی DOI تا ظاهر شدن دکمهٔ نتیجه (بدون دانلود)؛ صفحه آمادهٔ gigalib_fetch می‌ماند."""
+    print(f"[GigaLib] Searching DOI: {doi}")
+    await page.goto("http://gigalib.org", timeout=30000)
+    await page.locator("#ContentPlaceHolder1_txt_SearchKey").click()
+    await page.locator("#ContentPlaceHolder1_txt_SearchKey").fill(doi)
+    await page.get_by_role("button", name="درخواست مقاله").click()
+    await asyncio.sleep(3)
+    await page.get_by_role("button", name=doi).wait_for(state="visible", timeout=30000)
+
+
+async def gigalib_fetch(page: Page, doi: str, download_dir: str = "./downloads", timeout_ms: int = 30000) -> str:
+    """دریافت PDF از صفحهٔ نتیجهٔ gigalib_lookup."""
+    from pathlib import Path
+
+    Path(download_dir).mkdir(exist_ok=True)
+    btn = page.get_by_role("button", name=doi)
+    await btn.click(timeout=timeout_ms)
+    async with page.expect_download(timeout=60000) as dl_info:
+        await btn.click()
+    download = await dl_info.value
+    safe_name = doi.replace('/', '_').replace(':', '_')
+    file_path = os.path.join(download_dir, f"{safe_name}.pdf")
+    await download.save_as(file_path)
+
+    print(f"[+] GigaLib article downloaded: {file_path}")
+    return file_path
@@ -242,6 +242,9 @@ async def iranpaper_login(page: Page, username: Optional[str] = None, password:
     await ipc.login(page)
 
 
+_DOWNLOAD_BTN = 'button:has-text("دانلود فایل"), a:has-text("دانلود فایل")'
+
+
 async def iranpaper_download(page: Page, doi: str, download_dir: str = str(DOWNLOAD_DIR)) -> str:
     """
     سرچ DOI در ایران‌پیپر با سلکتورهای مقاوم:
@@ -250,10 +253,15 @@ async def iranpaper_download(page: Page, doi: str, download_dir: str = str(DOWNL
       - اگر دکمه‌ی جستجو پیدا نشد، Enter می‌زنیم
       - سپس روی «دانلود فایل» دانلود مستقیم یا پاپ‌آپ را هندل می‌کنیم
     """
-    import os as _os
-    from pathlib import Path as _Path
-    from urllib.parse import urljoin
+    await iranpaper_lookup(page, doi)
+    return await iranpaper_fetch(page, doi, download_dir=download_dir)
+
 
+async def iranpaper_lookup(page: Page, doi: str) -> None:
+    """
+    مرحلهٔ جستجو (بدون دانلود): DOI را جستجو می‌کند تا دکمهٔ «دانلود فایل» ظاهر شود.
+    صفحه پس از آن آمادهٔ iranpaper_fetch است؛ lookup گمانه‌زنانه همین را پیش از برد take می‌زند.
+    """
     doi = doi.strip()
     print(f"[+] Searching DOI on IranPaper: {doi}")
 
@@ -324,8 +332,19 @@ async def iranpaper_download(page: Page, doi: str, download_dir: str = str(DOWNL
 
     # 4) انتظار برای دکمه «دانلود فایل»
     await page.wait_for_load_state("domcontentloaded")
-    await page.wait_for_selector('button:has-text("دانلود فایل"), a:has-text("دانلود فایل")', timeout=60000)
-    btn = page.locator('button:has-text("دانلود فایل"), a:has-text("دانلود فایل")').first
+    await page.wait_for_selector(_DOWNLOAD_BTN, timeout=60000)
+
+
+async def iranpaper_fetch(page: Page, doi: str, download_dir: str = str(DOWNLOAD_DIR),
+                          timeout_ms: int = 60000) -> str:
+    """مرحلهٔ دریافت: روی صفحهٔ نتیجهٔ iranpaper_lookup «دانلود فایل» را می‌زند و PDF را ذخیره می‌کند."""
+    import os as _os
+    from pathlib import Path as _Path
+    from urllib.parse import urljoin
+
+    doi = doi.strip()
+    await page.wait_for_selector(_DOWNLOAD_BTN, timeout=timeout_ms)
+    btn = page.locator(_DOWNLOAD_BTN).first
 
     # 5) کلیک و RACE بین دانلود و پاپ‌آپ — فقط یک کلیک (DOM)، نه دو تا!
     ctx = page.context
@@ -0,0 +1,154 @@
+# src/downloader/speculative.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from src.detect.doi import normalize_doi
+
+logger = logging.getLogger(__name__)
+
+LookupFn = Callable[[Any, str], Awaitable[None]]
+
+
+@dataclass
+class _Spec:
+    doi: str
+    source: str
+    page: Any
+    task: Optional[asyncio.Task] = None
+    started: float = 0.0          # شروع خود lookup (پس از گرفتن قفل صفحه)
+    lookup_s: Optional[float] = None
+    used: bool = False
+
+
+class SpeculativeLookups:
+    """
+    lookup گمانه‌زنانهٔ منبع دانلود (جستجو تا آماده‌شدن لینک PDF، بدون دریافت فایل)
+    که همزمان با /take شروع می‌شود. اگر take باخت، cancel() آن را لغو می‌کند؛ اگر برد،
+    start_download_process به‌جای جستجوی دوباره فقط مرحلهٔ fetch را روی همان صفحه می‌زند.
+    lookup قفل همان صفحهٔ منبع (page_lock) را نگه می‌دارد و اگر صفحه مشغول دانلود دیگری باشد
+    اصلاً شروع نمی‌شود تا دانلود جاری را کند نکند.
+    """
+
+    def __init__(self, budget: float, lock_for: Callable[[Any], asyncio.Lock]):
+        self.budget = budget
+        self._lock_for = lock_for
+        # DOI نرمال‌شده → lookup در جریان/آماده
+        self._jobs: Dict[str, _Spec] = {}
+        # id(page) → DOI که صفحهٔ نتیجه‌اش الان روی آن صفحه باز است
+        self._ready: Dict[int, str] = {}
+        self.started = 0
+        self.skipped_busy = 0
+        self.ready = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.wasted = 0
+        self.used = 0
+        self.stale = 0
+        self.saved_total = 0.0
+
+    def start(self, doi: str, candidates: Iterable[Tuple[str, Any, LookupFn]]) -> bool:
+        """اولین منبع (به ترتیب Policy) که صفحه‌اش آزاد است را برای DOI جستجو می‌کند."""
+        key = normalize_doi(doi)
+        if not key or key in self._jobs:
+            return False
+        for source, page, lookup in candidates:
+            if page is None or page.is_closed():
+                continue
+            lock = self._lock_for(page)
+            if lock.locked():
+                self.skipped_busy += 1
+                continue
+            spec = _Spec(doi=doi.strip(), source=source, page=page)
+            spec.task = asyncio.create_task(self._run(spec, lookup, lock))
+            self._jobs[key] = spec
+            self.started += 1
+            return True
+        return False
+
+    async def _run(self, spec: _Spec, lookup: LookupFn, lock: asyncio.Lock):
+        try:
+            async with lock:
+                spec.started = time.monotonic()
+                try:
+                    await asyncio.wait_for(lookup(spec.page, spec.doi), self.budget)
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    logger.info("speculative lookup over budget | doi=%s src=%s", spec.doi, spec.source)
+                    return
+                except Exception:
+                    self.failed += 1
+                    logger.warning("speculative lookup failed | doi=%s src=%s", spec.doi, spec.source,
+                                   exc_info=True)
+                    return
+                spec.lookup_s = time.monotonic() - spec.started
+                self._ready[id(spec.page)] = normalize_doi(spec.doi)
+                self.ready += 1
+                logger.info("speculative lookup ready | doi=%s src=%s %.1fs", spec.doi, spec.source, spec.lookup_s)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    def cancel(self, doi: str):
+        """take باخت/رد شد یا کار DOI تمام شد: lookup در جریان لغو و نتیجه‌اش دور ریخته می‌شود."""
+        spec = self._jobs.pop(normalize_doi(doi), None)
+        if spec is None:
+            return
+        if spec.task is not None and not spec.task.done():
+            spec.task.cancel()
+        elif spec.lookup_s is not None and not spec.used:
+            self.wasted += 1
+
+    async def wait(self, doi: str, source: str):
+        """
+        اگر lookup این DOI روی همین منبع هنوز در جریان است، تا پایانش صبر کن (بیرون از قفل صفحه صدا
+        زده شود). lookup منبع دیگر به کار این منبع نمی‌آید و انتظار برایش فقط تأخیر است.
+        """
+        spec = self._jobs.get(normalize_doi(doi))
+        if spec is not None and spec.source == source and spec.task is not None and not spec.task.done():
+            await asyncio.wait({spec.task})
+
+    def consume(self, doi: str, source: str, page: Any, t_needed: float) -> Optional[float]:
+        """
+        داخل قفل صفحه و درست پیش از استفاده از آن صدا زده می‌شود.
+        اگر صفحهٔ نتیجهٔ همین DOI روی page آماده است، زمان صرفه‌جویی‌شده (ثانیه) را برمی‌گرداند:
+        lookup بدون گمانه‌زنی از t_needed شروع می‌شد، پس صرفه = min(مدت lookup، t_needed − شروع lookup).
+        در هر حال آمادگی صفحه مصرف می‌شود، چون کاربر بعدی آن را جابه‌جا می‌کند.
+        """
+        key = normalize_doi(doi)
+        ready_for = self._ready.pop(id(page), None)
+        spec = self._jobs.get(key)
+        if ready_for != key or spec is None or spec.source != source or spec.lookup_s is None:
+            return None
+        spec.used = True
+        return max(0.0, min(spec.lookup_s, t_needed - spec.started))
+
+    def record(self, saved: Optional[float]):
+        """نتیجهٔ fetch پس از consume: None یعنی صفحه کهنه بود و مسیر کامل اجرا شد."""
+        if saved is None:
+            self.stale += 1
+            return
+        self.used += 1
+        self.saved_total += saved
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_s": self.budget,
+            "in_flight": sum(1 for s in self._jobs.values() if s.task is not None and not s.task.done()),
+            "started": self.started,
+            "skipped_busy": self.skipped_busy,
+            "ready": self.ready,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+            "wasted": self.wasted,
+            "used": self.used,
+            "stale": self.stale,
+            "saved_total_s": round(self.saved_total, 1),
+            "saved_avg_s": round(self.saved_total / self.used, 2) if self.used else 0.0,
+        }
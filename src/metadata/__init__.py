@@ -0,0 +1,4 @@
+from .session import MetadataSession
+from .cache import MetadataCache, is_negative
+from .hedge import HedgedResolver
+from .prefetch import MetadataPrefetcher
@@ -0,0 +1,171 @@
+# src/metadata/cache.py
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from src.detect.doi import normalize_doi
+from src.utils import jsonfast
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    doi        TEXT PRIMARY KEY,
+    data       BLOB NOT NULL,
+    negative   INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+)
+"""
+
+
+def is_negative(meta: Dict[str, Any]) -> bool:
+    """هیچ‌کدام از Crossref/OpenAlex عنوانی نداد (DOI ناشناخته یا هر دو API در دسترس نبودند)."""
+    return (meta.get("title") or "—") == "—" and not meta.get("journal") and not meta.get("type")
+
+
+class MetadataCache:
+    """
+    کش ماندگار متادیتای نرمال‌شده (خروجی metadata()) با کلید DOI نرمال‌شده.
+    جلوی SQLite یک LRU در حافظه است؛ انقضا هنگام خواندن و با TTL جداگانهٔ نتیجهٔ مثبت و منفی
+    حساب می‌شود، پس تغییر TTL روی ردیف‌های قبلی هم اثر دارد. نتیجهٔ منفی TTL کوتاه دارد چون
+    ممکن است فقط قطعی موقت API بوده باشد.
+    """
+
+    def __init__(self, path: str | Path, *, pos_ttl: float = 30 * 86400, neg_ttl: float = 3600,
+                 lru_size: int = 512):
+        self.path = Path(path)
+        self.pos_ttl = pos_ttl
+        self.neg_ttl = neg_ttl
+        self.lru_size = max(1, lru_size)
+        # کلید → (متادیتا، زمان دریافت، منفی؟)
+        self._lru: "OrderedDict[str, Tuple[Dict[str, Any], float, bool]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self.lru_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.writes = 0
+        self.errors = 0
+        try:
+            self._db = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(_SCHEMA)
+        except sqlite3.Error:
+            logger.warning("metadata cache unavailable (memory only): %s", self.path, exc_info=True)
+            self._db = None
+
+    def _fresh(self, fetched_at: float, negative: bool, now: float) -> bool:
+        return now - fetched_at < (self.neg_ttl if negative else self.pos_ttl)
+
+    def _remember(self, key: str, entry: Tuple[Dict[str, Any], float, bool]):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def has(self, doi: str) -> bool:
+        """آیا ردیف تازه‌ای برای DOI هست؟ (بدون اثر روی آمار hit/miss؛ برای prefetch)"""
+        key = normalize_doi(doi)
+        if not key:
+            return False
+        now = time.time()
+        entry = self._lru.get(key)
+        if entry is not None:
+            return self._fresh(entry[1], entry[2], now)
+        if self._db is None:
+            return False
+        try:
+            row = self._db.execute("SELECT negative, fetched_at FROM meta WHERE doi = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            return False
+        return row is not None and self._fresh(float(row[1]), bool(row[0]), now)
+
+    def get(self, doi: str) -> Optional[Dict[str, Any]]:
+        """کپی متادیتای تازه یا None (نبود/منقضی)."""
+        key = normalize_doi(doi)
+        if not key:
+            return None
+        now = time.time()
+        entry = self._lru.get(key)
+        if entry is not None:
+            meta, fetched_at, negative = entry
+            if self._fresh(fetched_at, negative, now):
+                self._lru.move_to_end(key)
+                self.lru_hits += 1
+                return dict(meta)
+            del self._lru[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        row = None
+        if self._db is not None:
+            try:
+                row = self._db.execute("SELECT data, negative, fetched_at FROM meta WHERE doi = ?",
+                                       (key,)).fetchone()
+            except sqlite3.Error:
+                self.errors += 1
+                logger.debug("metadata cache read failed", exc_info=True)
+        if row is None:
+            self.misses += 1
+            return None
+        meta, negative, fetched_at = jsonfast.loads(row[0]), bool(row[1]), float(row[2])
+        if not self._fresh(fetched_at, negative, now):
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._remember(key, (meta, fetched_at, negative))
+        self.disk_hits += 1
+        return dict(meta)
+
+    def put(self, doi: str, meta: Dict[str, Any]):
+        key = normalize_doi(doi)
+        if not key:
+            return
+        now = time.time()
+        negative = is_negative(meta)
+        self._remember(key, (dict(meta), now, negative))
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (doi, data, negative, fetched_at) VALUES (?, ?, ?, ?)",
+                (key, jsonfast.dumps(meta), int(negative), now))
+            self.writes += 1
+        except sqlite3.Error:
+            self.errors += 1
+            logger.debug("metadata cache write failed", exc_info=True)
+
+    def close(self):
+        if self._db is not None:
+            try:
+                self._db.close()
+            except sqlite3.Error:
+                pass
+            self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        rows = None
+        if self._db is not None:
+            try:
+                rows = self._db.execute("SELECT COUNT(*) FROM meta").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        lookups = self.lru_hits + self.disk_hits + self.misses
+        return {
+            "lru_hits": self.lru_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round((self.lru_hits + self.disk_hits) / lookups, 3) if lookups else None,
+            "writes": self.writes,
+            "errors": self.errors,
+            "lru": len(self._lru),
+            "rows": rows,
+        }
@@ -0,0 +1,158 @@
+# src/metadata/hedge.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("title", "journal", "year", "abstract", "type")
+
+Fetcher = Callable[[str], Awaitable[Dict[str, Any]]]
+FillFn = Callable[[str, Dict[str, Any]], None]
+
+
+def merge(results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """ادغام به ترتیب اولویت منابع: برای هر فیلد اولین مقدار غیرخالی."""
+    out: Dict[str, Any] = {f: None for f in FIELDS}
+    for r in results:
+        for f in FIELDS:
+            if not out[f] and r.get(f):
+                out[f] = r[f]
+    return out
+
+
+def _pct(xs, q: float) -> Optional[float]:
+    s = sorted(xs)
+    return round(s[min(len(s) - 1, int(len(s) * q))], 1) if s else None
+
+
+class _SourceStats:
+    __slots__ = ("calls", "ok", "errors", "wins", "late_fills", "ms")
+
+    def __init__(self):
+        self.calls = 0
+        self.ok = 0
+        self.errors = 0
+        self.wins = 0
+        self.late_fills = 0
+        self.ms: Deque[float] = deque(maxlen=200)
+
+
+class HedgedResolver:
+    """
+    همهٔ منابع متادیتا (به ترتیب اولویت) همزمان شروع می‌شوند و resolve به‌محض اینکه نتیجهٔ
+    ادغام‌شده فیلدهای لازم (required؛ همان‌هایی که قواعد post نیاز دارند) را داشت برمی‌گردد،
+    یا با رسیدن deadline هر چه تا آن لحظه هست. منابع باقی‌مانده در پس‌زمینه ادامه می‌دهند و
+    فقط برای پرکردن جاهای خالی (مثل abstract) نتیجهٔ کامل را به on_fill می‌دهند.
+    """
+
+    def __init__(self, fetchers: Dict[str, Fetcher], *, deadline: float = 5.0,
+                 required: Iterable[str] = ("title", "type"), on_fill: Optional[FillFn] = None):
+        self.fetchers = dict(fetchers)
+        self.deadline = deadline
+        self.required = tuple(required)
+        self.on_fill = on_fill
+        self._sources = {name: _SourceStats() for name in self.fetchers}
+        self._background: Set[asyncio.Task] = set()
+        self.resolved = 0
+        self.sufficient = 0
+        self.deadline_hits = 0
+        self._ms: Deque[float] = deque(maxlen=200)
+
+    def _complete(self, merged: Dict[str, Any]) -> bool:
+        return all(merged.get(f) for f in self.required)
+
+    async def _timed(self, name: str, doi: str) -> Dict[str, Any]:
+        st = self._sources[name]
+        st.calls += 1
+        t0 = time.perf_counter()
+        try:
+            res = await self.fetchers[name](doi) or {}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            st.errors += 1
+            logger.debug("metadata source %s failed for %s: %s", name, doi, e)
+            res = {}
+        st.ms.append((time.perf_counter() - t0) * 1000)
+        if any(res.get(f) for f in FIELDS):
+            st.ok += 1
+        return res
+
+    async def resolve(self, doi: str) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        names = list(self.fetchers)
+        tasks = {asyncio.create_task(self._timed(n, doi)): n for n in names}
+        results: Dict[str, Dict[str, Any]] = {}
+        merged = merge([])
+        pending = set(tasks)
+        loop = asyncio.get_running_loop()
+        end = loop.time() + self.deadline
+        try:
+            while pending:
+                remaining = end - loop.time()
+                if remaining <= 0:
+                    self.deadline_hits += 1
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    results[tasks[t]] = t.result()
+                merged = merge(results[n] for n in names if n in results)
+                if self._complete(merged):
+                    self.sufficient += 1
+                    # منبعی که نتیجه را کامل کرد برنده است (در صورت هم‌زمانی، پراولویت‌تر)
+                    winner = next(tasks[t] for t in sorted(done, key=lambda t: names.index(tasks[t])))
+                    self._sources[winner].wins += 1
+                    break
+        except asyncio.CancelledError:
+            for t in pending:
+                t.cancel()
+            raise
+        self.resolved += 1
+        self._ms.append((time.perf_counter() - t0) * 1000)
+        if pending:
+            bg = asyncio.create_task(self._fill(doi, names, tasks, pending, results, merged))
+            self._background.add(bg)
+            bg.add_done_callback(self._background.discard)
+        return merged
+
+    async def _fill(self, doi: str, names, tasks, pending, results, merged_then):
+        """منابع دیرتر در پس‌زمینه؛ فیلدهای تازه از طریق on_fill (مثلاً کش) ثبت می‌شوند."""
+        await asyncio.wait(pending)
+        for t in pending:
+            if not t.cancelled():
+                results[tasks[t]] = t.result()
+        merged = merge(results[n] for n in names if n in results)
+        added = [f for f in FIELDS if merged.get(f) and not merged_then.get(f)]
+        if not added:
+            return
+        for t in pending:
+            if not t.cancelled() and any(t.result().get(f) for f in added):
+                self._sources[tasks[t]].late_fills += 1
+        if self.on_fill is not None:
+            try:
+                self.on_fill(doi, merged)
+            except Exception:
+                logger.debug("metadata on_fill failed", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "deadline_s": self.deadline,
+            "required": list(self.required),
+            "resolved": self.resolved,
+            "sufficient": self.sufficient,
+            "deadline_hits": self.deadline_hits,
+            "background": len(self._background),
+            "ms_p50": _pct(self._ms, 0.5),
+            "ms_p90": _pct(self._ms, 0.9),
+            "sources": {
+                n: {"calls": s.calls, "ok": s.ok, "errors": s.errors, "wins": s.wins,
+                    "late_fills": s.late_fills, "ms_p50": _pct(s.ms, 0.5), "ms_p90": _pct(s.ms, 0.9)}
+                for n, s in self._sources.items()
+            },
+        }
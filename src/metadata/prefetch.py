@@ -0,0 +1,199 @@
+# src/metadata/prefetch.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+from src.detect.doi import normalize_doi
+from .hedge import merge
+
+logger = logging.getLogger(__name__)
+
+BatchFetcher = Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+OneFetcher = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+class MetadataPrefetcher:
+    """
+    پیش‌واکشی متادیتای همهٔ DOIهای تازهٔ هر snapshot از /requests، پیش از اینکه take شوند.
+    DOIها در صف جمع و هر batch با یک درخواست چند-DOI به OpenAlex (batch_fetch) و همزمان
+    Crossref تک‌تک با همزمانی محدود (one_fetch) گرفته می‌شوند. ادغام به ترتیب Crossref → OpenAlex
+    است (مثل metadata()) و نتیجه با store در کش متادیتا می‌نشیند؛ پس پس از take قواعد post
+    روی دادهٔ محلی اجرا می‌شوند. DOIهای کش‌شده اصلاً صف نمی‌شوند.
+    """
+
+    def __init__(self, *, batch_fetch: BatchFetcher, one_fetch: OneFetcher,
+                 store: Callable[[str, Dict[str, Any]], None], has: Callable[[str], bool],
+                 batch_size: int = 50, concurrency: int = 4, linger: float = 0.2, max_queue: int = 2000):
+        self.batch_fetch = batch_fetch
+        self.one_fetch = one_fetch
+        self.store = store
+        self.has = has
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+        self.max_queue = max_queue
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        # کلید DOI → DOI اصلی (ترتیب ورود)
+        self._queue: "OrderedDict[str, str]" = OrderedDict()
+        # کلید DOI → future که به‌محض ذخیرهٔ نتیجهٔ همان DOI کامل می‌شود
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.skipped_cached = 0
+        self.dropped = 0
+        self.batches = 0
+        self.openalex_found = 0
+        self.crossref_ok = 0
+        self.stored = 0
+        self.errors = 0
+        self.pulled = 0
+        self.empty = 0
+        self._batch_ms: Deque[float] = deque(maxlen=100)
+
+    def submit(self, dois: Iterable[str]) -> int:
+        """DOIهای تازه را صف می‌کند؛ تعداد صف‌شده‌ها را برمی‌گرداند."""
+        n = 0
+        loop = asyncio.get_running_loop()
+        for doi in dois:
+            key = normalize_doi(doi)
+            if not key or key in self._inflight:
+                continue
+            if self.has(key):
+                self.skipped_cached += 1
+                continue
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                continue
+            self._queue[key] = doi.strip()
+            self._inflight[key] = loop.create_future()
+            n += 1
+        if n:
+            self.submitted += n
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._loop())
+        return n
+
+    async def wait(self, doi: str, timeout: float) -> bool:
+        """
+        اگر DOI در batch در حال واکشی است تا ذخیرهٔ نتیجه‌اش (حداکثر timeout) صبر کن؛ True یعنی کامل شد.
+        DOI که هنوز در صف است منتظر batch نمی‌ماند: از صف بیرون کشیده می‌شود و فراخواننده خودش
+        (با HedgedResolver) مستقیم می‌گیرد.
+        """
+        key = normalize_doi(doi)
+        if self._queue.pop(key, None) is not None:
+            self.pulled += 1
+            self._resolve(key)
+            return False
+        fut = self._inflight.get(key)
+        if fut is None:
+            return False
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+        # منتظرها را آزاد کن؛ صف باقی‌مانده دور ریخته می‌شود
+        self._queue.clear()
+        for key in list(self._inflight):
+            self._resolve(key)
+
+    def _resolve(self, key: str):
+        fut = self._inflight.pop(key, None)
+        if fut is not None and not fut.done():
+            fut.set_result(None)
+
+    async def _loop(self):
+        """صف را batch به batch خالی می‌کند و تمام می‌شود؛ submit بعدی دوباره راهش می‌اندازد."""
+        # چند snapshot پیاپی را در یک batch جمع کن
+        await asyncio.sleep(self.linger)
+        while self._queue:
+            items = []
+            while self._queue and len(items) < self.batch_size:
+                items.append(self._queue.popitem(last=False))
+            try:
+                await self._run_batch(items)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                logger.warning("metadata prefetch batch failed", exc_info=True)
+            finally:
+                # DOIهایی که _run_batch به ذخیره‌شان نرسید
+                for key, _ in items:
+                    self._resolve(key)
+
+    async def _one(self, doi: str) -> Dict[str, Any]:
+        async with self._sem:
+            try:
+                return await self.one_fetch(doi) or {}
+            except Exception:
+                return {}
+
+    async def _run_batch(self, items: List[tuple]):
+        t0 = time.perf_counter()
+        dois = [doi for _, doi in items]
+
+        async def openalex() -> Dict[str, Dict[str, Any]]:
+            try:
+                return await self.batch_fetch(dois) or {}
+            except Exception:
+                logger.debug("openalex batch failed", exc_info=True)
+                return {}
+
+        oa_task = asyncio.create_task(openalex())
+
+        async def one(key: str, doi: str):
+            # هر DOI به‌محض رسیدن Crossref خودش و پاسخ batch ذخیره و آزاد می‌شود، نه با کندترین DOI batch
+            cr_meta = await self._one(doi)
+            oa_meta = (await asyncio.shield(oa_task)).get(key) or {}
+            self.openalex_found += bool(oa_meta)
+            self.crossref_ok += bool(cr_meta.get("title"))
+            if not cr_meta and not oa_meta:
+                # هر دو منبع چیزی ندادند (خطا/قطعی): چیزی ذخیره نشود تا metadata() پس از take دوباره بگیرد
+                self.empty += 1
+                self._resolve(key)
+                return
+            try:
+                self.store(doi, merge([cr_meta, oa_meta]))
+                self.stored += 1
+            except Exception:
+                self.errors += 1
+                logger.warning("metadata prefetch store failed | doi=%s", doi, exc_info=True)
+            self._resolve(key)
+
+        try:
+            await asyncio.gather(*(one(key, doi) for key, doi in items))
+        finally:
+            oa_task.cancel()
+        self.batches += 1
+        self._batch_ms.append((time.perf_counter() - t0) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        s = sorted(self._batch_ms)
+        return {
+            "queued": len(self._queue),
+            "inflight": len(self._inflight),
+            "submitted": self.submitted,
+            "skipped_cached": self.skipped_cached,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "openalex_found": self.openalex_found,
+            "crossref_ok": self.crossref_ok,
+            "stored": self.stored,
+            "errors": self.errors,
+            "pulled": self.pulled,
+            "empty": self.empty,
+            "batch_ms_p50": round(s[len(s) // 2], 1) if s else None,
+        }
@@ -0,0 +1,164 @@
+# src/metadata/session.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, Iterable, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class _HostStats:
+    __slots__ = ("requests", "new_conns", "reused", "errors", "connect_ms", "ttfb_ms")
+
+    def __init__(self):
+        self.requests = 0
+        self.new_conns = 0
+        self.reused = 0
+        self.errors = 0
+        self.connect_ms: Deque[float] = deque(maxlen=200)
+        self.ttfb_ms: Deque[float] = deque(maxlen=200)
+
+
+def _p50(xs) -> Optional[float]:
+    s = sorted(xs)
+    return round(s[len(s) // 2], 1) if s else None
+
+
+class MetadataSession:
+    """
+    یک ClientSession ماندگار و مشترک برای Crossref/OpenAlex به‌جای ساختن session در هر فراخوانی.
+    اتصال‌های TCP/TLS در استخر keep-alive می‌مانند، DNS کش می‌شود و هر میزبان سقف اتصال دارد.
+    با TraceConfig زمان اتصال تازه (DNS+TCP+TLS) و زمان تا اولین بایت (هدرهای پاسخ) هر میزبان
+    شمرده می‌شود تا اثر استخر در /diag دیده شود. session در اولین get() (داخل event loop) ساخته
+    و با close() در خاموشی برنامه بسته می‌شود.
+    """
+
+    def __init__(self, *, limit: int = 32, limit_per_host: int = 8, dns_ttl: int = 600,
+                 keepalive: float = 60.0, user_agent: str = "doi-bot/fast"):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.user_agent = user_agent
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._hosts: Dict[str, _HostStats] = {}
+        self._warm_task: Optional[asyncio.Task] = None
+        self.sessions_created = 0
+        self.warms = 0
+
+    # --- trace -----------------------------------------------------------
+    def _host(self, url) -> _HostStats:
+        host = getattr(url, "host", None) or "?"
+        st = self._hosts.get(host)
+        if st is None:
+            st = self._hosts[host] = _HostStats()
+        return st
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        tc = aiohttp.TraceConfig()
+
+        async def on_request_start(_s, ctx: SimpleNamespace, params):
+            ctx.t0 = time.perf_counter()
+            ctx.host = self._host(params.url)
+            ctx.host.requests += 1
+
+        async def on_conn_start(_s, ctx: SimpleNamespace, _params):
+            ctx.tc = time.perf_counter()
+
+        async def on_conn_end(_s, ctx: SimpleNamespace, _params):
+            if getattr(ctx, "host", None) is not None and getattr(ctx, "tc", None) is not None:
+                ctx.host.new_conns += 1
+                ctx.host.connect_ms.append((time.perf_counter() - ctx.tc) * 1000)
+
+        async def on_reuse(_s, ctx: SimpleNamespace, _params):
+            if getattr(ctx, "host", None) is not None:
+                ctx.host.reused += 1
+
+        async def on_request_end(_s, ctx: SimpleNamespace, _params):
+            # request_end پس از رسیدن هدرهای پاسخ صدا زده می‌شود → تقریب زمان تا اولین بایت
+            if getattr(ctx, "host", None) is not None:
+                ctx.host.ttfb_ms.append((time.perf_counter() - ctx.t0) * 1000)
+
+        async def on_request_exception(_s, ctx: SimpleNamespace, _params):
+            if getattr(ctx, "host", None) is not None:
+                ctx.host.errors += 1
+
+        tc.on_request_start.append(on_request_start)
+        tc.on_connection_create_start.append(on_conn_start)
+        tc.on_connection_create_end.append(on_conn_end)
+        tc.on_connection_reuseconn.append(on_reuse)
+        tc.on_request_end.append(on_request_end)
+        tc.on_request_exception.append(on_request_exception)
+        return tc
+
+    # --- lifecycle -------------------------------------------------------
+    def get(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl, keepalive_timeout=self.keepalive,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, headers={"User-Agent": self.user_agent},
+                trace_configs=[self._trace_config()],
+            )
+            self.sessions_created += 1
+        return self._session
+
+    async def warm(self, urls: Iterable[str]):
+        """HEAD سبک به هر میزبان تا اتصال TLS در استخر باز بماند (پیش از نیاز واقعی پس از take)."""
+        sess = self.get()
+
+        async def one(url: str):
+            try:
+                async with sess.head(url, allow_redirects=False, timeout=aiohttp.ClientTimeout(total=10)) as r:
+                    await r.release()
+            except Exception as e:
+                logger.debug("metadata warm failed for %s: %s", url, e)
+
+        await asyncio.gather(*(one(u) for u in urls))
+        self.warms += 1
+
+    def start_warming(self, urls: Iterable[str], interval: float):
+        """هر interval ثانیه warm؛ interval باید کمتر از keep-alive سرورها باشد."""
+        if interval <= 0 or (self._warm_task and not self._warm_task.done()):
+            return
+        urls = list(urls)
+
+        async def loop():
+            while True:
+                await self.warm(urls)
+                await asyncio.sleep(interval)
+
+        self._warm_task = asyncio.create_task(loop())
+
+    async def close(self):
+        if self._warm_task and not self._warm_task.done():
+            self._warm_task.cancel()
+            try:
+                await self._warm_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._warm_task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": self._session is not None and not self._session.closed,
+            "sessions_created": self.sessions_created,
+            "warms": self.warms,
+            "hosts": {
+                h: {"requests": st.requests, "new_conns": st.new_conns, "reused": st.reused,
+                    "errors": st.errors, "connect_ms_p50": _p50(st.connect_ms),
+                    "ttfb_ms_p50": _p50(st.ttfb_ms)}
+                for h, st in self._hosts.items()
+            },
+        }
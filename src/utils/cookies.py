@@ -0,0 +1,47 @@
+# src/utils/cookies.py
+"""
+اشتراک کوکی بین کانتکست Playwright و کلاینت‌های aiohttp.
+کوکی‌ها با همان قالب storage_state پلی‌رایت (name/value/domain/path/expires) خوانده می‌شوند.
+"""
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+from urllib.parse import urlsplit
+
+
+def load_storage_cookies(path: str | Path) -> List[Dict[str, Any]]:
+    """کوکی‌های فایل storage_state (مثل session_giga_iran.json) را برمی‌گرداند."""
+    p = Path(path)
+    if not p.exists():
+        return []
+    try:
+        return list(json.loads(p.read_text(encoding="utf-8")).get("cookies") or [])
+    except Exception:
+        return []
+
+
+def _domain_match(host: str, domain: str) -> bool:
+    domain = (domain or "").lstrip(".").lower()
+    return bool(domain) and (host == domain or host.endswith("." + domain))
+
+
+def cookie_header(cookies: Iterable[Dict[str, Any]], url: str) -> str:
+    """هدر Cookie مناسب url را از کوکی‌های معتبر (دامنه/مسیر/انقضا) می‌سازد."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    path = parts.path or "/"
+    now = time.time()
+    out = []
+    for c in cookies:
+        if not _domain_match(host, c.get("domain", "")):
+            continue
+        if not path.startswith(c.get("path") or "/"):
+            continue
+        exp = c.get("expires")
+        if isinstance(exp, (int, float)) and 0 < exp < now:
+            continue
+        out.append(f"{c.get('name')}={c.get('value', '')}")
+    return "; ".join(out)
@@ -0,0 +1,32 @@
+# src/utils/jsonfast.py
+"""
+کدک JSON سریع: اگر orjson نصب باشد از آن استفاده می‌شود، وگرنه json استاندارد.
+loads هم str و هم bytes/memoryview می‌پذیرد؛ dumps همیشه bytes برمی‌گرداند.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover
+    _orjson = None
+
+HAVE_ORJSON = _orjson is not None
+
+
+def loads(data: str | bytes | bytearray | memoryview) -> Any:
+    if _orjson is not None:
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return _orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    if _orjson is not None:
+        return _orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,137 @@
+# src/utils/persist.py
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path: str | Path, data: bytes):
+    """نوشتن اتمیک: فایل موقت کنار مقصد، fsync و سپس os.replace؛ خواننده هرگز فایل نیمه‌کاره نمی‌بیند."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+
+
+class CoalescedWriter:
+    """
+    ماندگاری state بیرون از event loop.
+    mark() فقط یک پرچم می‌گذارد و برمی‌گردد؛ یک thread پس‌زمینه پس از interval همهٔ تغییرات
+    آن بازه را با یک بار dump() و atomic_write روی دیسک می‌برد. dump در همان thread و زیر lock
+    (اگر داده شود) صدا زده می‌شود، پس صاحب داده باید جهش‌هایش را هم زیر همان lock انجام دهد.
+    close() آخرین تغییرات را همزمان (sync) می‌نویسد؛ در shutdown صدا زده شود.
+    """
+
+    def __init__(self, path: str | Path, dump: Callable[[], bytes], *, interval: float = 0.5,
+                 lock: Optional[threading.Lock] = None, name: str = "state"):
+        self.path = Path(path)
+        self.dump = dump
+        self.interval = max(0.0, interval)
+        self.name = name
+        self._lock = lock
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        # یک نوشتن در هر لحظه (thread پس‌زمینه یا flush همزمان)
+        self._io = threading.Lock()
+        self.marks = 0
+        self.writes = 0
+        self.errors = 0
+        self.last_write_ms: Optional[float] = None
+        self.last_write_at: Optional[float] = None
+
+    def mark(self):
+        """تغییری رخ داده؛ بدون I/O برمی‌گردد."""
+        with self._cond:
+            self.marks += 1
+            self._dirty = True
+            closed = self._closed
+            if not closed:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=f"persist-{self.name}", daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+        if closed:
+            # پس از close (مثلاً ذخیرهٔ دیرهنگام در shutdown) مستقیم بنویس
+            self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # پنجرهٔ تجمیع: تغییرات پیاپی این بازه یک نوشتن می‌شوند
+            if self.interval:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed, timeout=self.interval)
+                    if self._closed:
+                        return
+            self.flush()
+
+    def flush(self):
+        """اگر تغییر ننوشته‌ای هست همین حالا (در thread فراخواننده) بنویس."""
+        with self._io:
+            with self._cond:
+                if not self._dirty:
+                    return
+                self._dirty = False
+            t0 = time.perf_counter()
+            try:
+                self._commit()
+            except Exception:
+                self.errors += 1
+                with self._cond:
+                    self._dirty = True
+                logger.warning("persisting %s to %s failed", self.name, self.path, exc_info=True)
+                return
+            self.writes += 1
+            self.last_write_ms = (time.perf_counter() - t0) * 1000
+            self.last_write_at = time.time()
+
+    def _commit(self):
+        """یک نوشتن کامل؛ زیرکلاس‌ها (مثلاً batch به SQLite) جایگزینش می‌کنند."""
+        if self._lock is not None:
+            with self._lock:
+                data = self.dump()
+        else:
+            data = self.dump()
+        atomic_write(self.path, data)
+
+    def close(self, timeout: float = 5.0):
+        """thread را متوقف و تغییرات باقی‌مانده را همزمان می‌نویسد."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_s": self.interval,
+            "marks": self.marks,
+            "writes": self.writes,
+            "coalesced": max(0, self.marks - self.writes),
+            "pending": self._dirty,
+            "errors": self.errors,
+            "last_write_ms": round(self.last_write_ms, 1) if self.last_write_ms is not None else None,
+        }
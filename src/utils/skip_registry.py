@@ -0,0 +1,187 @@
+# src/utils/skip_registry.py
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+
+class SkipRegistry:
+    """
+    رجیستری DOIهای ردشده/رسیدگی‌شده (جایگزین لیست BotState.skip).
+    عضویت با set در O(1) بررسی می‌شود و ماندگاری با یک ژورنال فقط-افزودنی است: هر DOI تازه
+    یک خط «زمان<TAB>DOI» به انتهای فایل اضافه می‌کند، نه بازنویسی کل state. فشرده‌سازی (هنگام
+    بارگذاری و به‌صورت دوره‌ای) خطوط تکراری/خراب و با max_age > 0 DOIهای قدیمی را دور می‌ریزد و
+    فایل را اتمیک (tmp + replace) بازنویسی می‌کند.
+    recent() آخرین recent_size DOI را به ترتیب ورود می‌دهد (پنجرهٔ کوچکی که به صفحه فرستاده می‌شود).
+    """
+
+    def __init__(self, path: str | Path, *, max_age: float = 0.0, compact_interval: float = 86400.0,
+                 compact_min_dead: int = 1000, recent_size: int = 512):
+        self.path = Path(path)
+        self.max_age = max_age
+        self.compact_interval = compact_interval
+        self.compact_min_dead = compact_min_dead
+        self._set: set[str] = set()
+        self._recent: deque[str] = deque(maxlen=max(0, recent_size))
+        self._fh: Optional[TextIO] = None
+        self._lines = 0            # خطوط فعلی ژورنال (زنده + مرده)
+        self._last_compact = time.monotonic()
+        self.compactions = 0
+        self.load_ms = 0.0
+        self.last_compact_ms = 0.0
+        self._load()
+
+    # --- load / compaction ----------------------------------------------
+    def _load(self):
+        t0 = time.perf_counter()
+        dirty = False
+        if self.path.exists():
+            text = self.path.read_text(encoding="utf-8", errors="replace")
+            lines = text.splitlines()
+            self._lines = len(lines)
+            if text and not text.endswith("\n"):
+                # خط آخر بی‌پایان (crash وسط نوشتن) شاید DOI بریده باشد؛ فشرده‌سازی حذفش می‌کند
+                lines.pop()
+                dirty = True
+            # خط بی‌TAB (مثلاً نیمه‌نوشته پس از crash) DOI خالی می‌دهد و فشرده‌سازی حذفش می‌کند
+            self._set = {line.partition("\t")[2] for line in lines}
+            if "" in self._set:
+                self._set.discard("")
+                dirty = True
+            self._remember_tail([line.partition("\t")[2] for line in lines[-(self._recent.maxlen or 1):]])
+        self.load_ms = (time.perf_counter() - t0) * 1000
+        if dirty or self.max_age > 0 or self._dead() >= self.compact_min_dead:
+            self.compact()
+
+    def _remember_tail(self, dois: list[str]):
+        """پنجرهٔ recent را از انتهای DOIهای مرتب به ترتیب ورود پر می‌کند."""
+        n = self._recent.maxlen or 0
+        if n:
+            self._recent.extend(d for d in dois[-n:] if d)
+
+    def _dead(self) -> int:
+        return self._lines - len(self._set)
+
+    def compact(self):
+        """بازنویسی اتمیک ژورنال: هر DOI یک بار (قدیمی‌ترین زمان)، بدون خطوط خراب/منقضی."""
+        t0 = time.perf_counter()
+        self.close()
+        cutoff = time.time() - self.max_age if self.max_age > 0 else None
+        kept: Dict[str, str] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    ts, sep, doi = line.rstrip("\n").partition("\t")
+                    if not line.endswith("\n") or not sep or not doi or doi in kept:
+                        continue
+                    kept[doi] = ts
+        if cutoff is not None:
+            for doi in [d for d, ts in kept.items() if _ts(ts) < cutoff]:
+                del kept[doi]
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(f"{ts}\t{doi}\n" for doi, ts in kept.items())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._set = set(kept)
+        self._recent.clear()
+        self._remember_tail(list(kept))
+        self._lines = len(kept)
+        self._last_compact = time.monotonic()
+        self.compactions += 1
+        self.last_compact_ms = (time.perf_counter() - t0) * 1000
+
+    def _maybe_compact(self):
+        if self._dead() >= self.compact_min_dead and self._dead() > len(self._set):
+            self.compact()
+        elif self.max_age > 0 and time.monotonic() - self._last_compact > self.compact_interval:
+            self.compact()
+
+    # --- journal ---------------------------------------------------------
+    def _journal(self) -> TextIO:
+        if self._fh is None or self._fh.closed:
+            self._fh = open(self.path, "a", encoding="utf-8")
+            # خط آخر نیمه‌نوشته (crash وسط نوشتن) نباید به خط بعدی بچسبد و آن را هم خراب کند
+            if self._fh.tell() > 0 and not _ends_with_newline(self.path):
+                self._fh.write("\n")
+        return self._fh
+
+    def add(self, doi: str) -> bool:
+        """DOI را اضافه و در ژورنال ثبت می‌کند؛ False اگر از قبل بود."""
+        doi = (doi or "").strip()
+        if not doi or doi in self._set:
+            return False
+        self._set.add(doi)
+        self._recent.append(doi)
+        fh = self._journal()
+        fh.write(f"{int(time.time())}\t{doi}\n")
+        fh.flush()
+        self._lines += 1
+        self._maybe_compact()
+        return True
+
+    def update(self, dois: Iterable[str]) -> int:
+        """افزودن دسته‌ای (مهاجرت/بنچ) با یک flush."""
+        now = int(time.time())
+        fh: Optional[TextIO] = None   # ژورنال فقط وقتی DOI تازه‌ای هست باز (و ساخته) می‌شود
+        n = 0
+        for doi in dois:
+            doi = (doi or "").strip()
+            if doi and doi not in self._set:
+                self._set.add(doi)
+                self._recent.append(doi)
+                if fh is None:
+                    fh = self._journal()
+                fh.write(f"{now}\t{doi}\n")
+                n += 1
+        if fh is not None:
+            fh.flush()
+        self._lines += n
+        return n
+
+    def close(self):
+        if self._fh is not None and not self._fh.closed:
+            self._fh.close()
+        self._fh = None
+
+    # --- set protocol ----------------------------------------------------
+    def __contains__(self, doi: object) -> bool:
+        return doi in self._set
+
+    def recent(self) -> list[str]:
+        return list(self._recent)
+
+    def __len__(self) -> int:
+        return len(self._set)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._set)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._set),
+            "journal_lines": self._lines,
+            "compactions": self.compactions,
+            "load_ms": round(self.load_ms, 1),
+            "last_compact_ms": round(self.last_compact_ms, 1),
+        }
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _ts(raw: str) -> float:
+    try:
+        return float(raw)
+    except ValueError:
+        return 0.0
@@ -1,27 +1,315 @@
 import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.persist import CoalescedWriter
+
+logger = logging.getLogger(__name__)
+
+# پس از این تعداد شکست پیاپی یک batch، عملیات تک‌تک اعمال و خراب‌ها قرنطینه می‌شوند
+MAX_BATCH_FAILURES = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS sources (
+    id   INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id     TEXT PRIMARY KEY,
+    doi        TEXT,
+    chat_id    INTEGER,
+    status     TEXT NOT NULL DEFAULT 'queued',
+    info       TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_doi ON jobs (doi);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at);
+CREATE TABLE IF NOT EXISTS attempts (
+    id        INTEGER PRIMARY KEY,
+    job_id    TEXT NOT NULL,
+    attempt   INTEGER NOT NULL,
+    source_id INTEGER REFERENCES sources (id),
+    ok        INTEGER NOT NULL,
+    ms        REAL,
+    error     TEXT,
+    at        REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attempts_job ON attempts (job_id);
+CREATE INDEX IF NOT EXISTS attempts_source ON attempts (source_id, at);
+CREATE TABLE IF NOT EXISTS outcomes (
+    job_id      TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    source_id   INTEGER REFERENCES sources (id),
+    path        TEXT,
+    error       TEXT,
+    result      TEXT NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outcomes_status ON outcomes (status, finished_at);
+CREATE INDEX IF NOT EXISTS outcomes_source ON outcomes (source_id, finished_at);
+"""
+
+_SOURCE = "INSERT OR IGNORE INTO sources (name) VALUES (?)"
+_JOB = """
+INSERT INTO jobs (job_id, doi, chat_id, info, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (job_id) DO UPDATE SET doi = excluded.doi, chat_id = excluded.chat_id,
+    info = excluded.info, updated_at = excluded.updated_at
+"""
+_JOB_STUB = "INSERT OR IGNORE INTO jobs (job_id, info, created_at, updated_at) VALUES (?, '{}', ?, ?)"
+_JOB_STATUS = "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?"
+_ATTEMPT = """
+INSERT INTO attempts (job_id, attempt, source_id, ok, ms, error, at)
+VALUES (?, ?, (SELECT id FROM sources WHERE name = ?), ?, ?, ?, ?)
+"""
+_OUTCOME = """
+INSERT OR REPLACE INTO outcomes (job_id, status, source_id, path, error, result, finished_at)
+VALUES (?, ?, (SELECT id FROM sources WHERE name = ?), ?, ?, ?, ?)
+"""
+
+
+def _reject_json(path: Path):
+    """
+    پیش از SQLite، State فایل JSON را به‌عنوان path می‌گرفت؛ پاس‌دادن همان فایل حالا یعنی
+    خواندنش به‌عنوان پایگاه داده. به‌جای خطای مبهم sqlite، روشن شکست بخور.
+    """
+    head = b""
+    if path.is_file():
+        with open(path, "rb") as f:
+            head = f.read(16)
+    legacy = head.lstrip()[:1] in (b"{", b"[")
+    if path.suffix.lower() == ".json" or legacy:
+        raise ValueError(
+            f"State now stores jobs in SQLite; {path} looks like the old JSON state file. "
+            f"Pass a database path (e.g. State('jobs.sqlite3', legacy_json='{path}')) to import it.")
+
+
+class _BatchWriter(CoalescedWriter):
+    """به‌جای بازنویسی فایل، عملیات صف‌شده را در یک تراکنش SQLite اعمال می‌کند."""
+
+    def __init__(self, store: "State", interval: float):
+        super().__init__(store.db_path, lambda: b"", interval=interval, name="jobs")
+        self._store = store
+
+    def _commit(self):
+        self._store._apply_pending()
+
 
 class State:
-    def __init__(self, path: str = "state.json"):
-        self.path = Path(path)
-        self.data: Dict[str, Any] = {"jobs": {}}
-        self.load()
+    """
+    انبار job روی SQLite (WAL) با جدول‌های ایندکس‌دار jobs / attempts / sources / outcomes.
+    set_job / set_job_result / add_attempt فقط عملیات را صف می‌کنند؛ یک thread پس‌زمینه هر
+    flush_interval همه را با executemany در یک تراکنش می‌نویسد. توابع پرس‌وجو پیش از خواندن
+    صف را flush می‌کنند. state.json قدیمی (کلید "jobs") یک بار از legacy_json وارد می‌شود؛
+    خود db_path باید فایل SQLite باشد، نه JSON قدیمی.
+    عملیاتی که batch را پیاپی (MAX_BATCH_FAILURES بار) می‌شکند کنار گذاشته و در quarantine نگه داشته می‌شود.
+    """
 
-    def load(self):
-        if self.path.exists():
+    def __init__(self, db_path: str | Path = "jobs.sqlite3", *, legacy_json: Optional[str] = "state.json",
+                 flush_interval: float = 0.5):
+        self.db_path = Path(db_path)
+        _reject_json(self.db_path)
+        self._pending: List[Tuple[str, tuple]] = []
+        self._lock = threading.Lock()      # صف عملیات
+        self._db_lock = threading.Lock()   # اتصال مشترک بین thread نویسنده و پرس‌وجوها
+        self._db = sqlite3.connect(str(self.db_path), isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._writer = _BatchWriter(self, flush_interval)
+        self.ops = 0
+        self.batches = 0
+        self._failures = 0
+        # (زمان، sql، params، خطا) عملیات کنارگذاشته؛ برای بررسی دستی
+        self.quarantine: deque = deque(maxlen=100)
+        self.quarantined = 0
+        if legacy_json:
+            self._migrate_json(Path(legacy_json))
+
+    # --- migration -------------------------------------------------------
+    def _migrate_json(self, src: Path):
+        key = f"migrated:{src.resolve()}"
+        if not src.exists() or self._db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            return
+        try:
+            jobs = json.loads(src.read_text(encoding="utf-8")).get("jobs")
+        except Exception:
+            logger.warning("legacy state %s unreadable; not migrated", src, exc_info=True)
+            return
+        if not isinstance(jobs, dict):
+            return
+        for job_id, info in jobs.items():
+            if not isinstance(info, dict):
+                continue
+            info = dict(info)
+            result = info.pop("result", None)
+            self.set_job(str(job_id), info)
+            if isinstance(result, dict):
+                self.set_job_result(str(job_id), result)
+        self._enqueue("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(len(jobs))))
+        self.flush()
+        logger.info("migrated %d jobs from %s", len(jobs), src)
+
+    # --- writes (صف؛ بدون I/O روی فراخواننده) ---------------------------
+    def _enqueue(self, sql: str, params: tuple):
+        with self._lock:
+            self._pending.append((sql, params))
+        self._writer.mark()
+
+    def _apply_pending(self):
+        with self._lock:
+            ops, self._pending = self._pending, []
+        if not ops:
+            return
+        with self._db_lock:
             try:
-                self.data = json.loads(self.path.read_text(encoding="utf-8"))
-            except Exception:
-                self.data = {"jobs": {}}
+                try:
+                    self._apply_batch(ops)
+                except sqlite3.Error:
+                    self._failures += 1
+                    if self._failures < MAX_BATCH_FAILURES:
+                        raise
+                    logger.warning("jobs batch failed %d times; applying %d ops one by one",
+                                   self._failures, len(ops))
+                    ops = self._apply_isolated(ops)
+            except BaseException:
+                with self._lock:
+                    self._pending[:0] = ops
+                raise
+        self._failures = 0
+        self.ops += len(ops)
+        self.batches += 1
 
-    def save(self):
-        self.path.write_text(json.dumps(self.data, ensure_ascii=False, indent=2), encoding="utf-8")
+    def _apply_batch(self, ops: List[Tuple[str, tuple]]):
+        self._db.execute("BEGIN")
+        try:
+            # عملیات پیاپی هم‌نوع با یک executemany (ترتیب حفظ می‌شود)
+            i = 0
+            while i < len(ops):
+                sql = ops[i][0]
+                j = i
+                while j < len(ops) and ops[j][0] == sql:
+                    j += 1
+                self._db.executemany(sql, [p for _, p in ops[i:j]])
+                i = j
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _apply_isolated(self, ops: List[Tuple[str, tuple]]) -> List[Tuple[str, tuple]]:
+        """هر عملیات در savepoint خودش؛ خراب‌ها قرنطینه و بقیه در یک تراکنش ثبت می‌شوند."""
+        applied = []
+        self._db.execute("BEGIN")
+        try:
+            for sql, params in ops:
+                self._db.execute("SAVEPOINT op")
+                try:
+                    self._db.execute(sql, params)
+                except sqlite3.Error as e:
+                    self._db.execute("ROLLBACK TO op")
+                    self.quarantine.append((time.time(), sql, params, str(e)))
+                    self.quarantined += 1
+                    logger.error("jobs op quarantined: %s | %s params=%r", e, " ".join(sql.split())[:80], params)
+                else:
+                    applied.append((sql, params))
+                self._db.execute("RELEASE op")
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return applied
 
     def set_job(self, job_id: str, info: Dict[str, Any]):
-        self.data.setdefault("jobs", {})[job_id] = info
-        self.save()
+        now = time.time()
+        chat_id = info.get("requester_chat_id")
+        self._enqueue(_JOB, (job_id, info.get("doi"), chat_id if isinstance(chat_id, int) else None,
+                             json.dumps(info, ensure_ascii=False, default=str), now, now))
 
     def set_job_result(self, job_id: str, result: Dict[str, Any]):
-        self.data.setdefault("jobs", {}).setdefault(job_id, {})["result"] = result
-        self.save()
+        now = time.time()
+        status = str(result.get("status") or "unknown")
+        source = result.get("source")
+        if source:
+            self._enqueue(_SOURCE, (source,))
+        self._enqueue(_JOB_STUB, (job_id, now, now))
+        self._enqueue(_JOB_STATUS, (status, now, job_id))
+        self._enqueue(_OUTCOME, (job_id, status, source, result.get("path"), result.get("error"),
+                                 json.dumps(result, ensure_ascii=False, default=str), now))
+
+    def add_attempt(self, job_id: str, attempt: int, source: str, ok: bool,
+                    ms: Optional[float] = None, error: Optional[str] = None):
+        self._enqueue(_SOURCE, (source,))
+        self._enqueue(_ATTEMPT, (job_id, attempt, source, int(bool(ok)), ms, error, time.time()))
+
+    def flush(self):
+        self._writer.flush()
+
+    def close(self):
+        self._writer.close()
+        with self._db_lock:
+            self._db.close()
+
+    # --- queries ---------------------------------------------------------
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        self.flush()
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """همان شکل قدیمی data["jobs"][job_id]: info به‌علاوهٔ result (اگر تمام شده)."""
+        rows = self._query("SELECT j.info, o.result FROM jobs j LEFT JOIN outcomes o USING (job_id) "
+                           "WHERE j.job_id = ?", (job_id,))
+        if not rows:
+            return None
+        info = json.loads(rows[0]["info"])
+        if rows[0]["result"]:
+            info["result"] = json.loads(rows[0]["result"])
+        return info
+
+    def recent_failures(self, limit: int = 20, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT o.job_id, j.doi, o.status, s.name AS source, o.error, o.finished_at,"
+            " (SELECT COUNT(*) FROM attempts a WHERE a.job_id = o.job_id) AS attempts"
+            " FROM outcomes o LEFT JOIN jobs j USING (job_id) LEFT JOIN sources s ON s.id = o.source_id"
+            " WHERE o.status != 'done' AND o.finished_at >= ?"
+            " ORDER BY o.finished_at DESC LIMIT ?", (since or 0.0, limit))
+        return [dict(r) for r in rows]
+
+    def source_stats(self, since: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        rows = self._query(
+            "SELECT s.name, COUNT(*) AS attempts, SUM(a.ok) AS ok, AVG(a.ms) AS avg_ms,"
+            " AVG(CASE WHEN a.ok THEN a.ms END) AS avg_ok_ms"
+            " FROM attempts a JOIN sources s ON s.id = a.source_id WHERE a.at >= ? GROUP BY s.name",
+            (since or 0.0,))
+        out = {}
+        for r in rows:
+            n, ok = r["attempts"], r["ok"] or 0
+            out[r["name"]] = {
+                "attempts": n, "ok": ok, "failed": n - ok,
+                "success_rate": round(ok / n, 3) if n else None,
+                "avg_ms": round(r["avg_ms"], 1) if r["avg_ms"] is not None else None,
+                "avg_ok_ms": round(r["avg_ok_ms"], 1) if r["avg_ok_ms"] is not None else None,
+            }
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._query("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {
+            "jobs": {r["status"]: r["n"] for r in rows},
+            "pending_ops": len(self._pending),
+            "ops": self.ops,
+            "batches": self.batches,
+            "quarantined": self.quarantined,
+            "writer": self._writer.stats(),
+        }
@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import os
+import time
 from typing import Dict, Any
 from pathlib import Path
 #سیکذیپ
@@ -34,6 +35,8 @@ class WorkerPool:
         DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
     async def enqueue(self, job: dict):
+        if job.get("job_id"):
+            self.state.set_job(job["job_id"], job)
         await self.queue.put(job)
         logger.info("Job enqueued: %s", job.get("job_id"))
 
@@ -55,21 +58,26 @@ class WorkerPool:
                     logger.info("Worker %d processing job %s (doi=%s)", worker_index, job_id, doi)
                     # attempt download (with retries)
                     for attempt in range(3):
+                        t0 = time.perf_counter()
                         try:
                             local_path = await client.download_by_doi(doi, DOWNLOAD_DIR)
+                            self.state.add_attempt(job_id, attempt + 1, "iranpaper", bool(local_path),
+                                                   (time.perf_counter() - t0) * 1000)
                             if local_path:
                                 # update state
-                                self.state.set_job_result(job_id, {"status":"done","path":str(local_path)})
+                                self.state.set_job_result(job_id, {"status":"done","path":str(local_path),"source":"iranpaper"})
                                 # send file to telegram chat
                                 await send_file_to_chat(self.tg_app, chat_id, local_path, caption=f"Article for DOI: {doi}")
                                 logger.info("Worker %d finished job %s", worker_index, job_id)
                                 break
                         except Exception as e:
+                            self.state.add_attempt(job_id, attempt + 1, "iranpaper", False,
+                                                   (time.perf_counter() - t0) * 1000, repr(e))
                             logger.exception("Attempt %d failed for job %s: %s", attempt+1, job_id, e)
                             await asyncio.sleep(2 ** attempt)
                     else:
                         # all attempts failed
-                        self.state.set_job_result(job_id, {"status":"failed", "error":"download_failed"})
+                        self.state.set_job_result(job_id, {"status":"failed", "error":"download_failed", "source":"iranpaper"})
                         # notify owner
                         owner = int(os.getenv("OWNER_ID", "0") or 0)
                         if owner:
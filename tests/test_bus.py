@@ -0,0 +1,40 @@
+import asyncio
+
+from src.detect.bus import DetectionBus
+from src.detect.doi import doi_prefix, normalize_doi
+
+
+def test_normalize_doi_strips_prefix_case_and_trailing_punct():
+    assert normalize_doi(" https://doi.org/10.1000/ABC.1. ") == "10.1000/abc.1"
+    assert normalize_doi("doi:10.1000/x;") == "10.1000/x"
+    assert normalize_doi(None) == ""
+    assert doi_prefix("10.1016/j.x") == "10.1016"
+    assert doi_prefix("not-a-doi") == ""
+
+
+def test_claim_is_single_flight_across_sources():
+    bus = DetectionBus()
+    assert bus.claim("cdp", "10.1000/A") is True
+    assert bus.claim("js_observer", "https://doi.org/10.1000/a") is False
+    assert bus.claim("poll", None, "id1") is True
+    assert bus.claim("cdp", "10.1000/other", "id1") is False
+    assert bus.claim("cdp", "", None) is False
+    assert bus.wins == {"cdp": 1, "poll": 1}
+    assert bus.suppressed == {"js_observer": 1, "cdp": 1}
+
+
+def test_publish_runs_handler_once():
+    calls = []
+
+    async def handler(doc, *, src, is_doc, marks):
+        calls.append((doc["doi"], src))
+
+    async def main():
+        bus = DetectionBus(handler)
+        t1 = bus.publish("cdp", {"doi": "10.1000/a"})
+        t2 = bus.publish("ws", {"doi": "10.1000/A"})
+        assert t2 is None
+        await t1
+
+    asyncio.run(main())
+    assert calls == [("10.1000/a", "cdp")]
@@ -0,0 +1,16 @@
+from src.detect.doi import scan_dois
+
+
+def test_scan_bytes_str_and_memoryview_agree():
+    body = b'{"docs":[{"doi":"10.1016/j.cell.2020.01.001"},{"doi":"10.1038/nature12373"}]}'
+    expected = ["10.1016/j.cell.2020.01.001", "10.1038/nature12373"]
+    assert scan_dois(body) == expected
+    assert scan_dois(memoryview(body)) == expected
+    assert scan_dois(body.decode()) == expected
+
+
+def test_scan_prefilter_short_circuits():
+    assert scan_dois(b"no identifiers here") == []
+    assert scan_dois(memoryview(b"version 10.x only")) == []
+    assert scan_dois(None) == []
+    assert scan_dois("") == []
@@ -0,0 +1,52 @@
+import asyncio
+
+from src.metadata.hedge import HedgedResolver, merge
+
+
+def _source(delay, result=None, exc=None):
+    async def fetch(doi):
+        await asyncio.sleep(delay)
+        if exc is not None:
+            raise exc
+        return dict(result or {})
+    return fetch
+
+
+def test_merge_prefers_earlier_sources():
+    out = merge([{"title": "A", "type": ""}, {"title": "B", "type": "journal-article", "year": 2020}])
+    assert (out["title"], out["type"], out["year"], out["abstract"]) == ("A", "journal-article", 2020, None)
+
+
+def test_returns_once_required_fields_are_present_and_fills_late():
+    fills = []
+
+    async def main():
+        r = HedgedResolver({
+            "crossref": _source(0.01, {"title": "T", "type": "journal-article"}),
+            "openalex": _source(0.1, {"abstract": "late abstract"}),
+        }, deadline=1.0, on_fill=lambda doi, m: fills.append((doi, m["abstract"])))
+        meta = await r.resolve("10.1000/a")
+        assert meta["title"] == "T" and meta["abstract"] is None
+        await asyncio.gather(*r._background)
+        return r.stats()
+
+    st = asyncio.run(main())
+    assert fills == [("10.1000/a", "late abstract")]
+    assert st["sufficient"] == 1 and st["sources"]["crossref"]["wins"] == 1
+    assert st["sources"]["openalex"]["late_fills"] == 1
+
+
+def test_deadline_returns_partial_and_errors_are_counted():
+    async def main():
+        r = HedgedResolver({
+            "crossref": _source(0, exc=RuntimeError("boom")),
+            "openalex": _source(5.0, {"title": "never"}),
+        }, deadline=0.05)
+        meta = await r.resolve("10.1000/b")
+        for t in list(r._background):
+            t.cancel()
+        return meta, r.stats()
+
+    meta, st = asyncio.run(main())
+    assert meta["title"] is None
+    assert st["deadline_hits"] == 1 and st["sources"]["crossref"]["errors"] == 1
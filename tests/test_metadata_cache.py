@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from src.metadata.cache import MetadataCache
+
+META = {"title": "A study", "journal": "J", "type": "journal-article"}
+NEG = {"title": "—", "journal": "", "type": ""}
+
+
+def test_lru_then_disk_hits(tmp_path):
+    path = tmp_path / "meta.sqlite3"
+    c = MetadataCache(path, lru_size=1)
+    c.put("10.1000/A", META)
+    c.put("10.1000/b", META)
+    assert c.get("https://doi.org/10.1000/a") == META   # از دیسک؛ LRU فقط یکی نگه می‌دارد
+    assert c.get("10.1000/a") == META                   # حالا در LRU
+    assert (c.disk_hits, c.lru_hits) == (1, 1)
+    c.get("10.1000/a")["title"] = "mutated"
+    assert c.get("10.1000/a")["title"] == "A study"
+    c.close()
+    again = MetadataCache(path)
+    assert again.has("10.1000/b") and again.get("10.1000/b") == META
+    again.close()
+
+
+def test_negative_entries_expire_on_their_own_ttl(tmp_path):
+    path = tmp_path / "meta.sqlite3"
+    c = MetadataCache(path, pos_ttl=3600, neg_ttl=60)
+    c.put("10.1000/pos", META)
+    c.put("10.1000/neg", NEG)
+    c.close()
+    db = sqlite3.connect(str(path))
+    db.execute("UPDATE meta SET fetched_at = ?", (time.time() - 120,))
+    db.commit()
+    db.close()
+    c = MetadataCache(path, pos_ttl=3600, neg_ttl=60)
+    assert c.get("10.1000/pos") == META
+    assert not c.has("10.1000/neg") and c.get("10.1000/neg") is None
+    assert c.stats()["expired"] == 1
+    c.close()
@@ -0,0 +1,39 @@
+import json
+
+from src.config.negative_cache import NegativeCacheConfig
+from src.detect.negcache import REASON_DOI, REASON_PREFIX, NegativeCache
+
+
+def _cache(tmp_path, **kw):
+    cfg = NegativeCacheConfig(enabled=True, path=str(tmp_path / "neg.json"), doi_ttl=60,
+                              doi_max_ttl=240, prefix_threshold=2, prefix_ttl=30, **kw)
+    return NegativeCache(cfg)
+
+
+def test_doi_backoff_and_prefix_block(tmp_path):
+    nc = _cache(tmp_path)
+    nc.record_failure("10.1000/a")
+    assert nc.check("10.1000/A") == REASON_DOI
+    assert nc.check("10.1000/b") is None
+    nc.record_failure("10.1000/a")
+    e = nc.dois["10.1000/a"]
+    assert e["until"] - e["last"] == 120
+    nc.record_failure("10.1000/c")
+    assert nc.check("10.1000/b") == REASON_PREFIX
+    nc.record_success("10.1000/d")
+    assert nc.check("10.1000/b") is None
+    nc.close()
+
+
+def test_save_is_coalesced_and_atomic(tmp_path):
+    nc = _cache(tmp_path)
+    for i in range(20):
+        nc.record_failure(f"10.2000/{i}")
+    assert nc._persist.writes <= 1
+    nc.close()
+    raw = json.loads((tmp_path / "neg.json").read_text())
+    assert len(raw["doi"]) == 20 and raw["prefix"]["10.2000"]["streak"] == 20
+    assert not list(tmp_path.glob(".*.tmp"))
+    again = _cache(tmp_path)
+    assert again.check("10.2000/3") == REASON_DOI
+    again.close()
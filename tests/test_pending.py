@@ -0,0 +1,49 @@
+from src.detect import pending
+from src.detect.pending import PendingTable
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_pop_accepts_default_like_dict():
+    t = PendingTable()
+    t.put("r1", "https://x/requests")
+    assert t.pop("r1", None)["url"] == "https://x/requests"
+    assert t.pop("r1", None) is None
+    assert t.pop("missing") is None
+    sentinel = {"url": ""}
+    assert t.pop("missing", sentinel) is sentinel
+
+
+def test_ttl_eviction(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(pending.time, "monotonic", clock)
+    t = PendingTable(ttl=10, max_size=100)
+    t.put("old", "u1")
+    clock.t += 11
+    t.put("new", "u2")
+    assert t.pop("old") is None
+    assert t.pop("new")["url"] == "u2"
+    assert t.evicted_ttl == 1
+
+
+def test_size_eviction_drops_oldest_first():
+    t = PendingTable(ttl=60, max_size=2)
+    for rid in ("a", "b", "c"):
+        t.put(rid, rid)
+    assert len(t) == 2
+    assert t.pop("a") is None
+    assert t.evicted_size == 1
+
+
+def test_fail_counts_only_known_ids():
+    t = PendingTable()
+    t.put("a", "u")
+    t.fail("a")
+    t.fail("a")
+    assert t.failed == 1 and len(t) == 0
@@ -0,0 +1,60 @@
+import json
+import threading
+import time
+
+from src.utils.persist import CoalescedWriter, atomic_write
+
+
+def test_atomic_write_replaces_without_leftovers(tmp_path):
+    path = tmp_path / "state.json"
+    atomic_write(path, b"one")
+    atomic_write(path, b"two")
+    assert path.read_bytes() == b"two"
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_marks_within_interval_coalesce_into_one_write(tmp_path):
+    path = tmp_path / "state.json"
+    data = {"n": 0}
+    lock = threading.Lock()
+    w = CoalescedWriter(path, lambda: json.dumps(data).encode(), interval=0.05, lock=lock)
+    for i in range(50):
+        with lock:
+            data["n"] = i
+        w.mark()
+    deadline = time.monotonic() + 2.0
+    while w.writes == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert w.writes == 1 and json.loads(path.read_text()) == {"n": 49}
+    assert w.stats()["coalesced"] == 49
+    w.close()
+    assert w.writes == 1    # چیزی ننوشته باقی نمانده بود
+
+
+def test_close_flushes_and_late_marks_write_synchronously(tmp_path):
+    path = tmp_path / "state.json"
+    data = {"v": 1}
+    w = CoalescedWriter(path, lambda: json.dumps(data).encode(), interval=60)
+    w.mark()
+    w.close()
+    assert json.loads(path.read_text()) == {"v": 1}
+    data["v"] = 2
+    w.mark()
+    assert json.loads(path.read_text()) == {"v": 2}
+
+
+def test_failed_write_stays_pending(tmp_path):
+    calls = []
+
+    def dump():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return b"ok"
+
+    w = CoalescedWriter(tmp_path / "s.json", dump, interval=60)
+    w.mark()
+    w.flush()
+    assert w.errors == 1 and w.stats()["pending"]
+    w.close()
+    assert (tmp_path / "s.json").read_bytes() == b"ok"
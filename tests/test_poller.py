@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from src.detect.poller import DirectPoller
+from src.utils.cookies import cookie_header
+
+COOKIES = [
+    {"name": "sid", "value": "abc", "domain": ".sci-net.xyz", "path": "/"},
+    {"name": "api", "value": "x", "domain": "sci-net.xyz", "path": "/api"},
+    {"name": "old", "value": "y", "domain": "sci-net.xyz", "path": "/", "expires": time.time() - 10},
+    {"name": "session", "value": "z", "domain": "sci-net.xyz", "path": "/", "expires": -1},
+    {"name": "other", "value": "w", "domain": "example.org", "path": "/"},
+]
+
+
+def test_cookie_header_filters_domain_path_and_expiry():
+    assert cookie_header(COOKIES, "https://sci-net.xyz/requests?page=1") == "sid=abc; session=z"
+    assert cookie_header(COOKIES, "https://sci-net.xyz/api/x") == "sid=abc; api=x; session=z"
+    assert cookie_header(COOKIES, "https://notsci-net.xyz/") == ""
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_get("/requests", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}/requests"
+
+
+def test_conditional_polls_and_cookie_refresh_on_auth_failure():
+    seen = []
+    bodies = []
+    cookie_calls = []
+    responses = [
+        web.Response(body=b'{"docs": []}', headers={"ETag": '"v1"'}),
+        web.Response(status=304),
+        web.Response(status=302, headers={"Location": "/login"}),
+        web.Response(body=b'{"docs": [1]}'),
+    ]
+
+    async def handler(request):
+        seen.append((request.headers.get("Cookie"), request.headers.get("If-None-Match")))
+        return responses[len(seen) - 1]
+
+    async def cookies():
+        cookie_calls.append(1)
+        return [{"name": "sid", "value": str(len(cookie_calls)), "domain": "127.0.0.1", "path": "/"}]
+
+    async def on_body(url, body):
+        bodies.append(body)
+
+    async def main():
+        runner, url = await _serve(handler)
+        poller = DirectPoller(url, on_body, cookies)
+        try:
+            for _ in responses:
+                await poller.poll_once()
+        finally:
+            await poller.stop()
+            await runner.cleanup()
+        return poller.stats()
+
+    st = asyncio.run(main())
+    assert bodies == [b'{"docs": []}', b'{"docs": [1]}']
+    # ETag پاسخ اول در poll بعدی فرستاده می‌شود؛ پس از 302 کوکی دوباره گرفته می‌شود
+    assert seen == [("sid=1", None), ("sid=1", '"v1"'), ("sid=1", '"v1"'), ("sid=2", '"v1"')]
+    assert len(cookie_calls) == 2
+    assert (st["polls"], st["bodies"], st["not_modified"], st["auth_failures"]) == (4, 2, 1, 1)
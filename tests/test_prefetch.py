@@ -0,0 +1,66 @@
+import asyncio
+
+from src.metadata.prefetch import MetadataPrefetcher
+
+
+def _prefetcher(store, delays, **kw):
+    async def batch_fetch(dois):
+        return {d.lower(): {"title": f"oa {d}"} for d in dois}
+
+    async def one_fetch(doi):
+        await asyncio.sleep(delays.get(doi, 0))
+        return {"type": "journal-article"}
+
+    return MetadataPrefetcher(batch_fetch=batch_fetch, one_fetch=one_fetch,
+                              store=lambda doi, m: store.__setitem__(doi, m), has=lambda k: k in store,
+                              linger=0, **kw)
+
+
+def test_each_doi_resolves_when_its_own_result_is_stored():
+    async def main():
+        store = {}
+        pf = _prefetcher(store, {"10.1000/slow": 1.0})
+        assert pf.submit(["10.1000/fast", "10.1000/slow"]) == 2
+        await asyncio.sleep(0.01)
+        # DOI سریع منتظر Crossref کند DOI دیگر batch نمی‌ماند
+        assert "10.1000/fast" in store and "10.1000/slow" not in store
+        assert pf.stats()["inflight"] == 1
+        assert await pf.wait("10.1000/slow", 0.01) is False   # انتظار سقف دارد
+        assert store["10.1000/fast"] == {"title": "oa 10.1000/fast", "journal": None, "year": None,
+                                         "abstract": None, "type": "journal-article"}
+        await pf.stop()
+        assert pf.stats()["inflight"] == 0
+
+    asyncio.run(main())
+
+
+def test_queued_doi_is_pulled_and_loop_exits_when_idle():
+    async def main():
+        store = {}
+        pf = _prefetcher(store, {}, batch_size=1)
+        pf.submit(["10.1000/a", "10.1000/b", "10.1000/a"])
+        # هنوز در صف (batch اول شروع نشده): منتظر نمی‌ماند و از صف بیرون کشیده می‌شود
+        assert await pf.wait("10.1000/b", 5.0) is False
+        await asyncio.wait_for(pf._task, 1.0)
+        assert "10.1000/a" in store and "10.1000/b" not in store
+        assert pf.stats()["pulled"] == 1 and pf.stats()["inflight"] == 0
+        assert pf.submit(["10.1000/a"]) == 0  # کش‌شده
+
+    asyncio.run(main())
+
+
+def test_nothing_is_stored_when_both_sources_fail():
+    async def main():
+        store = {}
+
+        async def failing(*_):
+            raise RuntimeError("down")
+
+        pf = MetadataPrefetcher(batch_fetch=failing, one_fetch=failing,
+                                store=lambda doi, m: store.__setitem__(doi, m), has=lambda k: k in store,
+                                linger=0)
+        pf.submit(["10.1000/a"])
+        await asyncio.wait_for(pf._task, 1.0)
+        assert store == {} and pf.stats()["empty"] == 1 and pf.stats()["inflight"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+import json
+
+from src.detect.ranking import CandidateRanker
+
+
+def test_history_is_persisted_atomically_on_close(tmp_path):
+    path = tmp_path / "prefix_stats.json"
+    r = CandidateRanker(history_path=path)
+    r.record("10.1016/j.a", True, "iranpaper")
+    r.record("10.1016/j.b", False)
+    r.close()
+    assert json.loads(path.read_text())["10.1016"] == {"ok": 1, "fail": 1, "sources": {"iranpaper": 1}}
+    assert not list(tmp_path.glob(".*.tmp"))
+    again = CandidateRanker(history_path=path)
+    assert again.success_rate("10.1016/x") == 0.5
+    again.close()
+
+
+def test_rank_prefers_reward_and_history(tmp_path):
+    r = CandidateRanker(history_path=tmp_path / "h.json")
+    for _ in range(5):
+        r.record("10.2000/x", True)
+    low = {"doi": "10.1000/a", "title": "A study of things", "request": {"reward": 1}}
+    high = {"doi": "10.1000/b", "title": "A study of things", "request": {"reward": 50}}
+    hist = {"doi": "10.2000/c", "title": "A study of things", "request": {"reward": 1}}
+    assert r.rank([low, high])[0] is high
+    assert r.rank([low, hist])[0] is hist
+    r.close()
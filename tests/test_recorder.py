@@ -0,0 +1,55 @@
+import asyncio
+
+from src.detect.recorder import CdpRecorder, ReplayCDP, load_recording
+
+
+def _record(path, n=50):
+    rec = CdpRecorder(path)
+    rec.new_session()
+    for i in range(n):
+        rec.event("Network.loadingFinished", {"requestId": str(i)})
+    rec.body("7", {"body": "x", "base64Encoded": False})
+    rec.close()
+
+
+def test_truncated_recording_loads_what_survived(tmp_path):
+    path = tmp_path / "rec.jsonl.gz"
+    _record(path)
+    full = path.read_bytes()
+    path.write_bytes(full[: len(full) - 8])  # پایان عضو gzip (CRC/طول) از دست رفته
+    recs = load_recording(path)
+    assert len(recs) == 51
+    path.write_bytes(full[: len(full) // 2])
+    assert 0 <= len(load_recording(path)) < 51
+
+
+def test_request_ids_are_prefixed_per_session(tmp_path):
+    path = tmp_path / "rec.jsonl.gz"
+    rec = CdpRecorder(path)
+    for _ in range(2):
+        rec.new_session()
+        ev = {"requestId": "1", "response": {}}
+        rec.event("Network.responseReceived", ev)
+        assert ev["requestId"] == "1"  # رویداد زنده دست‌نخورده می‌ماند
+        rec.body("1", {"body": "b"})
+    rec.close()
+    recs = load_recording(path)
+    assert [r["p"]["requestId"] for r in recs if r["m"] != "body"] == ["1:1", "2:1"]
+    cdp = ReplayCDP(recs)
+    assert set(cdp.bodies) == {"1:1", "2:1"}
+    assert asyncio.run(cdp.send("Network.getResponseBody", {"requestId": "2:1"}))["body"] == "b"
+
+
+def test_unclosed_recording_is_readable_after_periodic_flush(tmp_path, monkeypatch):
+    from src.detect import recorder
+    monkeypatch.setattr(recorder, "FLUSH_INTERVAL", 0.0)
+    path = tmp_path / "rec.jsonl.gz"
+    rec = CdpRecorder(path)
+    rec.new_session()
+    for i in range(10):
+        rec.event("Network.loadingFinished", {"requestId": str(i)})
+    # مثل kill -9: فایل بدون close کپی می‌شود
+    snap = tmp_path / "killed.jsonl.gz"
+    snap.write_bytes(path.read_bytes())
+    assert len(load_recording(snap)) == 10
+    rec.close()
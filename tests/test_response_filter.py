@@ -0,0 +1,20 @@
+from src.config import response_filter
+from src.config.response_filter import ResponseFilter
+
+
+def test_url_patterns_keep_case_sensitive_escapes(monkeypatch):
+    monkeypatch.setenv("CDP_BODY_DENY_URLS", r"/track/\D+$")
+    assert response_filter._csv("CDP_BODY_DENY_URLS", "", lower=False) == (r"/track/\D+$",)
+    f = ResponseFilter(deny_urls=(r"/track/\D+$",))
+    assert not f.should_fetch("xhr", "application/json", "https://x/track/abc")
+    assert f.should_fetch("xhr", "application/json", "https://x/track/123")
+
+
+def test_types_and_mimes_are_case_insensitive(monkeypatch):
+    monkeypatch.setenv("CDP_BODY_ALLOW_TYPES", "XHR")
+    assert response_filter._csv("CDP_BODY_ALLOW_TYPES", "") == ("xhr",)
+    f = ResponseFilter()
+    assert f.should_fetch("XHR", "Application/JSON", "https://sci-net.xyz/foo")
+    assert not f.should_fetch("Image", "image/png", "https://sci-net.xyz/requests")
+    assert f.should_fetch("Document", "text/html", "https://sci-net.xyz/REQUESTS?page=1")
+    assert not f.should_fetch("xhr", "application/json", "https://www.google-analytics.com/collect")
@@ -0,0 +1,64 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from src.detect.rules import RuleSet
+
+
+def _ruleset(tmp_path, rules):
+    path = tmp_path / "take_rules.json"
+    path.write_text(json.dumps({"rules": rules}), encoding="utf-8")
+    return RuleSet(path)
+
+
+BAD_JS_RULE = {"id": "py_only_regex", "stage": "pre", "field": "title", "op": "regex",
+               "value": r"(?P<w>manual)", "reason": "manual_pre"}
+
+
+def test_evaluate_first_hit_and_counts():
+    rs = RuleSet()
+    assert rs.evaluate("pre", {"title": "Deep learning"}).id == "short_title"
+    assert rs.evaluate("pre", {"title": "A practical ebook on deep learning methods"}).id == "book_in_title"
+    assert rs.evaluate("pre", {"title": "A practical study of deep learning methods"}) is None
+    assert rs.evaluate("post", {"title": "A long enough title here", "type": "book-chapter"}).id == "book_type"
+    st = rs.stats()["rules"]
+    assert st["short_title"]["hits"] == 1 and st["short_title"]["evals"] == 3
+
+
+def test_record_js_errors_ignores_stale_versions(tmp_path):
+    rs = _ruleset(tmp_path, [BAD_JS_RULE])
+    assert rs.record_js_errors(rs.version - 1, [["py_only_regex", "SyntaxError"]]) == 0
+    assert rs.record_js_errors(rs.version, [["py_only_regex", "SyntaxError"], ["nope", "x"]]) == 1
+    assert rs.stats()["rules"]["py_only_regex"]["js_error"] == "SyntaxError"
+    rs.load()
+    assert "js_error" not in rs.stats()["rules"]["py_only_regex"]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node not installed")
+def test_js_drops_bad_rule_and_reports_it(tmp_path):
+    rs = _ruleset(tmp_path, [
+        {"id": "short", "stage": "pre", "field": "title", "op": "min_words", "value": 3, "reason": "short_pre"},
+        BAD_JS_RULE,
+        {"id": "deny", "stage": "pre", "field": "doi", "op": "prefix_in", "value": ["10.9999"],
+         "reason": "deny_pre"},
+    ])
+    script = (
+        "const window = globalThis; const reports = [];\n"
+        "window.__rules_error_py = async (v, bad) => { reports.push([v, bad.map(b => b[0])]); };\n"
+        "console.warn = () => {};\n"
+        f"{rs.to_js()}\n"
+        "const c = window.__preTakeCheck;\n"
+        "console.log(JSON.stringify({complete: c.complete, reports,\n"
+        "  short: c({title: 'Too short'}),\n"
+        "  deny: c({title: 'A long enough title', doi: 'https://doi.org/10.9999/x'}),\n"
+        "  pass: c({title: 'A long enough title', doi: '10.1000/x'})}));\n"
+    )
+    out = json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True,
+                                    check=True).stdout)
+    assert out["complete"] is False
+    assert out["reports"] == [[rs.version, ["py_only_regex"]]]
+    assert out["short"] == {"rule": "short", "reason": "short_pre"}
+    assert out["deny"] == {"rule": "deny", "reason": "deny_pre"}
+    assert out["pass"] is None
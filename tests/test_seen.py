@@ -0,0 +1,36 @@
+import time
+
+from src.detect.bus import DetectionBus
+from src.detect.seen import SeenSet
+
+
+def test_lru_cap_and_ttl_expiry():
+    s = SeenSet(max_size=2, ttl=60)
+    s.add("a")
+    s.add("b")
+    s.add("a")          # a تازه و به انتهای LRU
+    s.add("c")          # b بیرون می‌رود
+    assert "a" in s and "c" in s and "b" not in s
+    assert s.stats()["evicted"] == 1
+    s.add("old", ts=time.time() - 120)
+    assert "old" not in s and s.stats()["expired"] == 1
+
+
+def test_prune_and_restore_skip_expired():
+    s = SeenSet(ttl=60)
+    now = time.time()
+    assert s.restore([["x", now - 120], ["y", now], ["bad"], ["", now]]) == 1
+    s.add("z", ts=now - 90)
+    assert s.prune() == 0           # z آخر LRU است؛ prune از قدیمی‌ترها شروع می‌کند
+    assert [k for k, _ in s.items()] == ["y", "z"]
+
+
+def test_claim_refreshes_seen_time_on_hit():
+    changes = []
+    bus = DetectionBus(ttl=60, on_change=lambda: changes.append(1))
+    assert bus.claim("cdp", "10.1000/A", "id1")
+    bus.seen_dois.add("10.1000/a", ts=time.time() - 50)
+    bus.seen_ids.add("id1", ts=time.time() - 50)
+    assert not bus.claim("ws", "10.1000/a", "id1")
+    assert all(time.time() - ts < 5 for _, ts in bus.seen_dois.items() + bus.seen_ids.items())
+    assert bus.suppressed["ws"] == 1 and len(changes) == 2
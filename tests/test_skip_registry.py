@@ -0,0 +1,58 @@
+from src.utils.skip_registry import SkipRegistry
+
+
+def test_add_contains_recent_and_reload(tmp_path):
+    path = tmp_path / "skip.journal"
+    reg = SkipRegistry(path, recent_size=2)
+    assert reg.add("10.1000/a") and not reg.add("10.1000/a")
+    assert reg.update(["10.1000/b", "10.1000/c", "10.1000/a"]) == 2
+    assert "10.1000/b" in reg and len(reg) == 3
+    assert reg.recent() == ["10.1000/b", "10.1000/c"]
+    reg.close()
+    again = SkipRegistry(path, recent_size=2)
+    assert set(again) == {"10.1000/a", "10.1000/b", "10.1000/c"}
+    assert again.recent() == ["10.1000/b", "10.1000/c"]
+    again.close()
+
+
+def test_unterminated_last_line_is_dropped_on_load(tmp_path):
+    path = tmp_path / "skip.journal"
+    path.write_text("1700000000\t10.1000/a\n1700000001\t10.1000/trunc", encoding="utf-8")
+    reg = SkipRegistry(path)
+    assert "10.1000/a" in reg and "10.1000/trunc" not in reg
+    reg.add("10.1000/b")
+    reg.close()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [line.split("\t")[1] for line in lines] == ["10.1000/a", "10.1000/b"]
+
+
+def test_append_after_external_partial_write_stays_line_aligned(tmp_path):
+    path = tmp_path / "skip.journal"
+    reg = SkipRegistry(path)
+    reg.add("10.1000/a")
+    reg.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("1700000001\t10.1000/par")
+    reg.add("10.1000/b")
+    reg.close()
+    reloaded = SkipRegistry(path)
+    assert {"10.1000/a", "10.1000/b"} <= set(reloaded)
+    assert all(line.count("\t") == 1 for line in path.read_text(encoding="utf-8").splitlines())
+    reloaded.close()
+
+
+def test_compact_drops_duplicates_and_expired(tmp_path):
+    path = tmp_path / "skip.journal"
+    path.write_text("1\t10.1000/old\n9999999999\t10.1000/new\n9999999999\t10.1000/new\n", encoding="utf-8")
+    reg = SkipRegistry(path, max_age=3600)
+    assert set(reg) == {"10.1000/new"}
+    assert path.read_text(encoding="utf-8") == "9999999999\t10.1000/new\n"
+    reg.close()
+
+
+def test_empty_update_does_not_create_the_journal(tmp_path):
+    path = tmp_path / "skip.journal"
+    reg = SkipRegistry(path)
+    assert reg.update([]) == 0
+    reg.close()
+    assert not path.exists()
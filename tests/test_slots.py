@@ -0,0 +1,30 @@
+from src.detect.slots import TakeSlots
+
+
+def test_capacity_and_release():
+    s = TakeSlots(2)
+    assert s.try_acquire("10.1/a") and s.try_acquire("10.1/b")
+    assert not s.try_acquire("10.1/c")
+    assert s.refused_full == 1 and s.free == 0
+    assert s.release("https://doi.org/10.1/A")
+    assert not s.release("10.1/a")
+    assert s.free == 1 and s.try_acquire("10.1/c")
+
+
+def test_same_doi_cannot_hold_two_slots():
+    s = TakeSlots(3)
+    assert s.try_acquire("10.1/a")
+    assert not s.try_acquire("doi:10.1/A")
+    assert s.held() == ["10.1/a"]
+
+
+def test_shrinking_keeps_held_slots():
+    s = TakeSlots(3)
+    for d in ("10.1/a", "10.1/b", "10.1/c"):
+        s.try_acquire(d)
+    s.resize(1)
+    assert len(s.held()) == 3 and s.free == 0
+    s.release("10.1/a"); s.release("10.1/b")
+    assert s.free == 0
+    s.release("10.1/c")
+    assert s.free == 1
@@ -0,0 +1,34 @@
+import json
+
+from src.detect.snapshot import SnapshotDiffer
+
+
+def _body(*docs):
+    return json.dumps({"docs": list(docs)}).encode()
+
+
+def test_only_new_or_changed_docs_are_returned():
+    d = SnapshotDiffer()
+    a = {"_id": "1", "doi": "10.1/a", "request": {"reward": 1}}
+    b = {"_id": "2", "doi": "10.1/b"}
+    assert d.process("/requests", _body(a, b)) == [a, b]
+    assert d.process("/requests", _body(a, b)) == []
+    a2 = dict(a, request={"reward": 5})
+    c = {"_id": "3", "doi": "10.1/c"}
+    assert d.process("/requests", _body(c, a2, b)) == [c, a2]
+
+
+def test_snapshots_are_per_url_and_bounded():
+    d = SnapshotDiffer(max_urls=1)
+    a = {"_id": "1", "doi": "10.1/a"}
+    assert d.process("/requests?p=1", _body(a)) == [a]
+    assert d.process("/requests?p=2", _body(a)) == [a]
+    # p=1 از ایندکس بیرون رفته، پس دوباره «تازه» است
+    assert d.process("/requests?p=1", _body(a)) == [a]
+
+
+def test_non_request_bodies_are_ignored():
+    d = SnapshotDiffer()
+    assert d.process("/x", b"not json") is None
+    assert d.process("/x", b"[1, 2]") is None
+    assert d.process("/x", b'{"docs": 3}') is None
@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+from src.downloader.speculative import SpeculativeLookups
+
+
+class FakePage:
+    def is_closed(self):
+        return False
+
+
+def test_wait_only_for_matching_source_and_consume():
+    async def main():
+        locks = {}
+        spec = SpeculativeLookups(5.0, lambda pg: locks.setdefault(id(pg), asyncio.Lock()))
+        page = FakePage()
+        release = asyncio.Event()
+
+        async def lookup(pg, doi):
+            await release.wait()
+
+        assert spec.start("10.1000/a", [("iranpaper", page, lookup)])
+        await asyncio.sleep(0)
+        # منبع دیگر منتظر lookup ایران‌پیپر نمی‌ماند
+        await asyncio.wait_for(spec.wait("10.1000/a", "gigalib"), 0.1)
+        waiter = asyncio.create_task(spec.wait("10.1000/a", "iranpaper"))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        release.set()
+        await asyncio.wait_for(waiter, 1.0)
+        assert spec.consume("10.1000/a", "gigalib", page, 0.0) is None
+        assert spec.start("10.1000/b", [("iranpaper", page, lookup)])
+        await spec.wait("10.1000/b", "iranpaper")
+        assert spec.consume("10.1000/b", "iranpaper", page, time.monotonic()) is not None
+
+    asyncio.run(main())
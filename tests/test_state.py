@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from src.utils.state import MAX_BATCH_FAILURES, State, _ATTEMPT
+
+
+def test_jobs_attempts_and_legacy_import(tmp_path):
+    legacy = tmp_path / "state.json"
+    legacy.write_text(json.dumps({"jobs": {"old": {"doi": "10.1000/old", "result": {"status": "done"}}}}))
+    st = State(tmp_path / "jobs.sqlite3", legacy_json=str(legacy), flush_interval=60)
+    st.set_job("j1", {"doi": "10.1000/a", "requester_chat_id": 7})
+    st.add_attempt("j1", 1, "iranpaper", False, ms=120.0, error="timeout")
+    st.add_attempt("j1", 2, "iranpaper", True, ms=80.0)
+    st.set_job_result("j1", {"status": "failed", "error": "x", "source": "iranpaper"})
+    assert st.get_job("old")["result"] == {"status": "done"}
+    assert st.get_job("j1")["result"]["status"] == "failed"
+    assert st.source_stats()["iranpaper"]["attempts"] == 2
+    assert [f["job_id"] for f in st.recent_failures()] == ["j1"]
+    st.close()
+    again = State(tmp_path / "jobs.sqlite3", legacy_json=str(legacy), flush_interval=60)
+    assert again.stats()["jobs"] == {"done": 1, "failed": 1}   # بدون وارد کردن دوباره
+    again.close()
+
+
+def test_json_path_fails_clearly(tmp_path):
+    with pytest.raises(ValueError, match="SQLite"):
+        State(tmp_path / "state.json")
+    old = tmp_path / "state"
+    old.write_text('{"jobs": {}}')
+    with pytest.raises(ValueError, match="legacy_json"):
+        State(old)
+
+
+def test_poison_op_is_quarantined_after_repeated_failures(tmp_path):
+    st = State(tmp_path / "jobs.sqlite3", legacy_json=None, flush_interval=60)
+    st.set_job("j1", {"doi": "10.1000/a"})
+    st._enqueue(_ATTEMPT, (None, 1, "src", 0, None, None, 0.0))   # job_id NOT NULL
+    st.set_job("j2", {"doi": "10.1000/b"})
+    for _ in range(MAX_BATCH_FAILURES - 1):
+        st.flush()
+        assert len(st._pending) == 3
+    st.flush()
+    s = st.stats()
+    assert s["pending_ops"] == 0 and s["quarantined"] == 1
+    assert st.get_job("j1") and st.get_job("j2")
+    assert st.quarantine[0][2][0] is None
+    st.close()
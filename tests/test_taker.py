@@ -0,0 +1,34 @@
+import logging
+
+from src.detect.taker import AUTH, ERROR, WON, classify_take
+
+DOI = "10.1016/j.cell.2020.01.001"
+
+
+def test_success_and_work_or_requests_redirects_win():
+    assert classify_take(200, body=f"<html><body>work {DOI}</body></html>", doi=DOI) == WON
+    assert classify_take(302, "/work/10.1016%2Fj.cell.2020.01.001", doi=DOI) == WON
+    assert classify_take(302, f"https://sci-net.xyz/work/{DOI.upper()}", doi=DOI) == WON
+    assert classify_take(302, "/requests/", doi=DOI) == WON
+    assert classify_take(302, "/requests", doi=DOI) == WON
+
+
+def test_unrecognised_shapes_are_logged_but_still_win(caplog):
+    with caplog.at_level(logging.WARNING, logger="src.detect.taker"):
+        assert classify_take(200, body="<html>please wait…</html>", doi=DOI) == WON
+        assert classify_take(302, "/work/10.1000/other", doi=DOI) == WON
+        assert classify_take(302, "/dashboard", doi=DOI) == WON
+    assert len(caplog.records) == 3
+
+
+def test_login_means_auth():
+    login = '<form><input name="user"><input name="pass" type="password"></form>'
+    assert classify_take(200, body=login, doi=DOI) == AUTH
+    assert classify_take(302, "/login?next=/take", doi=DOI) == AUTH
+    assert classify_take(302, "/", doi=DOI) == AUTH
+    assert classify_take(403, doi=DOI) == AUTH
+
+
+def test_server_errors_are_unknown_not_lost():
+    assert classify_take(502, doi=DOI) == ERROR
+    assert classify_take(0, doi=DOI) == ERROR